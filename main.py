@@ -1,16 +1,33 @@
+import argparse
+
 import uvicorn
 
 from src.api.app import create_app
 from src.config import get_settings
+from src.server import serve
 
 app = create_app()
 
+HOST = "0.0.0.0"
+PORT = 8000
+
 if __name__ == "__main__":
-    settings = get_settings()
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level=settings.LOG_LEVEL.lower(),
+    parser = argparse.ArgumentParser(description="Run the Bad Words API")
+    parser.add_argument(
+        "--prod",
+        action="store_true",
+        help="Run the production server: load the model once and fork WORKERS worker processes",
     )
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if args.prod:
+        serve(app, settings, host=HOST, port=PORT)
+    else:
+        uvicorn.run(
+            "main:app",
+            host=HOST,
+            port=PORT,
+            reload=True,
+            log_level=settings.LOG_LEVEL.lower(),
+        )
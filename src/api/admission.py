@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import math
+import time
+from collections.abc import Awaitable
+from typing import Optional, TypeVar
+
+from fastapi import FastAPI, HTTPException, Request, status
+from starlette.responses import JSONResponse, Response
+
+from src.config import Settings
+from src.services.batching import OverloadedError
+from src.services.metrics import get_metrics
+
+# Milliseconds the client is willing to wait for the answer, counted from when the server reads the request
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+# Non-standard status code (from nginx) recorded for requests whose client went away
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passes before its result is ready."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client disconnects before its result is ready."""
+
+
+def request_deadline(request: Request, s: Settings) -> Optional[float]:
+    """
+    Get the deadline of a request from its X-Request-Deadline-Ms header.
+
+    Args:
+        request: The request
+        s: Application settings with the default REQUEST_TIMEOUT_MS
+
+    Returns:
+        Optional[float]: The time.monotonic() by which the answer is needed, or
+        None if the request has no deadline
+
+    Raises:
+        HTTPException: 400 if the header is not a positive number
+    """
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is None:
+        timeout_ms = s.REQUEST_TIMEOUT_MS
+    else:
+        try:
+            timeout_ms = float(header)
+        except ValueError:
+            timeout_ms = math.nan
+        if not timeout_ms > 0 or math.isinf(timeout_ms):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{DEADLINE_HEADER} must be a positive number of milliseconds",
+            )
+
+    return time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+
+
+async def until_deadline_or_disconnect(
+    request: Request, awaitable: Awaitable[T], deadline: Optional[float] = None
+) -> T:
+    """
+    Await a result, giving up when the deadline passes or the client disconnects.
+
+    Giving up cancels the awaitable, which drops its texts if they are still
+    queued for a batch or for the inference executor. Inference that already
+    started runs to completion, but nobody waits for it.
+
+    Args:
+        request: The request, whose body must already have been read
+        awaitable: The coroutine computing the result
+        deadline: time.monotonic() by which the result is needed (None for no deadline)
+
+    Returns:
+        The result of the awaitable
+
+    Raises:
+        DeadlineExceededError: If the deadline passed first
+        ClientDisconnectedError: If the client disconnected first
+    """
+    work = asyncio.ensure_future(awaitable)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    try:
+        done, _ = await asyncio.wait(
+            {work, disconnect}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await work
+
+    if work in done:
+        return work.result()
+    if disconnect in done:
+        get_metrics().dropped.labels(reason="disconnected").inc()
+        raise ClientDisconnectedError
+    get_metrics().dropped.labels(reason="deadline").inc()
+    raise DeadlineExceededError
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    """Wait until the client disconnects. The request body must have been read already."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _error(status_code: int, detail: str, headers: Optional[dict] = None) -> JSONResponse:
+    """Build an error response in the format of the API's other errors."""
+    return JSONResponse(
+        {"detail": detail, "status_code": status_code}, status_code=status_code, headers=headers
+    )
+
+
+async def _overloaded(request: Request, exc: OverloadedError) -> Response:
+    get_metrics().dropped.labels(reason=exc.reason).inc()
+    return _error(
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        str(exc),
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+async def _deadline_exceeded(request: Request, exc: DeadlineExceededError) -> Response:
+    return _error(status.HTTP_504_GATEWAY_TIMEOUT, "Deadline exceeded")
+
+
+async def _client_disconnected(request: Request, exc: ClientDisconnectedError) -> Response:
+    # Nobody reads this response, the status code is only for logs and metrics
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+def add_exception_handlers(app: FastAPI) -> None:
+    """
+    Turn overload, deadline and disconnect errors into responses.
+
+    Args:
+        app: The FastAPI application
+    """
+    app.add_exception_handler(OverloadedError, _overloaded)
+    app.add_exception_handler(DeadlineExceededError, _deadline_exceeded)
+    app.add_exception_handler(ClientDisconnectedError, _client_disconnected)
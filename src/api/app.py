@@ -1,16 +1,67 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from slowapi import Limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
+from fastapi.responses import ORJSONResponse
 
+from src.api import metrics
+from src.api.admission import add_exception_handlers
 from src.api.middleware import add_middleware
 from src.api.v1.router import v1_router
 from src.config import get_settings
 from src.config.logging import get_logger, setup_logging
+from src.services.jobs import JobRunner, get_job_store
+from src.services.ratelimit import create_rate_limiter
+from src.services.registry import get_model_registry
+from src.services.warmup import Readiness, warm_up
 
 logger = get_logger("api.app")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Load and warm up the model in the background while the server starts, and
+    run the job workers while the server is up.
+
+    Args:
+        app: The FastAPI application
+    """
+    settings = get_settings()
+
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_up(settings, app.state.readiness))
+    else:
+        # The model is loaded lazily on the first request instead
+        app.state.readiness.set(Readiness.READY)
+
+    if settings.JOBS_ENABLED:
+        app.state.job_runner = JobRunner(
+            get_job_store(),
+            get_model_registry(),
+            workers=settings.JOBS_WORKERS,
+            chunk_size=settings.JOBS_CHUNK_SIZE,
+            poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+            retention_seconds=settings.JOBS_RETENTION_SECONDS,
+            max_attempts=settings.JOBS_MAX_ATTEMPTS,
+            retry_backoff=settings.JOBS_RETRY_BACKOFF_SECONDS,
+        )
+        app.state.job_runner.start()
+
+    yield
+
+    if settings.JOBS_ENABLED:
+        await app.state.job_runner.stop()
+
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup_task
+
+
 def create_app() -> FastAPI:
     """
     Create and configure the FastAPI application.
@@ -24,11 +75,6 @@ def create_app() -> FastAPI:
     setup_logging(settings)
     logger.info(f"Starting {settings.API_TITLE} v{settings.API_VERSION}")
 
-    # Create limiter for rate limiting
-    # This can be configured to use Redis later by changing the storage_uri
-    # Example with Redis: Limiter(key_func=get_remote_address, storage_uri="redis://localhost:6379")
-    limiter = Limiter(key_func=get_remote_address)
-
     # Create FastAPI app with metadata
     app = FastAPI(
         title=settings.API_TITLE,
@@ -36,31 +82,28 @@ def create_app() -> FastAPI:
         version=settings.API_VERSION,
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
     )
 
-    # Configure exception handlers
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    # Readiness is reported by /ready and updated by the warmup in lifespan
+    app.state.readiness = Readiness()
+
+    # Create the rate limiter here rather than in the middleware, which is only
+    # built on the first request (i.e. after the production server has forked)
+    app.state.rate_limiter = create_rate_limiter(settings)
 
     # Add all middleware
     add_middleware(app)
 
+    # Answer overload, deadline and disconnect errors of the check endpoints
+    add_exception_handlers(app)
+
     # Include routers
     app.include_router(v1_router, prefix="/api/v1")
+
+    # Prometheus scrapes /metrics at the root by convention
+    app.include_router(metrics.router, tags=["monitoring"])
     logger.info("API routes configured")
 
     return app
-
-
-async def _rate_limit_exceeded_handler(request, exc):
-    """Handle rate limit exceeded exceptions."""
-    from fastapi import status
-    from fastapi.responses import JSONResponse
-
-    return JSONResponse(
-        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-        content={
-            "detail": "Rate limit exceeded",
-            "status_code": 429,
-        },
-    )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Response
+
+from src.services.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_class=Response,
+    summary="Get Prometheus Metrics",
+    description="Returns request, latency, inference stage and decision metrics in the Prometheus text format. With several worker processes the values of all workers are merged.",
+)
+def get_metrics_endpoint():
+    """
+    Get all metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics exposition
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -1,73 +1,250 @@
+import json
+import math
+import random
+import re
 import time
-from typing import Callable
+from typing import Optional
 
-from fastapi import FastAPI, Request, Response
-from slowapi.middleware import SlowAPIMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from src.config import get_settings
 from src.config.logging import get_logger
+from src.services.metrics import get_metrics
+from src.services.profiling import is_admin, new_profile_id, request_profile
+from src.services.ratelimit import RateLimiter
 
 logger = get_logger("api.middleware")
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """
     Middleware for logging HTTP requests with processing time.
+
+    Written as plain ASGI middleware, so requests and streamed responses pass
+    through without extra tasks or stream wrapping. Successful requests are
+    logged with probability sample_rate; client and server errors always are.
     """
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Get request details
-        method = request.method
-        path = request.url.path
-        query_params = str(request.query_params) if request.query_params else ""
+    def __init__(self, app: ASGIApp, sample_rate: float = 1.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
         # Start timing
-        start_time = time.time()
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
         # Process the request
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            success = True
-        except Exception as e:
-            status_code = 500
-            success = False
-            # Re-raise the exception after logging
-            raise e
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            self._log(scope, 500, start_time, success=False)
+            raise
+
+        self._log(scope, status_code, start_time, success=True)
+
+    def _log(self, scope: Scope, status_code: int, start_time: float, success: bool) -> None:
+        """Log one finished request, skipping unsampled successful requests."""
+        if success and status_code < 400 and random.random() >= self.sample_rate:
+            return
+
+        # Calculate processing time
+        process_time_ms = (time.perf_counter() - start_time) * 1000
+        query_params = scope["query_string"].decode("latin-1")
+
+        # Log request details
+        log_msg = (
+            f"{scope['method']} {scope['path']} {query_params} | "
+            f"Status: {status_code} | "
+            f"Time: {process_time_ms:.2f}ms"
+        )
+
+        if not success or status_code >= 500:
+            logger.error(log_msg)
+        elif status_code >= 400:
+            logger.warning(log_msg)
+        else:
+            logger.info(log_msg)
+
+
+class MetricsMiddleware:
+    """
+    Middleware recording request counts and end-to-end latency in the metrics.
+
+    Latency is measured until the last body chunk is sent, so streamed
+    responses are timed in full. Requests are labelled by route name (e.g.
+    check_text) rather than path to keep the number of series bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
         finally:
-            # Calculate processing time
-            process_time = time.time() - start_time
-            process_time_ms = process_time * 1000
-
-            # Log request details
-            log_msg = (
-                f"{method} {path} {query_params} | "
-                f"Status: {status_code} | "
-                f"Time: {process_time_ms:.2f}ms"
+            route = getattr(scope.get("route"), "name", None) or "unmatched"
+            method = scope["method"]
+
+            metrics = get_metrics()
+            metrics.requests.labels(method=method, route=route, status=status_code).inc()
+            metrics.request_seconds.labels(method=method, route=route).observe(
+                time.perf_counter() - start_time
             )
 
-            if success:
-                if status_code >= 500:
-                    logger.error(log_msg)
-                elif status_code >= 400:
-                    logger.warning(log_msg)
-                else:
-                    logger.info(log_msg)
-            else:
-                logger.error(log_msg)
 
-        return response
+class RateLimitMiddleware:
+    """
+    Middleware rejecting clients over their rate limit before any routing.
+
+    Rejected requests get a 429 response with a Retry-After header and never
+    reach request validation or the model. Requests are counted against the
+    route they match, keyed by its path template, so all job ids share the
+    bucket of /api/v1/jobs/{job_id}. Requests matching no route are not
+    limited (they get a 404 anyway), so they cannot fill the storage and push
+    out the buckets of real routes.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+        # Built on the first request, once all routes are registered
+        self._routes: Optional[list[tuple[str, re.Pattern]]] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        result = await self.limiter.hit(route, client)
+
+        if result is None or result.allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Rate limit exceeded", "status_code": 429}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(result.retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
 
+    def _route(self, scope: Scope) -> Optional[str]:
+        """The path template of the route a request matches, or None."""
+        if self._routes is None:
+            self._routes = _route_templates(scope["app"])
+        path = scope["path"]
+        return next((template for template, regex in self._routes if regex.match(path)), None)
 
-def setup_rate_limiting_middleware(app: FastAPI) -> None:
+
+def _route_templates(app: FastAPI) -> list[tuple[str, re.Pattern]]:
     """
-    Setup rate limiting middleware for the application.
+    Get the path templates of all HTTP routes of an application with their patterns.
 
     Args:
         app: The FastAPI application
+
+    Returns:
+        List[Tuple[str, re.Pattern]]: Each template (e.g. /api/v1/jobs/{job_id}) and the
+        pattern matching its paths, templates without parameters first
+    """
+    templates = {route.path_format for route in app.routes if hasattr(route, "path_format")}
+    # Depending on the FastAPI version, the routes of included routers are not
+    # flattened into app.routes, but the OpenAPI schema always lists their full paths
+    templates.update(app.openapi().get("paths", {}))
+
+    # Like the router, prefer /jobs/stats over /jobs/{job_id}
+    ordered = sorted(templates, key=lambda template: (template.count("{"), template))
+    return [(template, compile_path(template)[0]) for template in ordered]
+
+
+class ProfilingMiddleware:
     """
-    app.add_middleware(SlowAPIMiddleware)
-    logger.debug("Rate limiting middleware configured")
+    Middleware letting admins request a profile of the inference calls of a request.
+
+    Requests with an X-Profile header and the admin token in X-Admin-Token
+    are profiled (see services.profiling), and the response names the profile
+    in an X-Profile-Id header. X-Profile without a valid token is refused
+    with 403.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if b"x-profile" not in headers:
+            await self.app(scope, receive, send)
+            return
+
+        token = headers.get(b"x-admin-token")
+        if not is_admin(token.decode("latin-1") if token else None, get_settings()):
+            body = json.dumps({"detail": "Invalid admin token", "status_code": 403}).encode()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 403,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        profile_id = new_profile_id("request")
+        request_profile(profile_id)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message["headers"], (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 def add_middleware(app: FastAPI) -> None:
@@ -77,10 +254,16 @@ def add_middleware(app: FastAPI) -> None:
     Args:
         app: The FastAPI application
     """
-    # Add rate limiting middleware
-    setup_rate_limiting_middleware(app)
+    # Add profiling middleware (innermost, so only requests that get through are profiled)
+    app.add_middleware(ProfilingMiddleware)
+
+    # Add rate limiting middleware (the limiter is created before workers are forked)
+    app.add_middleware(RateLimitMiddleware, limiter=app.state.rate_limiter)
 
     # Add request logging middleware
-    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(RequestLoggingMiddleware, sample_rate=get_settings().LOG_SAMPLE_RATE)
+
+    # Add metrics middleware (outermost, so it times everything else)
+    app.add_middleware(MetricsMiddleware)
 
     logger.info("Application middleware configured")
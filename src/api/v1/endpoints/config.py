@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
 
 from src.config import get_settings
+from src.services.registry import get_model_registry
 
 router = APIRouter()
 
@@ -15,15 +16,27 @@ class ConfigResponse(BaseModel):
     rate_limit: str = Field(..., description="Default rate limit setting (e.g. 10/minute)")
     max_text_length: int = Field(..., description="Maximum allowed text length in characters")
     model_name: str = Field(..., description="Name of the AI model used for profanity detection")
+    default_language: str = Field(
+        ..., description="Language of model_name, used when no language is detected"
+    )
+    languages: dict[str, str] = Field(..., description="Model name of each supported language")
+    model_precision: str = Field(..., description="Weight precision of the models")
+    batch_max_tokens: int = Field(
+        ..., description="Maximum padded tokens per forward pass (0 for no limit)"
+    )
+    process_rss_mb: float = Field(..., description="Resident memory of the serving process in MB")
+    model_memory_mb: dict[str, float] = Field(
+        ..., description="Estimated size in MB of each loaded model"
+    )
 
 
 @router.get(
     "",
     response_model=ConfigResponse,
     summary="Get API Configuration",
-    description="Returns the current API configuration including rate limits, text constraints, and model information.",
+    description="Returns the current API configuration including rate limits, text constraints, model information and memory usage.",
 )
-async def get_config(settings=Depends(get_settings)):
+async def get_config(settings=Depends(get_settings), model_registry=Depends(get_model_registry)):
     """
     Get the current API configuration.
 
@@ -37,4 +50,12 @@ async def get_config(settings=Depends(get_settings)):
         "rate_limit": settings.RATE_LIMIT_DEFAULT,
         "max_text_length": settings.MAX_TEXT_LENGTH,
         "model_name": settings.MODEL_NAME,
+        "default_language": settings.DEFAULT_LANGUAGE.lower(),
+        "languages": {
+            settings.DEFAULT_LANGUAGE.lower(): settings.MODEL_NAME,
+            **{language.lower(): name for language, name in settings.MODELS.items()},
+        },
+        "model_precision": settings.MODEL_PRECISION,
+        "batch_max_tokens": settings.BATCH_MAX_TOKENS,
+        **model_registry.memory_usage(),
     }
@@ -0,0 +1,214 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, Field, field_validator
+
+from src.api.v1.endpoints.profanity import (
+    BatchItemResult,
+    ErrorResponse,
+    validate_language,
+    validate_text_length,
+)
+from src.config import get_settings
+from src.services.jobs import QueueFullError, get_job_store
+
+router = APIRouter()
+
+# Suggested wait before resubmitting a job to a full queue
+QUEUE_FULL_RETRY_AFTER_SECONDS = 30
+
+
+class JobRequest(BaseModel):
+    """Request model for a job of texts to be checked in the background."""
+
+    texts: list[str] = Field(..., min_length=1, description="The texts to check for profanity")
+    language: Optional[str] = Field(
+        default=None, description="Language code of all texts, detected per text if not given"
+    )
+
+    @field_validator("texts")
+    def validate_job_size(cls, v):
+        """Validate that the job does not contain too many texts."""
+        settings = get_settings()
+        max_items = settings.JOBS_MAX_ITEMS
+
+        if len(v) > max_items:
+            raise ValueError(f"Job exceeds maximum size of {max_items} texts")
+        return v
+
+    @field_validator("language")
+    def validate_language(cls, v):
+        """Validate that a model serves the language."""
+        return validate_language(v)
+
+
+class JobResponse(BaseModel):
+    """Response model for the state of a job."""
+
+    id: str = Field(..., description="Id of the job")
+    status: str = Field(..., description="Job status: queued, running, completed or failed")
+    language: Optional[str] = Field(default=None, description="Language given for all texts")
+    total: int = Field(..., description="Number of texts in the job")
+    processed: int = Field(..., description="Number of texts with a result (or an error)")
+    error: Optional[str] = Field(default=None, description="Why the job failed, if it did")
+    created_at: float = Field(..., description="Unix time the job was submitted")
+    updated_at: float = Field(..., description="Unix time the job last changed")
+
+
+class JobItemResult(BatchItemResult):
+    """Result for a single text of a job."""
+
+    index: int = Field(..., description="Position of the text in the job")
+
+
+class JobResultsResponse(BaseModel):
+    """Response model for a page of job results."""
+
+    results: list[JobItemResult] = Field(
+        ..., description="Results of the scored texts of the page, in input order"
+    )
+    next_offset: Optional[int] = Field(
+        default=None, description="Offset of the next page (missing on the last page)"
+    )
+
+
+def _get_job(job_id: str, store) -> dict:
+    """Get a job or fail with 404."""
+    job = store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post(
+    "",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    responses={
+        503: {
+            "model": ErrorResponse,
+            "description": "Service Unavailable - The job queue is full, retry after Retry-After seconds",
+        },
+    },
+    summary="Submit a Job of Texts",
+    description="Queues up to JOBS_MAX_ITEMS texts to be checked by background workers and returns at once. Poll the job and fetch its results in pages. Texts are validated against MAX_TEXT_LENGTH individually; invalid texts get an error as their result. Jobs survive restarts.",
+)
+async def submit_job(
+    request: Request,
+    job_request: JobRequest,
+    response: Response,
+    store=Depends(get_job_store),
+):
+    """
+    Submit texts to be checked in the background.
+
+    Args:
+        request: The raw request, used to wake up the job workers
+        job_request: The job request model
+        response: The response, which gets a Location header
+        store: The job queue
+
+    Returns:
+        JobResponse: The queued job
+
+    Raises:
+        HTTPException: 503 if the queue is full
+    """
+    errors = {}
+    for index, text in enumerate(job_request.texts):
+        try:
+            validate_text_length(text)
+        except ValueError as e:
+            errors[index] = str(e)
+
+    try:
+        job = await asyncio.to_thread(store.submit, job_request.texts, job_request.language, errors)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_SECONDS)},
+        ) from e
+
+    runner = getattr(request.app.state, "job_runner", None)
+    if runner is not None:
+        runner.notify()
+
+    response.headers["Location"] = f"{request.url.path}/{job['id']}"
+    return job
+
+
+@router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    responses={404: {"model": ErrorResponse, "description": "Not Found - Unknown job id"}},
+    summary="Get a Job",
+    description="Returns the status and progress of a job.",
+)
+async def get_job(job_id: str, store=Depends(get_job_store)):
+    """
+    Get the state of a job.
+
+    Args:
+        job_id: Id of the job
+        store: The job queue
+
+    Returns:
+        JobResponse: The job
+    """
+    return await asyncio.to_thread(_get_job, job_id, store)
+
+
+@router.get(
+    "/{job_id}/results",
+    response_model=JobResultsResponse,
+    response_model_exclude_none=True,
+    responses={404: {"model": ErrorResponse, "description": "Not Found - Unknown job id"}},
+    summary="Get Job Results",
+    description="Returns the results of a page of texts of a job, in input order. Texts that were not scored yet are left out, so results can be fetched while the job is still running.",
+)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="Index of the first text of the page"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Number of texts in the page"),
+    store=Depends(get_job_store),
+):
+    """
+    Get a page of the results of a job.
+
+    Args:
+        job_id: Id of the job
+        offset: Index of the first text of the page
+        limit: Number of texts in the page
+        store: The job queue
+
+    Returns:
+        JobResultsResponse: The results and the offset of the next page
+    """
+    job = await asyncio.to_thread(_get_job, job_id, store)
+    results = await asyncio.to_thread(store.results, job_id, offset, limit)
+
+    next_offset = offset + limit
+    return {"results": results, "next_offset": next_offset if next_offset < job["total"] else None}
+
+
+@router.delete(
+    "/{job_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"model": ErrorResponse, "description": "Not Found - Unknown job id"}},
+    summary="Delete a Job",
+    description="Deletes a job and its results, and stops scoring it if it is still running.",
+)
+async def delete_job(job_id: str, store=Depends(get_job_store)):
+    """
+    Delete a job.
+
+    Args:
+        job_id: Id of the job
+        store: The job queue
+    """
+    if not await asyncio.to_thread(store.delete, job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
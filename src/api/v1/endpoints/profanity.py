@@ -1,39 +1,209 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, status
 from pydantic import BaseModel, Field, field_validator
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
+from src.api.admission import request_deadline, until_deadline_or_disconnect
+from src.api.serialization import NEGOTIATED_CONTENT, negotiated_response
 from src.config import get_settings
-from src.services.profanity import get_profanity_service
+from src.services.registry import get_model_registry
 
 router = APIRouter()
 
-# Create limiter for rate limiting
-limiter = Limiter(key_func=get_remote_address)
+
+def validate_text_length(text: str) -> str:
+    """
+    Validate that a text is not longer than MAX_TEXT_LENGTH.
+
+    Raises:
+        ValueError: If the text is too long
+    """
+    settings = get_settings()
+    max_length = settings.MAX_TEXT_LENGTH
+
+    if len(text) > max_length:
+        raise ValueError(f"Text exceeds maximum length of {max_length} characters")
+    return text
+
+
+def validate_language(language: Optional[str]) -> Optional[str]:
+    """
+    Validate that a language is DEFAULT_LANGUAGE or one of MODELS.
+
+    Raises:
+        ValueError: If no model serves the language
+    """
+    if language is None:
+        return None
+
+    settings = get_settings()
+    languages = {settings.DEFAULT_LANGUAGE.lower(), *(code.lower() for code in settings.MODELS)}
+
+    language = language.lower()
+    if language not in languages:
+        raise ValueError(f"Unsupported language, expected one of: {', '.join(sorted(languages))}")
+    return language
+
+
+_LANGUAGE_DESCRIPTION = "Language code of the text, detected if not given"
+_INCLUDE_TEXT_DESCRIPTION = "Echo the checked text back as original_text"
 
 
 class TextRequest(BaseModel):
     """Request model for text to be checked or censored."""
 
     text: str = Field(..., description="The text to check for profanity")
+    language: Optional[str] = Field(default=None, description=_LANGUAGE_DESCRIPTION)
+    include_text: bool = Field(default=True, description=_INCLUDE_TEXT_DESCRIPTION)
 
     @field_validator("text")
     def validate_text_length(cls, v):
         """Validate that the text is not too long."""
+        return validate_text_length(v)
+
+    @field_validator("language")
+    def validate_language(cls, v):
+        """Validate that a model serves the language."""
+        return validate_language(v)
+
+
+class LongTextRequest(BaseModel):
+    """Request model for a long text to be checked in windows."""
+
+    text: str = Field(..., description="The text to check for profanity")
+    language: Optional[str] = Field(default=None, description=_LANGUAGE_DESCRIPTION)
+    include_text: bool = Field(default=True, description=_INCLUDE_TEXT_DESCRIPTION)
+
+    @field_validator("text")
+    def validate_text_length(cls, v):
+        """Validate that the text is not longer than MAX_LONG_TEXT_LENGTH."""
         settings = get_settings()
-        max_length = settings.MAX_TEXT_LENGTH
+        max_length = settings.MAX_LONG_TEXT_LENGTH
 
         if len(v) > max_length:
             raise ValueError(f"Text exceeds maximum length of {max_length} characters")
         return v
 
+    @field_validator("language")
+    def validate_language(cls, v):
+        """Validate that a model serves the language."""
+        return validate_language(v)
+
+
+class BatchTextRequest(BaseModel):
+    """Request model for several texts to be checked at once."""
+
+    texts: list[str] = Field(..., min_length=1, description="The texts to check for profanity")
+    language: Optional[str] = Field(
+        default=None, description="Language code of all texts, detected per text if not given"
+    )
+    include_text: bool = Field(default=True, description=_INCLUDE_TEXT_DESCRIPTION)
+
+    @field_validator("texts")
+    def validate_batch_size(cls, v):
+        """Validate that the batch does not contain too many texts."""
+        settings = get_settings()
+        max_items = settings.MAX_BATCH_ITEMS
+
+        if len(v) > max_items:
+            raise ValueError(f"Batch exceeds maximum size of {max_items} texts")
+        return v
+
+    @field_validator("language")
+    def validate_language(cls, v):
+        """Validate that a model serves the language."""
+        return validate_language(v)
+
 
 class CheckResponse(BaseModel):
     """Response model for profanity check."""
 
     is_profane: bool = Field(..., description="Whether the text contains profanity")
     confidence: float = Field(..., description="Confidence score of the profanity detection (0-1)")
-    original_text: str = Field(..., description="The original text that was checked")
+    decided_by: str = Field(
+        default="model",
+        description="What decided the result: model, blocklist, allowlist or trivial",
+    )
+    original_text: Optional[str] = Field(
+        default=None,
+        description="The original text that was checked (unless include_text is false)",
+    )
+    language: Optional[str] = Field(
+        default=None, description="Language whose model checked the text"
+    )
+
+
+class TextWindow(BaseModel):
+    """A part of a long text that was scored on its own."""
+
+    start: int = Field(..., description="Character offset where the window starts")
+    end: int = Field(..., description="Character offset where the window ends")
+    text: Optional[str] = Field(
+        default=None, description="The text of the window (unless include_text is false)"
+    )
+
+
+class LongCheckResponse(CheckResponse):
+    """Response model for a windowed profanity check."""
+
+    window: TextWindow = Field(..., description="The window with the highest confidence")
+    windows_scored: int = Field(
+        ..., description="Number of windows scored before the result was decided"
+    )
+    windows_total: int = Field(..., description="Number of windows the text was split into")
+
+
+class CensoredSpan(BaseModel):
+    """A span of a text that makes it profane."""
+
+    start: int = Field(..., description="Character offset where the span starts")
+    end: int = Field(..., description="Character offset where the span ends")
+    score: float = Field(
+        ...,
+        description="Drop in confidence when the span is left out (1.0 for blocklisted phrases)",
+    )
+
+
+class CensorResponse(CheckResponse):
+    """Response model for a censored text."""
+
+    censored_text: str = Field(
+        ..., description="The text with every character of the flagged spans masked by '*'"
+    )
+    spans: list[CensoredSpan] = Field(
+        ..., description="The spans that make the text profane, in text order"
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Result for a single text of a batch request."""
+
+    is_profane: Optional[bool] = Field(
+        default=None, description="Whether the text contains profanity (missing on error)"
+    )
+    confidence: Optional[float] = Field(
+        default=None, description="Confidence score of the profanity detection (missing on error)"
+    )
+    decided_by: Optional[str] = Field(
+        default=None,
+        description="What decided the result: model, blocklist, allowlist or trivial",
+    )
+    original_text: Optional[str] = Field(
+        default=None,
+        description="The original text that was checked (unless include_text is false)",
+    )
+    language: Optional[str] = Field(
+        default=None, description="Language whose model checked the text (missing on error)"
+    )
+    error: Optional[str] = Field(
+        default=None, description="Why the text was not checked (e.g., text too long)"
+    )
+
+
+class BatchCheckResponse(BaseModel):
+    """Response model for a batch profanity check."""
+
+    results: list[BatchItemResult] = Field(..., description="One result per text, in input order")
 
 
 # Define error response models
@@ -44,10 +214,24 @@ class ErrorResponse(BaseModel):
     status_code: int = Field(default=status.HTTP_400_BAD_REQUEST, description="HTTP status code")
 
 
+# Errors of requests that cannot be answered in time
+_ADMISSION_RESPONSES = {
+    503: {
+        "model": ErrorResponse,
+        "description": "Service Unavailable - Too many texts are waiting, retry after Retry-After seconds",
+    },
+    504: {
+        "model": ErrorResponse,
+        "description": "Gateway Timeout - The X-Request-Deadline-Ms deadline passed",
+    },
+}
+
+
 @router.post(
     "/check",
     response_model=CheckResponse,
     responses={
+        200: {"content": NEGOTIATED_CONTENT},
         400: {
             "model": ErrorResponse,
             "description": "Bad Request - Invalid input (e.g., text too long)",
@@ -74,13 +258,15 @@ class ErrorResponse(BaseModel):
                 }
             },
         },
+        **_ADMISSION_RESPONSES,
     },
     summary="Check Text for Profanity",
-    description="Checks if the provided text contains profanity. Maximum text length is defined by MAX_TEXT_LENGTH setting.",
+    description="Checks if the provided text contains profanity. Maximum text length is defined by MAX_TEXT_LENGTH setting. Answers 503 when the model's queue is full and 504 if the result is not ready within X-Request-Deadline-Ms milliseconds. Responds with MessagePack if the Accept header asks for application/msgpack.",
 )
 async def check_text(
     request: TextRequest,
-    profanity_service=Depends(get_profanity_service),
+    http_request: Request,
+    model_registry=Depends(get_model_registry),
     settings=Depends(get_settings),
 ):
     """
@@ -88,7 +274,9 @@ async def check_text(
 
     Args:
         request: The text request model
-        profanity_service: The profanity service singleton
+        http_request: The raw request, whose Accept header selects the response format
+            and whose X-Request-Deadline-Ms header sets the deadline
+        model_registry: The registry routing the text to the model of its language
         settings: The application settings
 
     Returns:
@@ -96,14 +284,199 @@ async def check_text(
 
     Raises:
         HTTPException: If the input validation fails
+        OverloadedError: If the text cannot be scored in time (answered with 503)
     """
+    deadline = request_deadline(http_request, settings)
 
-    # Process the request
-    result = profanity_service.check_text(
-        text=request.text,
+    # Process the request as part of the next inference batch of its language's model,
+    # dropping it from the batch if the client stops waiting
+    result = await until_deadline_or_disconnect(
+        http_request, model_registry.check(request.text, request.language, deadline), deadline
     )
 
     # Add original text to the result
-    result["original_text"] = request.text
+    if request.include_text:
+        result["original_text"] = request.text
+    return negotiated_response(http_request, result)
+
+
+@router.post(
+    "/check/batch",
+    response_model=BatchCheckResponse,
+    response_model_exclude_none=True,
+    responses={
+        200: {"content": NEGOTIATED_CONTENT},
+        429: {
+            "model": ErrorResponse,
+            "description": "Too Many Requests - Rate limit exceeded",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Rate limit exceeded", "status_code": 429}
+                }
+            },
+        },
+        **_ADMISSION_RESPONSES,
+    },
+    summary="Check Several Texts for Profanity",
+    description="Checks a list of texts for profanity in batched forward passes. Each text is validated against MAX_TEXT_LENGTH individually; invalid texts get an error instead of a result. At most MAX_BATCH_ITEMS texts are accepted per request. Answers 503 when the model's queue is full and 504 if the result is not ready within X-Request-Deadline-Ms milliseconds. Responds with MessagePack if the Accept header asks for application/msgpack.",
+)
+async def check_batch(
+    request: BatchTextRequest,
+    http_request: Request,
+    model_registry=Depends(get_model_registry),
+    settings=Depends(get_settings),
+):
+    """
+    Check several texts for profanity at once.
+
+    Args:
+        request: The batch request model
+        http_request: The raw request, whose Accept header selects the response format
+            and whose X-Request-Deadline-Ms header sets the deadline
+        model_registry: The registry routing each text to the model of its language
+        settings: The application settings
+
+    Returns:
+        BatchCheckResponse: One result or error per text, in input order
+
+    Raises:
+        OverloadedError: If the model's queue is overloaded (answered with 503)
+    """
+    results: list[dict] = [
+        {"original_text": text} if request.include_text else {} for text in request.texts
+    ]
+
+    # Validate each text on its own so one bad item does not fail the whole batch
+    valid = []
+    for index, text in enumerate(request.texts):
+        try:
+            validate_text_length(text)
+        except ValueError as e:
+            results[index]["error"] = str(e)
+        else:
+            valid.append(index)
+
+    # Score the valid texts of each language in length-bucketed forward passes
+    deadline = request_deadline(http_request, settings)
+    scores = await until_deadline_or_disconnect(
+        http_request,
+        model_registry.check_batch(
+            [request.texts[i] for i in valid],
+            [request.language] * len(valid),
+            admit=True,
+            deadline=deadline,
+        ),
+        deadline,
+    )
+    for index, score in zip(valid, scores):
+        results[index].update(score)
+
+    return negotiated_response(http_request, {"results": results})
+
+
+@router.post(
+    "/check/long",
+    response_model=LongCheckResponse,
+    response_model_exclude_none=True,
+    responses={
+        200: {"content": NEGOTIATED_CONTENT},
+        429: {
+            "model": ErrorResponse,
+            "description": "Too Many Requests - Rate limit exceeded",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Rate limit exceeded", "status_code": 429}
+                }
+            },
+        },
+        **_ADMISSION_RESPONSES,
+    },
+    summary="Check a Long Text for Profanity",
+    description="Checks a text of up to MAX_LONG_TEXT_LENGTH characters by scoring overlapping token windows in batches. Returns the highest window confidence and the window it came from. Scoring stops as soon as a window crosses the threshold. Answers 503 when the model's queue is full and 504 if the result is not ready within X-Request-Deadline-Ms milliseconds. Responds with MessagePack if the Accept header asks for application/msgpack.",
+)
+async def check_long_text(
+    request: LongTextRequest,
+    http_request: Request,
+    model_registry=Depends(get_model_registry),
+    settings=Depends(get_settings),
+):
+    """
+    Check a long text for profanity in overlapping windows.
+
+    Args:
+        request: The long text request model
+        http_request: The raw request, whose Accept header selects the response format
+            and whose X-Request-Deadline-Ms header sets the deadline
+        model_registry: The registry routing the text to the model of its language
+        settings: The application settings
+
+    Returns:
+        LongCheckResponse: The highest scoring window and the overall result
+
+    Raises:
+        OverloadedError: If the model's queue is overloaded (answered with 503)
+    """
+    deadline = request_deadline(http_request, settings)
+    result = await until_deadline_or_disconnect(
+        http_request,
+        model_registry.check_long_text(request.text, request.language, deadline),
+        deadline,
+    )
+
+    if request.include_text:
+        result["original_text"] = request.text
+    else:
+        result["window"] = {key: value for key, value in result["window"].items() if key != "text"}
+    return negotiated_response(http_request, result)
+
+
+@router.post(
+    "/censor",
+    response_model=CensorResponse,
+    response_model_exclude_none=True,
+    responses={
+        200: {"content": NEGOTIATED_CONTENT},
+        429: {
+            "model": ErrorResponse,
+            "description": "Too Many Requests - Rate limit exceeded",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Rate limit exceeded", "status_code": 429}
+                }
+            },
+        },
+        **_ADMISSION_RESPONSES,
+    },
+    summary="Censor Profane Words",
+    description="Checks a text like /check and, if it is profane, locates the words that make it profane and masks them. All variants of the text with one word left out are scored in one batched call per round (up to CENSOR_MAX_ROUNDS), so censoring costs a few /check latencies rather than one per word. Clean texts are returned unchanged. Answers 503 when the model's queue is full and 504 if the result is not ready within X-Request-Deadline-Ms milliseconds. Responds with MessagePack if the Accept header asks for application/msgpack.",
+)
+async def censor_text(
+    request: TextRequest,
+    http_request: Request,
+    model_registry=Depends(get_model_registry),
+    settings=Depends(get_settings),
+):
+    """
+    Mask the words that make a text profane.
+
+    Args:
+        request: The text request model
+        http_request: The raw request, whose Accept header selects the response format
+            and whose X-Request-Deadline-Ms header sets the deadline
+        model_registry: The registry routing the text to the model of its language
+        settings: The application settings
+
+    Returns:
+        CensorResponse: The check result, the masked text and the flagged spans
+
+    Raises:
+        OverloadedError: If the model's queue is overloaded (answered with 503)
+    """
+    deadline = request_deadline(http_request, settings)
+    result = await until_deadline_or_disconnect(
+        http_request, model_registry.censor(request.text, request.language, deadline), deadline
+    )
 
-    return result
+    if request.include_text:
+        result["original_text"] = request.text
+    return negotiated_response(http_request, result)
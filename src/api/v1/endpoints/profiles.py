@@ -0,0 +1,105 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+
+from src.api.v1.endpoints.profanity import ErrorResponse
+from src.config import get_settings
+from src.services.profiling import TRACE_SUFFIX, get_profiler, is_admin
+
+router = APIRouter()
+
+
+def require_admin(
+    x_admin_token: Optional[str] = Header(default=None, description="The PROFILING_ADMIN_TOKEN"),
+    settings=Depends(get_settings),
+) -> None:
+    """
+    Allow only requests with the admin token.
+
+    Raises:
+        HTTPException: 403 if the token is missing or wrong, or no token is configured
+    """
+    if not is_admin(x_admin_token, settings):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+class ProfileFile(BaseModel):
+    """A file of a saved profile."""
+
+    name: str = Field(..., description="File name, to download it from /profiles/{name}")
+    size_bytes: int = Field(..., description="Size of the file in bytes")
+
+
+class ProfileInfo(BaseModel):
+    """A saved profile of one inference call."""
+
+    id: str = Field(
+        ..., description="Id of the profile (creation time, trigger and a random suffix)"
+    )
+    created_at: float = Field(..., description="Unix time the profile was saved")
+    files: list[ProfileFile] = Field(
+        ..., description="The torch profiler trace (.trace.json) and the Python profile (.pstats)"
+    )
+
+
+class ProfileListResponse(BaseModel):
+    """Response model for the saved profiles."""
+
+    profiles: list[ProfileInfo] = Field(..., description="The saved profiles, newest first")
+
+
+_FORBIDDEN = {403: {"model": ErrorResponse, "description": "Forbidden - Invalid admin token"}}
+
+
+@router.get(
+    "",
+    response_model=ProfileListResponse,
+    responses=_FORBIDDEN,
+    dependencies=[Depends(require_admin)],
+    summary="List Profiles",
+    description="Lists the profiles saved on this node, newest first. Profiles are taken of requests with an X-Profile header and of a PROFILING_SAMPLE_RATE share of inference calls. Requires the X-Admin-Token header.",
+)
+async def list_profiles(profiler=Depends(get_profiler)):
+    """
+    List the saved profiles.
+
+    Args:
+        profiler: The profiler
+
+    Returns:
+        ProfileListResponse: The saved profiles
+    """
+    return {"profiles": await asyncio.to_thread(profiler.list_profiles)}
+
+
+@router.get(
+    "/{name}",
+    response_class=FileResponse,
+    responses={
+        **_FORBIDDEN,
+        404: {"model": ErrorResponse, "description": "Not Found - Unknown profile file"},
+    },
+    dependencies=[Depends(require_admin)],
+    summary="Download a Profile File",
+    description="Downloads a torch profiler trace (open it in Perfetto or chrome://tracing) or a Python profile (open it with pstats or snakeviz). Requires the X-Admin-Token header.",
+)
+async def download_profile(name: str, profiler=Depends(get_profiler)):
+    """
+    Download a profile file.
+
+    Args:
+        name: File name as listed by /profiles
+        profiler: The profiler
+
+    Returns:
+        FileResponse: The file
+    """
+    path = profiler.profile_file(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
+    media_type = "application/json" if name.endswith(TRACE_SUFFIX) else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
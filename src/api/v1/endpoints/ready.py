@@ -0,0 +1,41 @@
+from typing import Optional
+
+from fastapi import APIRouter, Request, Response, status
+from pydantic import BaseModel, Field
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response model."""
+
+    status: str = Field(
+        ..., description="Model status: starting, loading, warming, ready or failed"
+    )
+    ready: bool = Field(..., description="Whether the API can serve inference requests")
+    error: Optional[str] = Field(default=None, description="Why warmup failed, if it did")
+
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    response_model=ReadinessResponse,
+    response_model_exclude_none=True,
+    responses={503: {"model": ReadinessResponse, "description": "The model is not warm yet"}},
+    summary="Readiness Check",
+    description="Succeeds only once the model is loaded and warmed up. Use it as the readiness probe, and /health as the liveness probe.",
+)
+async def readiness_check(request: Request, response: Response):
+    """
+    Readiness endpoint reporting whether inference is warm.
+
+    Returns:
+        ReadinessResponse: The current model status (HTTP 503 until ready)
+    """
+    readiness = request.app.state.readiness
+    if not readiness.is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return ReadinessResponse(
+        status=readiness.status, ready=readiness.is_ready, error=readiness.error
+    )
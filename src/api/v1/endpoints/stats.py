@@ -0,0 +1,79 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+
+from src.services.profanity import get_profanity_service
+from src.services.registry import get_model_registry
+
+router = APIRouter()
+
+
+class CacheStats(BaseModel):
+    """Counters of the profanity result cache."""
+
+    size: int = Field(..., description="Number of cached results")
+    max_size: int = Field(..., description="Maximum number of cached results")
+    ttl_seconds: float = Field(..., description="Time in seconds after which a result expires")
+    hits: int = Field(..., description="Lookups answered from the cache")
+    misses: int = Field(..., description="Lookups that required a forward pass")
+    coalesced: int = Field(..., description="Lookups that waited for an identical in-flight text")
+    evictions: int = Field(..., description="Results removed to make room for new ones")
+    expirations: int = Field(..., description="Results removed because their TTL passed")
+    in_flight: int = Field(..., description="Texts currently being scored")
+    hit_ratio: float = Field(..., description="Share of lookups that avoided a forward pass")
+
+
+class TokenCacheStats(BaseModel):
+    """Counters of the token id cache of the tokenization stage."""
+
+    size: int = Field(..., description="Number of texts with cached token ids")
+    max_size: int = Field(..., description="Maximum number of texts with cached token ids")
+    hits: int = Field(..., description="Texts that did not need to be tokenized")
+    misses: int = Field(..., description="Texts that were tokenized")
+    hit_ratio: float = Field(..., description="Share of texts that did not need to be tokenized")
+
+
+class ModelStats(BaseModel):
+    """State of one configured model."""
+
+    model_name: str = Field(..., description="Name of the model")
+    languages: list[str] = Field(..., description="Languages routed to the model")
+    loaded: bool = Field(..., description="Whether the model is in memory")
+    pinned: bool = Field(..., description="Whether the model is never unloaded")
+    memory_mb: float = Field(..., description="Estimated size of the loaded model in MB")
+    in_flight: int = Field(..., description="Requests currently using the model")
+
+
+class StatsResponse(BaseModel):
+    """Response model for runtime statistics."""
+
+    cache: Optional[CacheStats] = Field(
+        default=None, description="Result cache counters (missing if the cache is disabled)"
+    )
+    token_cache: TokenCacheStats = Field(..., description="Token id cache counters")
+    models: list[ModelStats] = Field(..., description="The models of all configured languages")
+
+
+@router.get(
+    "",
+    response_model=StatsResponse,
+    summary="Get Runtime Statistics",
+    description="Returns runtime counters of the profanity service, e.g. result and token id cache hits, misses and evictions, and which models are loaded.",
+)
+async def get_stats(
+    profanity_service=Depends(get_profanity_service),
+    model_registry=Depends(get_model_registry),
+):
+    """
+    Get runtime statistics of the profanity service and the model registry.
+
+    Returns:
+        StatsResponse: The current counters
+    """
+    cache = profanity_service.cache
+    return {
+        "cache": cache.stats() if cache is not None else None,
+        "token_cache": profanity_service.encoder.stats(),
+        "models": model_registry.stats(),
+    }
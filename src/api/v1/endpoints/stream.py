@@ -0,0 +1,208 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any, Optional, Union
+
+import orjson
+from fastapi import APIRouter, Depends, Request
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.api.v1.endpoints.profanity import validate_language, validate_text_length
+from src.config import get_settings
+from src.services.registry import get_model_registry
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Bytes of the longest JSON encoding of one character, a surrogate pair of \uXXXX escapes,
+# so a line is only skipped if its decoded text must exceed MAX_TEXT_LENGTH
+_MAX_CHARACTER_BYTES = 12
+# Extra room for JSON quoting and the other fields of a line
+_LINE_OVERHEAD_BYTES = 1024
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming response that leaves the request body to the endpoint.
+
+    StreamingResponse normally listens for client disconnects by reading from
+    receive(), which would swallow request body chunks that the endpoint is
+    still reading. Here the endpoint is the only reader of the request, and
+    notices a disconnect there.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+
+async def _read_lines(request: Request, max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split the request body into lines as it arrives.
+
+    Yields None in place of lines longer than max_line_bytes, which are
+    skipped without being buffered.
+    """
+    buffer = bytearray()
+    skipping = False
+
+    async for chunk in request.stream():
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                if len(buffer) > max_line_bytes:
+                    if not skipping:
+                        yield None
+                    skipping = True
+                    buffer.clear()
+                break
+
+            line = bytes(buffer[:newline])
+            del buffer[: newline + 1]
+            if skipping:
+                skipping = False
+            else:
+                yield line
+
+    if buffer and not skipping:
+        yield bytes(buffer)
+
+
+def _parse_line(index: int, line: Optional[bytes]) -> dict[str, Any]:
+    """
+    Parse one NDJSON line into an item with either a text or an error.
+
+    A line is a JSON object with a "text" field, an optional "id" that is
+    echoed back and an optional "language", or a bare JSON string.
+    """
+    item: dict[str, Any] = {"index": index}
+    if line is None:
+        item["error"] = "Line exceeds maximum length"
+        return item
+
+    try:
+        value: Union[str, dict] = orjson.loads(line)
+    except ValueError:
+        item["error"] = "Line is not valid JSON"
+        return item
+
+    language = None
+    if isinstance(value, dict):
+        if "id" in value:
+            item["id"] = value["id"]
+        language = value.get("language")
+        value = value.get("text")
+
+    if not isinstance(value, str):
+        item["error"] = 'Line must be a JSON string or an object with a "text" string'
+        return item
+
+    if language is not None and not isinstance(language, str):
+        item["error"] = '"language" must be a string'
+        return item
+
+    try:
+        item["text"] = validate_text_length(value)
+        item["language"] = validate_language(language)
+    except ValueError as e:
+        item.pop("text", None)
+        item["error"] = str(e)
+    return item
+
+
+async def _read_chunks(
+    request: Request, queue: asyncio.Queue, chunk_size: int, max_line_bytes: int
+) -> None:
+    """
+    Parse the request body into chunks of items and put them on the queue.
+
+    The queue is bounded, so reading pauses while enough chunks wait for
+    inference. A final None (or the error that stopped reading) marks the end.
+    """
+    try:
+        chunk = []
+        index = 0
+        async for line in _read_lines(request, max_line_bytes):
+            if line is not None and not line.strip():
+                continue
+
+            chunk.append(_parse_line(index, line))
+            index += 1
+            if len(chunk) >= chunk_size:
+                await queue.put(chunk)
+                chunk = []
+
+        if chunk:
+            await queue.put(chunk)
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def _score_stream(request: Request, model_registry: Any) -> AsyncIterator[bytes]:
+    """Score the streamed texts chunk by chunk and yield NDJSON result lines."""
+    settings = get_settings()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.STREAM_MAX_PENDING_CHUNKS))
+    reader = asyncio.create_task(
+        _read_chunks(
+            request,
+            queue,
+            chunk_size=max(1, settings.STREAM_CHUNK_SIZE),
+            max_line_bytes=settings.MAX_TEXT_LENGTH * _MAX_CHARACTER_BYTES + _LINE_OVERHEAD_BYTES,
+        )
+    )
+
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+
+            valid = [item for item in chunk if "text" in item]
+            scores = await model_registry.check_batch(
+                [item["text"] for item in valid], [item.pop("language") for item in valid]
+            )
+            for item, score in zip(valid, scores):
+                item["original_text"] = item.pop("text")
+                item.update(score)
+
+            yield b"".join(orjson.dumps(item) + b"\n" for item in chunk)
+    finally:
+        reader.cancel()
+
+
+@router.post(
+    "/check/stream",
+    response_class=NDJSONStreamingResponse,
+    responses={
+        200: {
+            "content": {NDJSON_MEDIA_TYPE: {}},
+            "description": "One JSON result per input line, in input order",
+        }
+    },
+    summary="Check a Stream of Texts for Profanity",
+    description=(
+        "Reads newline-delimited JSON from the request body, where each line is a JSON string or "
+        'an object with a "text" field, an optional "id" and an optional "language". Texts are '
+        "scored in batches while the body is still being uploaded, and results are streamed back "
+        "as newline-delimited JSON in input order. Server memory stays bounded regardless of the "
+        "input size."
+    ),
+)
+async def check_stream(request: Request, model_registry=Depends(get_model_registry)):
+    """
+    Check a newline-delimited JSON stream of texts for profanity.
+
+    Args:
+        request: The raw request, whose body is read incrementally
+        model_registry: The registry routing each text to the model of its language
+
+    Returns:
+        NDJSONStreamingResponse: One result (or error) line per input line
+    """
+    return NDJSONStreamingResponse(_score_stream(request, model_registry))
@@ -1,10 +1,15 @@
 from fastapi import APIRouter
 
-from .endpoints import config, health, profanity
+from .endpoints import config, health, jobs, profanity, profiles, ready, stats, stream
 
 v1_router = APIRouter()
 
 # Include all endpoint routers with the common "v1" tag plus specific tags
 v1_router.include_router(health.router, prefix="/health", tags=["v1"])
+v1_router.include_router(ready.router, prefix="/ready", tags=["v1"])
 v1_router.include_router(profanity.router, tags=["v1"])
+v1_router.include_router(stream.router, tags=["v1"])
+v1_router.include_router(jobs.router, prefix="/jobs", tags=["v1"])
 v1_router.include_router(config.router, prefix="/config", tags=["v1"])
+v1_router.include_router(stats.router, prefix="/stats", tags=["v1"])
+v1_router.include_router(profiles.router, prefix="/profiles", tags=["v1"])
@@ -0,0 +1,5 @@
+"""
+Command-line tools for operating the Bad Words API.
+
+Each tool is a module runnable with ``python -m src.cli.<tool>``.
+"""
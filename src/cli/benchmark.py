@@ -0,0 +1,570 @@
+"""
+Benchmark the profanity service and the HTTP layer, and compare benchmark runs.
+
+Usage:
+    python -m src.cli.benchmark run [--samples samples.txt] [--output run.json]
+    python -m src.cli.benchmark compare baseline.json run.json [--threshold 0.1]
+
+"run" times ProfanityService.check_text across text lengths and check_batch
+across batch sizes, then drives the ASGI app in-process at several
+concurrency levels. Each benchmark reports throughput, p50/p95/p99 latency
+and the peak RSS of the process so far, and the run is written as JSON.
+
+"compare" reports the relative change of each metric between two runs and
+exits with status 1 if any metric got worse by more than the threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from src.cli.quantization_drift import read_samples
+from src.config import Settings, get_settings
+from src.config.logging import setup_logging
+from src.services.profanity import ProfanityService, get_profanity_service
+
+# Settings for a benchmark run, unless set in the environment. Rate limiting
+# and background warmup would distort the load test, and per-request logging
+# would flood the console.
+BENCHMARK_ENVIRONMENT = {
+    "RATE_LIMIT_DEFAULT": "unlimited",
+    "WARMUP_ON_STARTUP": "false",
+    "LOG_LEVEL": "WARNING",
+    # Texts decided by the block- or allowlist would never reach the model
+    "PREFILTER_ENABLED": "false",
+}
+
+# Metrics compared between runs, and whether a higher value is better
+COMPARED_METRICS = {
+    "throughput_per_second": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+# Neutral words the synthetic benchmark texts are built from
+_WORDS = (
+    "the",
+    "quick",
+    "brown",
+    "fox",
+    "jumps",
+    "over",
+    "lazy",
+    "dog",
+    "der",
+    "schnelle",
+    "braune",
+    "fuchs",
+    "springt",
+    "über",
+    "den",
+    "faulen",
+    "hund",
+    "game",
+    "tonight",
+    "friends",
+    "kollegen",
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values: The values (need not be sorted)
+        q: The percentile, between 0 and 100
+
+    Returns:
+        float: The smallest value that at least q percent of values are less than or equal to
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def summarize(
+    name: str, latencies: list[float], elapsed: float, items: int, **extra: Any
+) -> dict[str, Any]:
+    """
+    Summarize the timings of one benchmark.
+
+    Args:
+        name: Name of the benchmark, used to match it between runs
+        latencies: Latency of each call in seconds
+        elapsed: Wall-clock time of all calls in seconds
+        items: Number of texts scored by all calls
+        **extra: Further fields of the result
+
+    Returns:
+        Dict: Throughput in texts per second, latency percentiles in
+        milliseconds and the peak RSS so far
+    """
+    return {
+        "name": name,
+        "calls": len(latencies),
+        "items": items,
+        "throughput_per_second": items / elapsed if elapsed else None,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+
+
+def make_texts(
+    count: int, length: int, samples: Optional[list[str]] = None, seed: int = 0
+) -> list[str]:
+    """
+    Build distinct texts of exactly the given length.
+
+    Args:
+        count: Number of texts
+        length: Number of characters of each text
+        samples: Texts to build from (synthetic words if not given)
+        seed: Seed of the random word order, so runs score the same texts
+
+    Returns:
+        List[str]: The texts
+    """
+    rng = random.Random(seed)
+    words = " ".join(samples).split() if samples else _WORDS
+
+    texts = []
+    for i in range(count):
+        parts = [str(i)]
+        size = len(parts[0])
+        while size < length:
+            parts.append(rng.choice(words))
+            size += len(parts[-1]) + 1
+        texts.append(" ".join(parts)[:length])
+    return texts
+
+
+def _time_calls(
+    function: Callable[[list[str]], Any], batches: list[list[str]], warmup: int
+) -> tuple[list[float], float]:
+    """Call a function on each batch after some warmup calls and time each call."""
+    for batch in batches[:warmup]:
+        function(batch)
+
+    latencies = []
+    start_time = time.perf_counter()
+    for batch in batches[warmup:]:
+        call_start = time.perf_counter()
+        function(batch)
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start_time
+
+
+def bench_service(
+    service: ProfanityService,
+    lengths: list[int],
+    batch_sizes: list[int],
+    repeats: int,
+    warmup: int = 3,
+    samples: Optional[list[str]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Time check_text across text lengths and check_batch across batch sizes.
+
+    Every call scores texts not seen before, so the results are comparable
+    even when the result cache is enabled.
+
+    Args:
+        service: The service to benchmark
+        lengths: Text lengths in characters for check_text
+        batch_sizes: Batch sizes for check_batch, with texts of the median length
+        repeats: Number of timed calls per benchmark
+        warmup: Number of untimed calls before each benchmark
+        samples: Texts to build the benchmark texts from
+
+    Returns:
+        List[Dict]: One summary per benchmark
+    """
+    results = []
+    calls = warmup + repeats
+
+    for length in lengths:
+        texts = make_texts(calls, length, samples, seed=length)
+        latencies, elapsed = _time_calls(
+            lambda batch: service.check_text(batch[0]), [[text] for text in texts], warmup
+        )
+        results.append(
+            summarize(f"check_text[length={length}]", latencies, elapsed, repeats, length=length)
+        )
+
+    length = sorted(lengths)[len(lengths) // 2]
+    for batch_size in batch_sizes:
+        texts = make_texts(calls * batch_size, length, samples, seed=batch_size)
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        latencies, elapsed = _time_calls(service.check_batch, batches, warmup)
+        results.append(
+            summarize(
+                f"check_batch[batch_size={batch_size}]",
+                latencies,
+                elapsed,
+                repeats * batch_size,
+                batch_size=batch_size,
+                length=length,
+            )
+        )
+
+    return results
+
+
+async def asgi_request(app: Callable, method: str, path: str, body: bytes = b"") -> int:
+    """
+    Send one HTTP request to an ASGI app without a server or a socket.
+
+    Args:
+        app: The ASGI application
+        method: HTTP method
+        path: Request path
+        body: JSON request body
+
+    Returns:
+        int: The response status code
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+        "state": {},
+    }
+    request_sent = False
+    status = 0
+
+    async def receive() -> dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client never disconnects, wait until the app is done
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_load(
+    app: Callable, path: str, bodies: list[bytes], concurrency: int, warmup: int = 0
+) -> dict[str, Any]:
+    """
+    Send requests to an ASGI app from concurrent clients and time them.
+
+    Args:
+        app: The ASGI application
+        path: Path to POST the request bodies to
+        bodies: The request bodies, the first warmup of them are not timed
+        concurrency: Number of clients sending requests at the same time
+        warmup: Number of untimed requests sent before, one at a time
+
+    Returns:
+        Dict: Summary of the timed requests, with the number of error responses
+    """
+    for body in bodies[:warmup]:
+        await asgi_request(app, "POST", path, body)
+
+    pending = iter(bodies[warmup:])
+    latencies: list[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        for body in pending:
+            request_start = time.perf_counter()
+            status = await asgi_request(app, "POST", path, body)
+            latencies.append(time.perf_counter() - request_start)
+            if status >= 400:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+
+    return summarize(
+        f"http[{path},concurrency={concurrency}]",
+        latencies,
+        elapsed,
+        len(latencies),
+        concurrency=concurrency,
+        errors=errors,
+    )
+
+
+async def bench_http(
+    app: Any,
+    concurrency_levels: list[int],
+    requests: int,
+    length: int,
+    samples: Optional[list[str]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Drive POST /api/v1/check of the app at several concurrency levels.
+
+    Args:
+        app: The FastAPI application, whose lifespan is run around the requests
+        concurrency_levels: Numbers of concurrent clients
+        requests: Number of timed requests per concurrency level
+        length: Text length in characters
+        samples: Texts to build the request texts from
+
+    Returns:
+        List[Dict]: One summary per concurrency level
+    """
+    results = []
+    async with app.router.lifespan_context(app):
+        for concurrency in concurrency_levels:
+            texts = make_texts(requests + concurrency, length, samples, seed=concurrency)
+            bodies = [json.dumps({"text": text}).encode() for text in texts]
+            results.append(await run_load(app, "/api/v1/check", bodies, concurrency, concurrency))
+    return results
+
+
+def compare_runs(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float = 0.1
+) -> dict[str, Any]:
+    """
+    Compare the benchmarks of two runs.
+
+    Args:
+        baseline: The earlier run
+        current: The run to check
+        threshold: Relative change in the worse direction that counts as a regression
+
+    Returns:
+        Dict: The change of each metric of each benchmark found in both runs,
+        the regressions among them and the benchmarks found in only one run
+    """
+    before = {result["name"]: result for result in baseline["results"]}
+    after = {result["name"]: result for result in current["results"]}
+
+    changes = []
+    for name in before.keys() & after.keys():
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before[name].get(metric), after[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            changes.append(
+                {
+                    "name": name,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": change,
+                    "regression": worse > threshold,
+                }
+            )
+    changes.sort(key=lambda c: (c["name"], c["metric"]))
+
+    return {
+        "threshold": threshold,
+        "changes": changes,
+        "regressions": [c for c in changes if c["regression"]],
+        "only_in_baseline": sorted(before.keys() - after.keys()),
+        "only_in_current": sorted(after.keys() - before.keys()),
+    }
+
+
+def _environment(s: Settings) -> dict[str, Any]:
+    """Describe where and with what a benchmark run was made."""
+    import torch
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "model_name": s.MODEL_NAME,
+        "model_backend": s.MODEL_BACKEND,
+        "model_precision": s.MODEL_PRECISION,
+        "cache_max_size": s.CACHE_MAX_SIZE,
+        "prefilter_enabled": s.PREFILTER_ENABLED,
+    }
+
+
+def _int_list(value: str) -> list[int]:
+    """Parse a comma-separated list of positive integers."""
+    try:
+        numbers = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        numbers = []
+    if not numbers or min(numbers) < 1:
+        raise argparse.ArgumentTypeError(f"Expected comma-separated positive integers: {value}")
+    return numbers
+
+
+def _write_json(data: dict[str, Any], output: Optional[Path]) -> None:
+    """Write JSON to a file, or print it if no file is given."""
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run the benchmarks and write the results."""
+    for key, value in BENCHMARK_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+    get_settings.cache_clear()
+    settings = get_settings()
+    setup_logging(settings)
+
+    samples = read_samples(args.samples) if args.samples else None
+    results = []
+
+    if not args.skip_service:
+        # The singleton, so the HTTP part reuses the loaded model
+        results += bench_service(
+            get_profanity_service(),
+            args.lengths,
+            args.batch_sizes,
+            args.repeats,
+            args.warmup,
+            samples,
+        )
+
+    if not args.skip_http:
+        from src.api.app import create_app
+
+        app = create_app()
+        results += asyncio.run(
+            bench_http(
+                app,
+                args.concurrency,
+                args.requests,
+                min(args.http_length, settings.MAX_TEXT_LENGTH),
+                samples,
+            )
+        )
+
+    _write_json(
+        {
+            "label": args.label,
+            "environment": _environment(settings),
+            "peak_rss_mb": peak_rss_mb(),
+            "results": results,
+        },
+        args.output,
+    )
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Compare two benchmark runs, failing if there are regressions."""
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+
+    report = compare_runs(baseline, current, args.threshold)
+    _write_json(report, args.output)
+
+    for regression in report["regressions"]:
+        print(
+            f"Regression: {regression['name']} {regression['metric']} "
+            f"{regression['baseline']:.2f} -> {regression['current']:.2f} "
+            f"({regression['change']:+.0%})",
+            file=sys.stderr,
+        )
+    return 1 if report["regressions"] else 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the profanity service and the HTTP layer."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "--samples", type=Path, default=None, help="Build texts from a text or JSONL file"
+    )
+    run_parser.add_argument(
+        "--lengths", type=_int_list, default=[16, 64, 256, 500], help="check_text lengths"
+    )
+    run_parser.add_argument(
+        "--batch-sizes", type=_int_list, default=[1, 8, 32], help="check_batch batch sizes"
+    )
+    run_parser.add_argument("--repeats", type=int, default=50, help="Timed calls per benchmark")
+    run_parser.add_argument("--warmup", type=int, default=3, help="Untimed calls per benchmark")
+    run_parser.add_argument(
+        "--concurrency", type=_int_list, default=[1, 8, 32], help="Concurrent HTTP clients"
+    )
+    run_parser.add_argument(
+        "--requests", type=int, default=200, help="Timed HTTP requests per concurrency level"
+    )
+    run_parser.add_argument(
+        "--http-length", type=int, default=64, help="Text length of the HTTP requests"
+    )
+    run_parser.add_argument("--skip-service", action="store_true", help="Skip the service part")
+    run_parser.add_argument("--skip-http", action="store_true", help="Skip the HTTP part")
+    run_parser.add_argument("--label", default=None, help="Name of the run, e.g. a git revision")
+    run_parser.add_argument("--output", type=Path, default=None, help="Write the run to a file")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two benchmark runs")
+    compare_parser.add_argument("baseline", type=Path, help="The earlier run")
+    compare_parser.add_argument("current", type=Path, help="The run to check")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change in the worse direction that fails the comparison",
+    )
+    compare_parser.add_argument(
+        "--output", type=Path, default=None, help="Write the comparison to a file"
+    )
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    if args.command == "run" and min(args.repeats, args.requests) < 1:
+        parser.error("--repeats and --requests must be at least 1")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Report the confidence drift of the INT8 quantized (or bf16) model against fp32.
+
+Usage:
+    python -m src.cli.quantization_drift samples.txt [--precision bf16] [--output report.json]
+
+The sample file contains one text per line, or one JSON object with a
+"text" field per line if it ends in .jsonl. The report is printed as JSON.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from src.config import Settings, get_settings
+from src.config.logging import setup_logging
+from src.services.profanity import ProfanityService
+
+
+def read_samples(path: Path, limit: Optional[int] = None) -> list[str]:
+    """
+    Read sample texts from a text or JSONL file.
+
+    Args:
+        path: The sample file
+        limit: Maximum number of samples to read
+
+    Returns:
+        List[str]: The non-empty sample texts
+    """
+    texts = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            texts.append(json.loads(line)["text"] if path.suffix == ".jsonl" else line)
+            if limit is not None and len(texts) >= limit:
+                break
+    return texts
+
+
+def _timed_scores(service: ProfanityService, texts: list[str]) -> tuple[list[dict], float]:
+    """Score texts and return the results with the elapsed time in seconds."""
+    start_time = time.perf_counter()
+    results = service.check_batch(texts)
+    return results, time.perf_counter() - start_time
+
+
+def drift_report(
+    reference: ProfanityService,
+    quantized: ProfanityService,
+    texts: list[str],
+    precision: str = "int8",
+) -> dict[str, Any]:
+    """
+    Compare the results of the fp32 and the reduced precision model on the same texts.
+
+    Args:
+        reference: Service running the fp32 model
+        quantized: Service running the reduced precision model
+        texts: The sample texts
+        precision: Precision of the quantized model, used in the report keys
+
+    Returns:
+        Dict: Drift statistics, decision flips and timings
+    """
+    # Warm up both models so the timings do not include one-off allocations
+    reference.check_batch(texts[:1])
+    quantized.check_batch(texts[:1])
+
+    expected, reference_time = _timed_scores(reference, texts)
+    actual, quantized_time = _timed_scores(quantized, texts)
+
+    drifts = [abs(a["confidence"] - e["confidence"]) for a, e in zip(actual, expected)]
+    flips = [
+        {
+            "text": text,
+            "fp32_confidence": e["confidence"],
+            f"{precision}_confidence": a["confidence"],
+        }
+        for text, a, e in zip(texts, actual, expected)
+        if a["is_profane"] != e["is_profane"]
+    ]
+
+    return {
+        "samples": len(texts),
+        "mean_abs_drift": statistics.fmean(drifts),
+        "p95_abs_drift": sorted(drifts)[int(0.95 * (len(drifts) - 1))],
+        "max_abs_drift": max(drifts),
+        "decision_flips": len(flips),
+        "flip_rate": len(flips) / len(texts),
+        "flipped_samples": flips[:20],
+        "fp32_seconds": reference_time,
+        f"{precision}_seconds": quantized_time,
+        "speedup": reference_time / quantized_time if quantized_time else None,
+    }
+
+
+def _service(s: Settings, precision: str) -> ProfanityService:
+    """Create an uncached torch service with the given precision that scores every text with the model."""
+    return ProfanityService(
+        s.model_copy(
+            update={
+                "MODEL_BACKEND": "torch",
+                "MODEL_PRECISION": precision,
+                "CACHE_MAX_SIZE": 0,
+                # Prefilter decisions would count as zero drift
+                "PREFILTER_ENABLED": False,
+            }
+        )
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Report the confidence drift of the INT8 or bf16 model against the fp32 model."
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["int8", "bf16"],
+        default="int8",
+        help="Precision to compare against fp32",
+    )
+    parser.add_argument("samples", type=Path, help="Text file (one text per line) or JSONL file")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of samples")
+    parser.add_argument("--output", type=Path, default=None, help="Write the report to a file")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    setup_logging(settings)
+
+    texts = read_samples(args.samples, args.limit)
+    if not texts:
+        parser.error(f"No samples found in {args.samples}")
+
+    report = drift_report(
+        _service(settings, "fp32"), _service(settings, args.precision), texts, args.precision
+    )
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
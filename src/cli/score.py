@@ -0,0 +1,454 @@
+"""
+Score a JSONL or CSV corpus offline on all CPU cores.
+
+Usage:
+    python -m src.cli.score input.jsonl output.jsonl [--workers 8] [--text-field text]
+
+Input and output formats follow the file suffix (.jsonl or .csv). Each input
+row needs a text field and may have an id field that is copied to the output
+(the row number is used otherwise). The input is read as a stream and scored
+in chunks by a pool of worker processes, one model each, and the results are
+appended to the output in input order.
+
+Progress is checkpointed next to the output file. Running the same command
+again after an interruption continues where the last checkpoint left off;
+pass --restart to start from the beginning instead.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+from src.config import Settings, get_settings
+from src.config.logging import get_logger, setup_logging
+from src.server import worker_torch_threads
+from src.services.profanity import ProfanityService
+
+logger = get_logger("cli.score")
+
+FORMATS = ("jsonl", "csv")
+OUTPUT_FIELDS = ("id", "is_profane", "confidence", "decided_by", "error")
+
+# The model of this process, loaded before the worker processes are forked
+_service: Optional[ProfanityService] = None
+
+
+class _OffsetLines:
+    """Iterates over the decoded lines of a binary file, tracking the byte offset."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self) -> "_OffsetLines":
+        return self
+
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8", errors="replace")
+
+    def seek(self, offset: int) -> None:
+        """Continue reading at a byte offset."""
+        self.f.seek(offset)
+        self.offset = offset
+
+
+def file_format(path: Path, fmt: Optional[str] = None) -> str:
+    """
+    Get the format of a corpus file.
+
+    Args:
+        path: The file
+        fmt: An explicitly requested format, taking precedence over the suffix
+
+    Returns:
+        str: "jsonl" or "csv"
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    fmt = fmt or path.suffix.lstrip(".").lower()
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r} of {path}, use .jsonl or .csv")
+    return fmt
+
+
+def _record(row: Any, row_number: int, text_field: str, id_field: str) -> dict[str, Any]:
+    """Turn a parsed input row into a record with an id and a text or an error."""
+    if not isinstance(row, dict):
+        return {"id": row_number, "error": "Row is not an object"}
+
+    record = {"id": row.get(id_field, row_number)}
+    text = row.get(text_field)
+    if isinstance(text, str):
+        record["text"] = text
+    else:
+        record["error"] = f'Row has no "{text_field}" text'
+    return record
+
+
+def read_records(
+    f: BinaryIO,
+    fmt: str,
+    offset: int = 0,
+    first_row: int = 0,
+    text_field: str = "text",
+    id_field: str = "id",
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Read the records of a corpus file one at a time.
+
+    Args:
+        f: The corpus file, opened in binary mode
+        fmt: "jsonl" or "csv" (with a header row)
+        offset: Byte offset to start reading at (0, or an offset yielded before)
+        first_row: Row number of the first row read
+        text_field: Field (or column) with the text
+        id_field: Field (or column) with the id
+
+    Yields:
+        Tuple[int, Dict]: Byte offset after the row, and a record with the id
+        and either the text or an error
+    """
+    lines = _OffsetLines(f)
+    row_number = first_row
+
+    if fmt == "csv":
+        rows = csv.reader(lines)
+        header = next(rows, None)
+        if offset > lines.offset:
+            lines.seek(offset)
+        for values in rows:
+            if values:
+                row = dict(zip(header, values))
+                yield lines.offset, _record(row, row_number, text_field, id_field)
+                row_number += 1
+        return
+
+    lines.seek(offset)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            record = {"id": row_number, "error": "Row is not valid JSON"}
+        else:
+            record = _record(row, row_number, text_field, id_field)
+        yield lines.offset, record
+        row_number += 1
+
+
+def _chunks(
+    records: Iterator[tuple[int, dict[str, Any]]], chunk_size: int
+) -> Iterator[tuple[int, int, list[dict[str, Any]]]]:
+    """Group records into chunks with the byte offset and row count after each chunk."""
+    chunk: list[dict[str, Any]] = []
+    offset = 0
+    for offset, record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield offset, len(chunk), chunk
+            chunk = []
+    if chunk:
+        yield offset, len(chunk), chunk
+
+
+def _init_worker(s: Settings, torch_threads: int) -> None:
+    """Set up a worker process, loading the model unless it was inherited."""
+    global _service
+
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    if _service is None:
+        _service = ProfanityService(s)
+
+
+def _score_texts(texts: list[str]) -> list[dict[str, Any]]:
+    """Score texts with the model of the current worker process."""
+    return _service.check_batch(texts)
+
+
+class _Writer:
+    """Appends result rows to the output file."""
+
+    def __init__(self, path: Path, fmt: str, size: int):
+        """
+        Open the output file, dropping anything written after the last checkpoint.
+
+        Args:
+            path: The output file
+            fmt: "jsonl" or "csv"
+            size: Size of the output at the last checkpoint (0 to start over)
+        """
+        self.fmt = fmt
+        self.f = path.open("r+" if size else "w", encoding="utf-8", newline="")
+        self.f.seek(size)
+        self.f.truncate()
+
+        self.csv = csv.DictWriter(self.f, OUTPUT_FIELDS, extrasaction="ignore")
+        if fmt == "csv" and not size:
+            self.csv.writeheader()
+
+    def write(self, records: list[dict[str, Any]]) -> None:
+        """Write the result rows of scored records."""
+        for record in records:
+            record.pop("text", None)
+            if self.fmt == "csv":
+                self.csv.writerow(record)
+            else:
+                self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def tell(self) -> int:
+        """Size of the output written so far."""
+        return self.f.tell()
+
+    def sync(self) -> None:
+        """Write everything to disk."""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def _read_checkpoint(path: Path, input_path: Path, output_path: Path) -> Optional[dict[str, Any]]:
+    """Read the checkpoint of a run, or None if there is none."""
+    try:
+        checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+    if checkpoint.get("input") != str(input_path.resolve()):
+        raise ValueError(f"Checkpoint {path} belongs to another input: {checkpoint.get('input')}")
+    if checkpoint["input_offset"] > input_path.stat().st_size:
+        raise ValueError(f"Input {input_path} is shorter than when checkpoint {path} was written")
+    if not output_path.exists() or checkpoint["output_size"] > output_path.stat().st_size:
+        raise ValueError(f"Output {output_path} is shorter than when checkpoint {path} was written")
+    return checkpoint
+
+
+def _write_checkpoint(path: Path, checkpoint: dict[str, Any]) -> None:
+    """Write a checkpoint atomically, so an interruption never leaves a partial one."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(checkpoint), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _executor(s: Settings, workers: int) -> Executor:
+    """
+    Create the pool of worker processes, or a single thread for one worker.
+
+    Where fork is available, the model is loaded once before forking, so the
+    workers start quickly and share the weight pages copy-on-write.
+    """
+    global _service
+
+    torch_threads = worker_torch_threads(s.model_copy(update={"WORKERS": workers}))
+    if workers <= 1:
+        _init_worker(s, torch_threads)
+        return ThreadPoolExecutor(max_workers=1)
+
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        if _service is None:
+            _service = ProfanityService(s)
+        # Keep collections in the workers from writing to (and copying) shared pages
+        gc.collect()
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+    else:
+        logger.warning("fork is not available, every worker process loads its own model")
+
+    logger.info(f"Starting {workers} worker processes ({torch_threads} torch threads each)")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(s, torch_threads),
+    )
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    s: Settings,
+    workers: int = 1,
+    chunk_size: int = 512,
+    input_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    text_field: str = "text",
+    id_field: str = "id",
+    checkpoint_seconds: float = 10.0,
+    restart: bool = False,
+) -> dict[str, Any]:
+    """
+    Score all rows of a corpus file and write the results, resuming from a checkpoint.
+
+    Args:
+        input_path: JSONL or CSV file to score
+        output_path: JSONL or CSV file to write the results to
+        s: Application settings for the model
+        workers: Number of worker processes, each running a model
+        chunk_size: Number of rows sent to a worker at a time
+        input_format: Format of the input, by default from its suffix
+        output_format: Format of the output, by default from its suffix
+        text_field: Field (or column) with the text
+        id_field: Field (or column) with the id copied to the output
+        checkpoint_seconds: Minimum time between checkpoints
+        restart: Ignore an existing checkpoint and start from the beginning
+
+    Returns:
+        Dict: Number of rows scored by this run and in total, errors, and elapsed seconds
+    """
+    input_format = file_format(input_path, input_format)
+    output_format = file_format(output_path, output_format)
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+
+    checkpoint = None if restart else _read_checkpoint(checkpoint_path, input_path, output_path)
+    if checkpoint is None:
+        checkpoint = {
+            "input": str(input_path.resolve()),
+            "input_offset": 0,
+            "output_size": 0,
+            "rows": 0,
+        }
+    else:
+        logger.info(f"Resuming after row {checkpoint['rows']} from {checkpoint_path}")
+
+    start_time = time.perf_counter()
+    rows_at_start = checkpoint["rows"]
+    errors = 0
+    checkpointed_at = time.monotonic()
+
+    writer = _Writer(output_path, output_format, checkpoint["output_size"])
+    executor = _executor(s, workers)
+    pending: deque[tuple[Future, int, int, list[dict[str, Any]]]] = deque()
+
+    def finish_oldest() -> None:
+        """Write the results of the oldest chunk and checkpoint now and then."""
+        nonlocal errors, checkpointed_at
+        future, offset, rows, chunk = pending.popleft()
+
+        valid = [record for record in chunk if "text" in record]
+        for record, result in zip(valid, future.result()):
+            record.update(result)
+        errors += len(chunk) - len(valid)
+        writer.write(chunk)
+
+        checkpoint["input_offset"] = offset
+        checkpoint["output_size"] = writer.tell()
+        checkpoint["rows"] += rows
+        if time.monotonic() - checkpointed_at >= checkpoint_seconds:
+            writer.sync()
+            _write_checkpoint(checkpoint_path, checkpoint)
+            checkpointed_at = time.monotonic()
+
+            elapsed = time.perf_counter() - start_time
+            scored = checkpoint["rows"] - rows_at_start
+            logger.info(f"Scored {checkpoint['rows']} rows ({scored / elapsed:.0f} rows/s)")
+
+    try:
+        with input_path.open("rb") as f:
+            records = read_records(
+                f,
+                input_format,
+                checkpoint["input_offset"],
+                checkpoint["rows"],
+                text_field,
+                id_field,
+            )
+            for offset, rows, chunk in _chunks(records, max(1, chunk_size)):
+                texts = [record["text"] for record in chunk if "text" in record]
+                pending.append((executor.submit(_score_texts, texts), offset, rows, chunk))
+                # Keep every worker busy, but do not read far ahead of the results
+                if len(pending) >= 2 * max(1, workers):
+                    finish_oldest()
+
+        while pending:
+            finish_oldest()
+    finally:
+        # Checkpoint the chunks written so far, also when interrupted
+        executor.shutdown(cancel_futures=True)
+        writer.sync()
+        writer.close()
+        _write_checkpoint(checkpoint_path, checkpoint)
+
+    checkpoint_path.unlink()
+    elapsed = time.perf_counter() - start_time
+    return {
+        "rows": checkpoint["rows"] - rows_at_start,
+        "total_rows": checkpoint["rows"],
+        "errors": errors,
+        "seconds": elapsed,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score a JSONL or CSV corpus offline.")
+    parser.add_argument("input", type=Path, help="JSONL or CSV file to score")
+    parser.add_argument("output", type=Path, help="JSONL or CSV file to write the results to")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes, each running a model (default: one per CPU core)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=512, help="Rows per worker task")
+    parser.add_argument("--input-format", choices=FORMATS, default=None)
+    parser.add_argument("--output-format", choices=FORMATS, default=None)
+    parser.add_argument("--text-field", default="text", help="Field or column with the text")
+    parser.add_argument("--id-field", default="id", help="Field or column with the row id")
+    parser.add_argument(
+        "--checkpoint-seconds", type=float, default=10.0, help="Time between checkpoints"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and start from scratch"
+    )
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    setup_logging(settings)
+
+    try:
+        stats = score_file(
+            args.input,
+            args.output,
+            settings,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            input_format=args.input_format,
+            output_format=args.output_format,
+            text_field=args.text_field,
+            id_field=args.id_field,
+            checkpoint_seconds=args.checkpoint_seconds,
+            restart=args.restart,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, run the same command again to resume")
+        return 130
+
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,51 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
 from src.config import Settings
 
+# Drains the log queue on a background thread, see setup_logging()
+_listener: Optional[QueueListener] = None
+
 
 def setup_logging(settings: Settings) -> None:
     """
     Setup application logging with a custom format.
 
+    Log records are only put on a queue by the logging thread (e.g. the event
+    loop). A background thread formats them and writes them to stdout, so
+    slow output never blocks request handling.
+
     Args:
         settings: Application settings with log level
     """
+    global _listener
+
     log_level = getattr(logging, settings.LOG_LEVEL.upper())
 
-    # Define a custom format with timestamp, level, and module info
-    log_format = "%(asctime)s | %(levelname)-8s | %(name)s:%(lineno)d | %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
+    if _listener is None:
+        # Define a custom format with timestamp, level, and module info
+        log_format = "%(asctime)s | %(levelname)-8s | %(name)s:%(lineno)d | %(message)s"
+        date_format = "%Y-%m-%d %H:%M:%S"
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
 
-    # Configure the root logger
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        datefmt=date_format,
-        stream=sys.stdout,
-    )
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        # Only the listener's handler formats, the queued message is the plain text
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.setFormatter(logging.Formatter("%(message)s"))
+        logging.getLogger().addHandler(queue_handler)
+
+    logging.getLogger().setLevel(log_level)
 
     # Turn down verbosity for some libraries
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -36,6 +58,28 @@ def setup_logging(settings: Settings) -> None:
     logger.info(f"Logging initialized at level: {settings.LOG_LEVEL}")
 
 
+def stop_logging() -> None:
+    """Write out all queued log records and stop the background thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork() -> None:
+    """Start a new background thread in a forked child, which inherits no threads."""
+    global _listener
+
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger with the given name.
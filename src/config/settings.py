@@ -1,6 +1,7 @@
 from functools import lru_cache
+from typing import Optional
 
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,21 +11,256 @@ class Settings(BaseSettings):
     # GENERAL
     LOG_LEVEL: str = "INFO"
     DATA_DIR: str = "./temp"  # Default to local temp directory for development
+    LOG_SAMPLE_RATE: float = Field(
+        default=1.0, description="Share of successful requests that are logged (errors always are)"
+    )
 
     # API settings
     API_TITLE: str = "Bad Words API"
     API_DESCRIPTION: str = "An API for profanity detection"
     API_VERSION: str = "1.0.0"
     MAX_TEXT_LENGTH: int = Field(default=500, description="Maximum character length for text input")
+    MAX_BATCH_ITEMS: int = Field(
+        default=1000, description="Maximum number of texts in a single batch request"
+    )
+
+    MAX_LONG_TEXT_LENGTH: int = Field(
+        default=20000, description="Maximum character length for text scored in windows"
+    )
 
     # Rate limiting settings
     RATE_LIMIT_DEFAULT: str = "10/minute"
+    RATE_LIMIT_ROUTES: dict[str, str] = Field(
+        default={},
+        description='Rate limits by route path template overriding the default, e.g. {"/api/v1/jobs/{job_id}": "60/minute"}',
+    )
+    RATE_LIMIT_EXEMPT_PATHS: list[str] = Field(
+        default=[
+            "/api/v1/health",
+            "/api/v1/ready",
+            "/metrics",
+            "/docs",
+            "/redoc",
+            "/openapi.json",
+        ],
+        description="Route path templates that are never rate limited",
+    )
+    RATE_LIMIT_STORAGE_URI: str = Field(
+        default="shared://",
+        description="Where rate limit counters live: memory://, shared:// (all workers) or redis://host:port/db",
+    )
+    RATE_LIMIT_MAX_CLIENTS: int = Field(
+        default=65536, description="Number of client buckets kept by memory and shared storage"
+    )
 
     # AI Settings
     MODEL_NAME: str = Field(
         default="ml6team/distilbert-base-german-cased-toxic-comments",
         description="The AI model to use",
     )
+    MODEL_BACKEND: str = Field(
+        default="torch",
+        description="Inference backend to run the model with (torch, torchscript or onnx)",
+    )
+    MODEL_PRECISION: str = Field(
+        default="fp32",
+        description="Weight precision of the model (fp32, or int8 or bf16 for the torch backends)",
+    )
+    TORCHSCRIPT_SEQUENCE_BUCKETS: list[int] = Field(
+        default=[16, 32, 64, 96, 128, 192, 256, 384, 512],
+        description="Sequence lengths the torchscript backend traces the model for, batches are padded up to the next one",
+    )
+    WARMUP_ON_STARTUP: bool = Field(
+        default=True, description="Load and warm up the model in the background on startup"
+    )
+    WARMUP_BATCHES: int = Field(default=3, description="Number of dummy batches run on warmup")
+
+    # Model registry settings
+    DEFAULT_LANGUAGE: str = Field(
+        default="de",
+        description="Language served by MODEL_NAME, also used when no language is detected",
+    )
+    MODELS: dict[str, str] = Field(
+        default={},
+        description='Models of further languages by language code, e.g. {"en": "unitary/toxic-bert"}',
+    )
+    MODEL_MEMORY_BUDGET_MB: float = Field(
+        default=0,
+        description="Idle models are unloaded to keep all models within this size (0 for no limit)",
+    )
+
+    # Inference batching settings
+    BATCH_MAX_SIZE: int = Field(
+        default=32, description="Maximum number of texts scored in one forward pass"
+    )
+    BATCH_MAX_WAIT_MS: float = Field(
+        default=5.0,
+        description="Maximum time in milliseconds a request waits for a batch to fill up",
+    )
+    BATCH_MAX_TOKENS: int = Field(
+        default=0,
+        description="Maximum padded tokens (texts times sequence length) per forward pass, "
+        "bounding activation memory (0 for no limit)",
+    )
+
+    # Admission control settings
+    ADMISSION_MAX_QUEUED: int = Field(
+        default=1000,
+        description="Texts waiting for a batch (per model) above which checks answer 503 (0 for no limit)",
+    )
+    ADMISSION_MAX_WAIT_MS: float = Field(
+        default=0,
+        description="Estimated queue wait above which checks answer 503 (0 for no limit)",
+    )
+    REQUEST_TIMEOUT_MS: Optional[float] = Field(
+        default=None,
+        description="Deadline of check requests that send no X-Request-Deadline-Ms header (none if unset)",
+    )
+
+    # Long text settings
+    WINDOW_MAX_TOKENS: int = Field(
+        default=512,
+        gt=2,
+        description="Tokens per window (including special tokens) for long texts, at most the model's maximum",
+    )
+    WINDOW_OVERLAP_TOKENS: int = Field(
+        default=64,
+        ge=0,
+        description="Tokens shared by consecutive windows of a long text, less than WINDOW_MAX_TOKENS - 2",
+    )
+
+    # Censor endpoint settings
+    CENSOR_MAX_ROUNDS: int = Field(
+        default=3,
+        description="Rounds of batched occlusion scoring when locating the profane words of a text",
+    )
+
+    # Streaming endpoint settings
+    STREAM_CHUNK_SIZE: int = Field(
+        default=256, description="Number of streamed texts scored per inference call"
+    )
+    STREAM_MAX_PENDING_CHUNKS: int = Field(
+        default=4, description="Parsed chunks buffered per stream before reading pauses"
+    )
+
+    # Inference executor settings
+    INFERENCE_WORKERS: int = Field(
+        default=1, description="Number of threads running forward passes concurrently"
+    )
+    TORCH_NUM_THREADS: Optional[int] = Field(
+        default=None, description="Intra-op threads used by torch (torch default if unset)"
+    )
+    TORCH_INTEROP_THREADS: Optional[int] = Field(
+        default=None, description="Inter-op threads used by torch (torch default if unset)"
+    )
+
+    # Production server settings
+    WORKERS: int = Field(
+        default=1, description="Number of worker processes sharing one loaded model"
+    )
+    WORKER_TORCH_THREADS: Optional[int] = Field(
+        default=None,
+        description="Torch intra-op threads per worker (CPU cores split across workers if unset)",
+    )
+
+    # Prefilter settings
+    PREFILTER_ENABLED: bool = Field(
+        default=False,
+        description="Decide clear cases with the block- and allowlist in DATA_DIR/prefilter",
+    )
+    PREFILTER_MIN_TEXT_LENGTH: int = Field(
+        default=2, description="Texts with fewer non-space characters are clean"
+    )
+    PREFILTER_RELOAD_INTERVAL_SECONDS: float = Field(
+        default=5.0, description="How often the prefilter checks its lists for changes"
+    )
+
+    # Metrics settings
+    METRICS_DIR: Optional[str] = Field(
+        default=None,
+        description="Directory where worker processes share metrics (DATA_DIR/metrics if unset)",
+    )
+
+    # Profiling settings
+    PROFILING_ADMIN_TOKEN: Optional[str] = Field(
+        default=None,
+        description="Token in the X-Admin-Token header that allows requesting and downloading profiles (profiling endpoints are off if unset)",
+    )
+    PROFILING_SAMPLE_RATE: float = Field(
+        default=0.0,
+        description="Share of inference calls that are profiled without being requested",
+    )
+    PROFILING_MAX_PROFILES: int = Field(
+        default=20,
+        description="Number of profiles kept in DATA_DIR/profiles before the oldest are deleted",
+    )
+
+    # Tokenization settings
+    TOKENIZER_PAD_MULTIPLE: int = Field(
+        default=8,
+        description="Batches are padded to their longest sequence rounded up to a multiple of this",
+    )
+    TOKEN_CACHE_MAX_SIZE: int = Field(
+        default=10000, description="Maximum number of texts whose token ids are cached (0 disables)"
+    )
+    TOKENIZER_REQUIRE_FAST: bool = Field(
+        default=False, description="Fail on startup instead of warning if no fast tokenizer exists"
+    )
+
+    # Job queue settings
+    JOBS_ENABLED: bool = Field(
+        default=True, description="Score submitted jobs in background workers of every process"
+    )
+    JOBS_DB_PATH: Optional[str] = Field(
+        default=None,
+        description="SQLite database of the job queue (DATA_DIR/jobs/jobs.sqlite3 if unset)",
+    )
+    JOBS_WORKERS: int = Field(default=1, description="Jobs scored at the same time per process")
+    JOBS_CHUNK_SIZE: int = Field(
+        default=256, description="Texts of a job scored and stored at once"
+    )
+    JOBS_MAX_ITEMS: int = Field(default=100000, description="Maximum number of texts in one job")
+    JOBS_MAX_QUEUED_TEXTS: int = Field(
+        default=1000000,
+        description="Texts waiting across all jobs before new jobs are refused with 503",
+    )
+    JOBS_POLL_INTERVAL_SECONDS: float = Field(
+        default=1.0, description="How often idle job workers look for new jobs"
+    )
+    JOBS_STALE_SECONDS: float = Field(
+        default=60.0,
+        description="Running jobs whose worker stopped reporting for this long are taken over",
+    )
+    JOBS_MAX_ATTEMPTS: int = Field(
+        default=3, ge=1, description="Times a chunk of a job is scored before the job fails"
+    )
+    JOBS_RETRY_BACKOFF_SECONDS: float = Field(
+        default=1.0,
+        ge=0,
+        description="Wait before retrying a failed chunk of a job, doubled for each retry",
+    )
+    JOBS_RETENTION_SECONDS: float = Field(
+        default=86400.0, description="Time after which finished jobs and their results are deleted"
+    )
+
+    # Result cache settings
+    CACHE_MAX_SIZE: int = Field(
+        default=10000, description="Maximum number of cached results (0 disables the cache)"
+    )
+    CACHE_TTL_SECONDS: float = Field(
+        default=3600.0, description="Time in seconds after which a cached result expires"
+    )
+
+    @model_validator(mode="after")
+    def _check_windows(self) -> "Settings":
+        """Make sure consecutive windows advance by at least one token."""
+        # Each window also holds the special tokens around the text ([CLS] and [SEP])
+        if self.WINDOW_OVERLAP_TOKENS >= self.WINDOW_MAX_TOKENS - 2:
+            raise ValueError(
+                f"WINDOW_OVERLAP_TOKENS ({self.WINDOW_OVERLAP_TOKENS}) must be less than "
+                f"WINDOW_MAX_TOKENS - 2 ({self.WINDOW_MAX_TOKENS - 2})"
+            )
+        return self
 
     model_config = SettingsConfigDict(
         env_file=".env",
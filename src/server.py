@@ -0,0 +1,173 @@
+import contextlib
+import gc
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+from src.config import Settings
+from src.config.logging import get_logger, stop_logging
+from src.services.metrics import mark_worker_dead, setup_multiprocess_metrics
+from src.services.registry import get_model_registry
+
+logger = get_logger("server")
+
+
+def worker_torch_threads(s: Settings) -> int:
+    """
+    Get the number of torch intra-op threads for each worker process.
+
+    Args:
+        s: Application settings with WORKERS and WORKER_TORCH_THREADS
+
+    Returns:
+        int: WORKER_TORCH_THREADS, or the CPU cores split evenly across workers
+    """
+    if s.WORKER_TORCH_THREADS:
+        return s.WORKER_TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, s.WORKERS))
+
+
+def serve(app: FastAPI, s: Settings, host: str, port: int) -> None:
+    """
+    Run the production server.
+
+    The model and tokenizer are loaded once in this process before WORKERS
+    worker processes are forked. The workers share the weight pages
+    copy-on-write, so memory does not grow with the number of workers.
+    Workers that exit unexpectedly are restarted. Metrics of all workers are
+    shared through files in METRICS_DIR, so /metrics reports the whole server.
+
+    Args:
+        app: The FastAPI application to serve
+        s: Application settings
+        host: Address to bind to
+        port: Port to bind to
+    """
+    workers = max(1, s.WORKERS)
+    log_level = s.LOG_LEVEL.lower()
+    multiple_workers = workers > 1 and hasattr(os, "fork")
+
+    # Workers must share their metrics, which has to be set up before first use
+    if multiple_workers:
+        setup_multiprocess_metrics(s)
+
+    # Load the model before accepting traffic (and before forking, so all
+    # workers share one copy)
+    get_model_registry().preload()
+
+    if not multiple_workers:
+        logger.info("Starting production server with a single worker")
+        if s.WORKER_TORCH_THREADS:
+            import torch
+
+            torch.set_num_threads(s.WORKER_TORCH_THREADS)
+        uvicorn.run(app, host=host, port=port, log_level=log_level)
+        return
+
+    # Move everything allocated so far out of the garbage collector's reach,
+    # so collections in the workers do not write to (and copy) shared pages
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    threads = worker_torch_threads(s)
+    logger.info(
+        f"Starting production server on {host}:{port} with {workers} workers "
+        f"({threads} torch threads each)"
+    )
+
+    _Supervisor(app, sock, workers, threads, log_level).run()
+
+
+class _Supervisor:
+    """Forks worker processes and restarts them until asked to stop."""
+
+    def __init__(
+        self, app: FastAPI, sock: socket.socket, workers: int, torch_threads: int, log_level: str
+    ):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.log_level = log_level
+
+        self.children: dict[int, int] = {}
+        self.stopping = False
+
+    def run(self) -> None:
+        """Start all workers and supervise them until they have all exited."""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            index = self.children.pop(pid, None)
+            mark_worker_dead(pid)
+            if index is None or self.stopping:
+                continue
+
+            logger.error(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            self._spawn(index)
+
+        self.sock.close()
+        logger.info("Production server stopped")
+
+    def _spawn(self, index: int) -> None:
+        """Fork a worker process serving the shared socket."""
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            logger.info(f"Started worker {index} (pid {pid})")
+            return
+
+        exit_code = 0
+        try:
+            self._run_worker()
+        except BaseException as e:
+            logger.error(f"Worker {index} crashed: {e}")
+            exit_code = 1
+        finally:
+            # Write out queued log lines, since os._exit skips atexit handlers
+            stop_logging()
+            # Never return into the supervisor's code in the child process
+            os._exit(exit_code)
+
+    def _run_worker(self) -> None:
+        """Run uvicorn on the inherited socket in the current (child) process."""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        import torch
+
+        torch.set_num_threads(self.torch_threads)
+
+        config = uvicorn.Config(self.app, log_level=self.log_level)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _handle_stop(self, signum, frame) -> None:
+        """Forward a stop signal to all workers."""
+        if self.stopping:
+            return
+
+        self.stopping = True
+        logger.info(f"Received signal {signum}, stopping {len(self.children)} workers")
+        for pid in self.children:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
@@ -0,0 +1,602 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import torch
+import transformers
+from packaging.version import Version
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+from src.config import Settings
+from src.config.logging import get_logger
+from src.services.tokenization import MAX_SEQUENCE_LENGTH
+
+logger = get_logger("services.backends")
+
+
+class InferenceBackend:
+    """
+    Base class for backends running the forward pass of the classification model.
+    """
+
+    name = "base"
+
+    @classmethod
+    def load(cls, model_dir: Path, s: Settings) -> "InferenceBackend":
+        """
+        Load the backend for the configured model.
+
+        Args:
+            model_dir: Directory holding the locally saved model
+            s: Application settings
+
+        Returns:
+            InferenceBackend: The loaded backend
+        """
+        raise NotImplementedError
+
+    def predict(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """
+        Run one forward pass.
+
+        Args:
+            input_ids: Padded token ids of shape (batch, sequence)
+            attention_mask: Attention mask of shape (batch, sequence)
+
+        Returns:
+            torch.Tensor: Logits of shape (batch, labels)
+        """
+        raise NotImplementedError
+
+    def memory_bytes(self) -> int:
+        """
+        Estimate the memory held by the loaded model.
+
+        Returns:
+            int: Size of the model weights in bytes
+        """
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """
+    Eager PyTorch backend using the Hugging Face model directly.
+
+    With MODEL_PRECISION=int8 the linear layers are dynamically quantized to
+    INT8. The quantized weights are saved next to the fp32 model, so the
+    conversion only happens once. With MODEL_PRECISION=bf16 the weights and
+    activations are bfloat16, which halves the memory they take. The
+    converted weights are saved next to the fp32 model in the same way.
+    """
+
+    name = "torch"
+
+    def __init__(self, model: Any):
+        """
+        Initialize the backend.
+
+        Args:
+            model: A loaded AutoModelForSequenceClassification
+        """
+        self.model = model
+
+        # Set model to evaluation mode for inference
+        self.model.eval()
+
+    @classmethod
+    def load(cls, model_dir: Path, s: Settings) -> "TorchBackend":
+        if s.MODEL_PRECISION == "int8":
+            return cls(load_int8_model(model_dir, s.MODEL_NAME))
+        if s.MODEL_PRECISION == "bf16":
+            return cls(load_bf16_model(model_dir, s.MODEL_NAME))
+        return cls(load_torch_model(model_dir, s.MODEL_NAME))
+
+    def predict(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            # Get model outputs (no need for attention in production)
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+        # bf16 logits are too coarse for the confidence scores
+        return logits.float()
+
+    def memory_bytes(self) -> int:
+        # Tied weights share storage, count each storage once
+        storages = {}
+        for value in self.model.state_dict().values():
+            # INT8 linear layers keep their weights in (weight, bias) tuples
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if isinstance(tensor, torch.Tensor):
+                    storage = tensor.untyped_storage()
+                    storages[storage.data_ptr()] = storage.nbytes()
+        return sum(storages.values())
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    ONNX Runtime backend using a one-time export of the model.
+
+    The inference session is created on first use, so that it is never shared
+    across forked worker processes (ONNX Runtime thread pools do not survive
+    a fork).
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: Path):
+        """
+        Initialize the backend.
+
+        Args:
+            model_path: Path of the exported ONNX model
+        """
+        self.model_path = model_path
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_dir: Path, s: Settings) -> "OnnxBackend":
+        """Reuse the ONNX export of the model, exporting it first if necessary."""
+        if s.MODEL_PRECISION != "fp32":
+            raise ValueError(
+                f"MODEL_PRECISION={s.MODEL_PRECISION} is not supported by the onnx backend"
+            )
+        _require_onnxruntime()
+
+        onnx_path = model_dir / "onnx" / "model.onnx"
+        if onnx_path.exists():
+            logger.info(f"Using ONNX export from cache: {onnx_path}")
+        else:
+            export_onnx(load_torch_model(model_dir, s.MODEL_NAME), onnx_path)
+
+        return cls(onnx_path)
+
+    def predict(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        (logits,) = self._get_session().run(
+            ["logits"],
+            {"input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()},
+        )
+        return torch.from_numpy(logits)
+
+    def memory_bytes(self) -> int:
+        # The session holds about as much memory as the exported weights
+        return sum(path.stat().st_size for path in self.model_path.parent.iterdir())
+
+    def _get_session(self):
+        """Create the inference session on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import onnxruntime
+
+                    options = onnxruntime.SessionOptions()
+                    options.graph_optimization_level = (
+                        onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    )
+                    # Follow the torch thread settings of this process
+                    options.intra_op_num_threads = torch.get_num_threads()
+
+                    self._session = onnxruntime.InferenceSession(
+                        str(self.model_path), options, providers=["CPUExecutionProvider"]
+                    )
+                    logger.info(f"ONNX Runtime session created for {self.model_path}")
+        return self._session
+
+
+class TorchScriptBackend(InferenceBackend):
+    """
+    PyTorch backend running TorchScript graphs traced from the model.
+
+    The traced graphs run without the Python dispatch of every layer, which
+    is most of the cost of small batches in eager mode. The model is traced
+    once per sequence length bucket (TORCHSCRIPT_SEQUENCE_BUCKETS) into one
+    module that shares the weights, and every batch is padded up to its
+    bucket. The module is saved to DATA_DIR/models/<MODEL_NAME>/torchscript
+    under a key of the torch version, the precision and the revision of the
+    saved model, so later startups load it instead of tracing again. If
+    tracing fails, the backend falls back to eager mode.
+    """
+
+    name = "torchscript"
+
+    def __init__(self, module: Any, buckets: list[int]):
+        """
+        Initialize the backend.
+
+        Args:
+            module: The traced module, with a forward_<length> method per bucket
+            buckets: The sequence lengths the module was traced for, ascending
+        """
+        self.module = module
+        self.buckets = buckets
+
+        # Look the methods up once, attribute access on script modules is slow
+        self._forwards = {length: getattr(module, f"forward_{length}") for length in buckets}
+
+    @classmethod
+    def load(cls, model_dir: Path, s: Settings) -> InferenceBackend:
+        """Load the traced module of the model, tracing and saving it first if necessary."""
+        buckets = sorted({*s.TORCHSCRIPT_SEQUENCE_BUCKETS, MAX_SEQUENCE_LENGTH})
+        buckets = [length for length in buckets if 0 < length <= MAX_SEQUENCE_LENGTH]
+        source_dir = model_dir / PRECISION_DIRS[s.MODEL_PRECISION]
+
+        if source_dir.exists():
+            path = torchscript_path(model_dir, source_dir, s.MODEL_PRECISION, buckets)
+            if path.exists():
+                try:
+                    start_time = time.time()
+                    backend = cls(torch.jit.load(str(path)), buckets)
+                    logger.info(
+                        f"TorchScript model loaded from cache in {time.time() - start_time:.2f}s"
+                    )
+                    return backend
+                except Exception as e:
+                    logger.warning(f"Ignoring unusable TorchScript model {path}: {e}")
+
+        eager = TorchBackend.load(model_dir, s)
+        path = torchscript_path(model_dir, source_dir, s.MODEL_PRECISION, buckets)
+        try:
+            module = trace_torchscript(eager.model, buckets, path)
+        except Exception as e:
+            logger.warning(f"Tracing the model failed, falling back to eager mode: {e}")
+            return eager
+        return cls(module, buckets)
+
+    def predict(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        length = input_ids.shape[1]
+        bucket = next(bucket for bucket in self.buckets if bucket >= length)
+        if bucket > length:
+            # Padded positions are masked out, so their token id does not matter
+            input_ids = torch.nn.functional.pad(input_ids, (0, bucket - length))
+            attention_mask = torch.nn.functional.pad(attention_mask, (0, bucket - length))
+
+        with torch.no_grad():
+            return self._forwards[bucket](input_ids, attention_mask).float()
+
+    def memory_bytes(self) -> int:
+        storages = {}
+        for tensor in self.module.state_dict().values():
+            if isinstance(tensor, torch.Tensor):
+                storage = tensor.untyped_storage()
+                storages[storage.data_ptr()] = storage.nbytes()
+        return sum(storages.values())
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wraps a Hugging Face classifier so that it returns plain logits."""
+
+    def __init__(self, model: Any):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def load_torch_model(model_dir: Path, model_name: str) -> Any:
+    """
+    Load the model from disk if available, otherwise download and save it.
+
+    Args:
+        model_dir: Directory holding the locally saved model
+        model_name: Name of the model on the Hugging Face hub
+
+    Returns:
+        The loaded AutoModelForSequenceClassification
+    """
+    start_time = time.time()
+    model_path = model_dir / "model"
+
+    # Check if the model has been saved locally
+    if model_path.exists():
+        logger.info(f"Loading model from cache: {model_path}")
+        model = AutoModelForSequenceClassification.from_pretrained(str(model_path))
+        logger.info(f"Model loaded from cache in {time.time() - start_time:.2f}s")
+
+        # safetensors weights are memory-mapped on load instead of unpickled and
+        # copied, so convert models saved in the older pickle format once
+        if not any(model_path.glob("*.safetensors")):
+            logger.info(f"Converting cached model to safetensors: {model_path}")
+            model.save_pretrained(str(model_path))
+            for pickled in model_path.glob("pytorch_model*"):
+                pickled.unlink()
+    else:
+        # Download and save for future use
+        logger.info(f"Downloading model: {model_name}")
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+
+        logger.info(f"Saving model to: {model_path}")
+        model.save_pretrained(str(model_path))
+        logger.info(f"Model downloaded and saved in {time.time() - start_time:.2f}s")
+
+    return model
+
+
+def quantize_int8(model: Any) -> Any:
+    """
+    Apply dynamic INT8 quantization to the linear layers of a model.
+
+    Args:
+        model: A loaded AutoModelForSequenceClassification
+
+    Returns:
+        The quantized model (weights stored as INT8, activations quantized on the fly)
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model.eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_int8_model(model_dir: Path, model_name: str) -> Any:
+    """
+    Load the INT8 quantized model, quantizing and saving it first if necessary.
+
+    The quantized weights are stored in DATA_DIR/models/<MODEL_NAME>/model-int8
+    together with the model config, so later startups do not need the fp32 weights.
+
+    Args:
+        model_dir: Directory holding the locally saved model
+        model_name: Name of the model on the Hugging Face hub
+
+    Returns:
+        The quantized AutoModelForSequenceClassification
+    """
+    start_time = time.time()
+    int8_path = model_dir / "model-int8"
+    weights_path = int8_path / "quantized.pt"
+
+    if weights_path.exists():
+        logger.info(f"Loading INT8 model from cache: {int8_path}")
+        config = AutoConfig.from_pretrained(str(int8_path))
+        model = quantize_int8(AutoModelForSequenceClassification.from_config(config))
+        model.load_state_dict(torch.load(str(weights_path), mmap=True, weights_only=True))
+        logger.info(f"INT8 model loaded from cache in {time.time() - start_time:.2f}s")
+        return model
+
+    model = quantize_int8(load_torch_model(model_dir, model_name))
+
+    # Only a complete artifact may be picked up by later startups
+    tmp_path = int8_path.with_name(int8_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    model.config.save_pretrained(str(tmp_path))
+    torch.save(model.state_dict(), str(tmp_path / weights_path.name))
+    shutil.rmtree(int8_path, ignore_errors=True)
+    os.replace(tmp_path, int8_path)
+
+    logger.info(f"Model quantized to INT8 and saved in {time.time() - start_time:.2f}s")
+    return model
+
+
+def load_bf16_model(model_dir: Path, model_name: str) -> Any:
+    """
+    Load the model with bfloat16 weights, converting and saving it first if necessary.
+
+    The converted weights are stored as safetensors in
+    DATA_DIR/models/<MODEL_NAME>/model-bf16, so later startups memory-map half
+    as much as the fp32 weights and processes loading them share their pages.
+
+    Args:
+        model_dir: Directory holding the locally saved model
+        model_name: Name of the model on the Hugging Face hub
+
+    Returns:
+        The AutoModelForSequenceClassification with bfloat16 weights
+    """
+    start_time = time.time()
+    bf16_path = model_dir / "model-bf16"
+
+    if bf16_path.exists():
+        logger.info(f"Loading bf16 model from cache: {bf16_path}")
+        # Without an explicit dtype, older transformers versions upcast the weights to fp32
+        model = AutoModelForSequenceClassification.from_pretrained(
+            str(bf16_path), **_dtype_argument(torch.bfloat16)
+        )
+        logger.info(f"bf16 model loaded from cache in {time.time() - start_time:.2f}s")
+        return model
+
+    model = load_torch_model(model_dir, model_name).to(torch.bfloat16)
+
+    # Only a complete artifact may be picked up by later startups
+    tmp_path = bf16_path.with_name(bf16_path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(str(tmp_path))
+    shutil.rmtree(bf16_path, ignore_errors=True)
+    os.replace(tmp_path, bf16_path)
+
+    logger.info(f"Model converted to bf16 and saved in {time.time() - start_time:.2f}s")
+    return model
+
+
+def _dtype_argument(dtype: torch.dtype) -> dict[str, torch.dtype]:
+    """The from_pretrained argument loading the weights as dtype (torch_dtype before transformers 4.56)."""
+    if Version(transformers.__version__) >= Version("4.56"):
+        return {"dtype": dtype}
+    return {"torch_dtype": dtype}
+
+
+def torchscript_path(model_dir: Path, source_dir: Path, precision: str, buckets: list[int]) -> Path:
+    """
+    Get the path of the traced module for the current torch version and saved model.
+
+    The revision of the saved model is a digest of the names, sizes and
+    modification times of its files, so replaced weights are traced again.
+
+    Args:
+        model_dir: Directory holding the locally saved model
+        source_dir: Directory of the saved weights the module is traced from
+        precision: Weight precision of the model
+        buckets: The sequence lengths the module is traced for
+
+    Returns:
+        Path: DATA_DIR/models/<MODEL_NAME>/torchscript/<key>.pt
+    """
+    digest = hashlib.sha256(",".join(map(str, buckets)).encode())
+    for path in sorted(source_dir.iterdir()):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    return (
+        model_dir
+        / "torchscript"
+        / f"{precision}-torch{torch.__version__}-{digest.hexdigest()[:16]}.pt"
+    )
+
+
+def trace_torchscript(model: Any, buckets: list[int], path: Path) -> Any:
+    """
+    Trace a classifier for each sequence length bucket and save the traced module.
+
+    Each bucket becomes a forward_<length> method of one module sharing the
+    weights. The traced module is checked against the eager model before it
+    is saved, so a trace that went wrong is never used.
+
+    Args:
+        model: A loaded AutoModelForSequenceClassification
+        buckets: The sequence lengths to trace the model for
+        path: Where to save the traced module (older modules of its precision are deleted)
+
+    Returns:
+        The traced module
+
+    Raises:
+        ValueError: If the traced module does not reproduce the eager logits
+    """
+    start_time = time.time()
+    logger.info(f"Tracing model for sequence lengths {buckets}")
+
+    # trace_module traces methods by name, so give the wrapper one per bucket
+    wrapper_cls = type(
+        "_BucketedLogits", (_LogitsOnly,), {f"forward_{n}": _LogitsOnly.forward for n in buckets}
+    )
+    wrapper = wrapper_cls(model).eval()
+
+    with torch.no_grad():
+        module = torch.jit.trace_module(
+            wrapper, {f"forward_{length}": _example_inputs(length) for length in buckets}
+        )
+
+        for length in buckets:
+            inputs = _example_inputs(length, batch_size=3)
+            if not torch.allclose(
+                getattr(module, f"forward_{length}")(*inputs), wrapper(*inputs), atol=1e-4
+            ):
+                raise ValueError(f"Traced model does not match the eager model at length {length}")
+
+    # Only a complete module may be picked up by later startups
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    torch.jit.save(module, str(tmp_path))
+    # Modules traced for another torch version or revision are never loaded again
+    precision = path.name.split("-", 1)[0]
+    for stale in path.parent.glob(f"{precision}-*.pt"):
+        stale.unlink()
+    os.replace(tmp_path, path)
+
+    logger.info(f"Model traced and saved in {time.time() - start_time:.2f}s")
+    return module
+
+
+def _example_inputs(length: int, batch_size: int = 2) -> tuple[torch.Tensor, torch.Tensor]:
+    """Build example inputs with some padding, so that the trace covers masking."""
+    input_ids = (
+        torch.arange(batch_size * length, dtype=torch.long).reshape(batch_size, length) % 7 + 1
+    )
+    attention_mask = torch.ones_like(input_ids)
+    attention_mask[-1, length // 2 :] = 0
+    return input_ids, attention_mask
+
+
+def export_onnx(model: Any, onnx_path: Path) -> None:
+    """
+    Export a classifier to ONNX with dynamic batch and sequence dimensions.
+
+    Args:
+        model: A loaded AutoModelForSequenceClassification
+        onnx_path: Where to write the exported model
+    """
+    start_time = time.time()
+    logger.info(f"Exporting model to ONNX: {onnx_path}")
+
+    # Write into a temporary directory, since large weights are saved next to
+    # the graph as external data that must keep its file name
+    tmp_dir = onnx_path.parent.with_name(onnx_path.parent.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    # Separate example tensors, otherwise the exporter treats both inputs as one
+    input_ids = torch.ones((2, 8), dtype=torch.long)
+    attention_mask = torch.ones((2, 8), dtype=torch.long)
+    torch.onnx.export(
+        _LogitsOnly(model).eval(),
+        (input_ids, attention_mask),
+        str(tmp_dir / onnx_path.name),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+        dynamo=True,
+    )
+
+    # Only a complete export may be picked up by later startups
+    shutil.rmtree(onnx_path.parent, ignore_errors=True)
+    os.replace(tmp_dir, onnx_path.parent)
+    logger.info(f"ONNX export finished in {time.time() - start_time:.2f}s")
+
+
+def _require_onnxruntime() -> None:
+    """Raise a helpful error if the optional ONNX dependencies are missing."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "MODEL_BACKEND=onnx requires the optional ONNX dependencies: "
+            "pip install 'bad-words[onnx]'"
+        ) from e
+
+
+BACKENDS: dict[str, type[InferenceBackend]] = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+}
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+# Directory of the saved weights of each precision, next to the tokenizer
+PRECISION_DIRS = {"fp32": "model", "int8": "model-int8", "bf16": "model-bf16"}
+
+
+def create_backend(s: Settings, model_dir: Path) -> InferenceBackend:
+    """
+    Create the inference backend selected by MODEL_BACKEND.
+
+    Args:
+        s: Application settings
+        model_dir: Directory holding the locally saved model
+
+    Returns:
+        InferenceBackend: The loaded backend
+
+    Raises:
+        ValueError: If MODEL_BACKEND or MODEL_PRECISION has an unknown value
+    """
+    backend_cls: Optional[type[InferenceBackend]] = BACKENDS.get(s.MODEL_BACKEND)
+    if backend_cls is None:
+        raise ValueError(
+            f"Unknown MODEL_BACKEND {s.MODEL_BACKEND!r}, expected one of: {', '.join(BACKENDS)}"
+        )
+    if s.MODEL_PRECISION not in PRECISIONS:
+        raise ValueError(
+            f"Unknown MODEL_PRECISION {s.MODEL_PRECISION!r}, expected one of: {', '.join(PRECISIONS)}"
+        )
+
+    logger.info(f"Using inference backend: {backend_cls.name} ({s.MODEL_PRECISION})")
+    return backend_cls.load(model_dir, s)
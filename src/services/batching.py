@@ -0,0 +1,325 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Optional
+
+from src.config import get_settings
+from src.config.logging import get_logger
+from src.services.executor import run_inference
+from src.services.metrics import get_metrics
+from src.services.profanity import ProfanityService, get_profanity_service
+from src.services.profiling import request_profile, requested_profile
+
+logger = get_logger("services.batching")
+
+# Weight of the latest batch in the moving average of the batch duration
+_DURATION_SMOOTHING = 0.2
+
+
+class OverloadedError(Exception):
+    """Raised when a text is refused because it would wait too long for a batch."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason.replace('_', ' ')})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _QueuedText:
+    """A text waiting for a batch, with the future its caller awaits."""
+
+    __slots__ = ("enqueued_at", "future", "profile_id", "queued", "text")
+
+    def __init__(self, text: str, future: asyncio.Future):
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.queued = True
+        # The batch runs in the scheduler's context, so carry the caller's profile request over
+        self.profile_id = requested_profile()
+
+
+class BatchScheduler:
+    """
+    Collects concurrent check requests into batches for the profanity service.
+
+    Each call to submit() enqueues a single text. A background task takes the
+    queued texts, waits at most max_wait_ms for the batch to fill up to
+    max_batch_size, runs one batched forward pass on the inference executor
+    and hands every caller its own result. While max_concurrent_batches
+    batches are running, new texts keep queueing and form the next batch.
+
+    Under overload, texts are refused up front (admission control) once
+    max_queued texts are waiting or the estimated wait exceeds max_queue_wait_ms
+    or the caller's deadline. Texts whose caller gave up (cancelled the
+    submit) while queued are dropped before they reach the model.
+    """
+
+    def __init__(
+        self,
+        service: ProfanityService,
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_concurrent_batches: int = 1,
+        max_queued: int = 0,
+        max_queue_wait_ms: float = 0,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            service: The profanity service used to score batches
+            max_batch_size: Maximum number of texts per forward pass
+            max_wait_ms: Maximum time to wait for a batch to fill up
+            max_concurrent_batches: Maximum number of batches scored at the same time
+            max_queued: Waiting texts above which new texts are refused (0 for no limit)
+            max_queue_wait_ms: Estimated wait above which new texts are refused (0 for no limit)
+        """
+        self.service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.max_queued = max(0, max_queued)
+        self.max_queue_wait = max(0.0, max_queue_wait_ms) / 1000
+
+        # Moving average of the time one batch takes, for the wait estimate
+        self.batch_seconds = 0.0
+        # Queued texts whose caller gave up and that are skipped when collected
+        self._abandoned = 0
+
+        self._pending: deque[_QueuedText] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, deadline: Optional[float] = None) -> dict[str, Any]:
+        """
+        Queue a text for the next batch and wait for its result.
+
+        Cancelling the call drops the text if it is still queued.
+
+        Args:
+            text: The text to check
+            deadline: time.monotonic() by which the caller needs the result
+
+        Returns:
+            Dict: The result of ProfanityService.check_text for this text
+
+        Raises:
+            OverloadedError: If the text is refused by admission control
+        """
+        self._ensure_worker()
+        self.admit(deadline)
+
+        entry = _QueuedText(text, self._loop.create_future())
+        self._pending.append(entry)
+        self._wakeup.set()
+
+        try:
+            return await entry.future
+        except asyncio.CancelledError:
+            if entry.queued:
+                self._abandoned += 1
+            raise
+
+    @property
+    def queued(self) -> int:
+        """Number of texts waiting for a batch."""
+        return len(self._pending) - self._abandoned
+
+    def estimated_wait(self) -> float:
+        """
+        Estimate how long a text queued now waits for its result, in seconds.
+
+        Returns:
+            float: The batches ahead of it (queued and running) times the
+            average batch duration, spread over the concurrent batch slots
+        """
+        batches_ahead = self.queued // self.max_batch_size + len(self._batches)
+        rounds = batches_ahead // self.max_concurrent_batches + 1
+        return rounds * self.batch_seconds + self.max_wait
+
+    def admit(self, deadline: Optional[float] = None) -> None:
+        """
+        Refuse new work for the model if its queue is too long to answer it in time.
+
+        Also used by requests that run on the inference executor without
+        queueing here, so they are shed under the same conditions.
+
+        Args:
+            deadline: time.monotonic() by which the caller needs the result
+
+        Raises:
+            OverloadedError: If the queue is full or too slow for the deadline
+        """
+        wait = self.estimated_wait()
+        retry_after = max(1.0, wait)
+
+        if self.max_queued and self.queued >= self.max_queued:
+            raise OverloadedError("queue_full", retry_after)
+        if self.max_queue_wait and wait > self.max_queue_wait:
+            raise OverloadedError("wait_too_long", retry_after)
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise OverloadedError("deadline_unreachable", retry_after)
+
+    async def stop(self) -> None:
+        """Stop the background worker and fail all requests that are still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+
+        # Let batches that are already running deliver their results
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        while self._pending:
+            entry = self._pending.popleft()
+            if not entry.future.done():
+                entry.future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    def _ensure_worker(self) -> None:
+        """Start the background worker on the running event loop if needed."""
+        loop = asyncio.get_running_loop()
+
+        if self._worker is not None and not self._worker.done() and self._loop is loop:
+            return
+
+        # A new event loop (e.g. after a restart) cannot reuse the old queue
+        self._loop = loop
+        self._pending = deque()
+        self._abandoned = 0
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._batches = set()
+        self._worker = loop.create_task(self._run())
+        logger.debug(
+            f"Batch worker started (max_batch_size={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.1f}ms)"
+        )
+
+    async def _run(self) -> None:
+        """Form batches from the queue and dispatch them until cancelled."""
+        while True:
+            # Only start collecting once a batch slot is free, so the queue
+            # keeps filling up while all slots are busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            task = self._loop.create_task(self._process(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        """Release the slot of a finished batch."""
+        self._batches.discard(task)
+        self._slots.release()
+
+    async def _process(self, batch: list[_QueuedText]) -> None:
+        """Score one batch on the inference executor and resolve its futures."""
+        # Callers may have given up while the batch was filling up
+        batch = [entry for entry in batch if not entry.future.done()]
+        if not batch:
+            return
+        texts = [entry.text for entry in batch]
+
+        start_time = time.perf_counter()
+        queue_seconds = get_metrics().queue_seconds.labels(stage="batching")
+        for entry in batch:
+            queue_seconds.observe(start_time - entry.enqueued_at)
+
+        # Profile the batch if any of its requests asked for a profile (this
+        # task has its own context, so the request stays with this batch)
+        profile_id = next((entry.profile_id for entry in batch if entry.profile_id), None)
+        if profile_id is not None:
+            request_profile(profile_id)
+
+        try:
+            results = await run_inference(self.service.check_batch, texts)
+        except Exception as e:
+            logger.error(f"Batch inference failed: {e}")
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+            return
+
+        duration = time.perf_counter() - start_time
+        self.batch_seconds += _DURATION_SMOOTHING * (duration - self.batch_seconds)
+        logger.debug(f"Scored batch of {len(texts)} in {duration * 1000:.2f}ms")
+
+        for entry, result in zip(batch, results):
+            if not entry.future.done():
+                entry.future.set_result(result)
+
+    async def _collect(self) -> list[_QueuedText]:
+        """
+        Wait for the first queued text, then keep collecting until the batch is
+        full or the maximum wait time has passed. Texts whose caller gave up
+        are skipped.
+        """
+        batch: list[_QueuedText] = []
+        deadline = None
+
+        while True:
+            while self._pending and len(batch) < self.max_batch_size:
+                entry = self._pending.popleft()
+                entry.queued = False
+                if entry.future.cancelled():
+                    self._abandoned -= 1
+                elif not entry.future.done():
+                    batch.append(entry)
+
+            # The wait for the batch to fill up starts with its first text
+            if batch and deadline is None:
+                deadline = self._loop.time() + self.max_wait
+
+            remaining = deadline - self._loop.time() if deadline is not None else None
+            if len(batch) >= self.max_batch_size or (remaining is not None and remaining <= 0):
+                return batch
+
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+
+
+_scheduler_lock = threading.Lock()
+
+
+def get_batch_scheduler() -> BatchScheduler:
+    """
+    Get the singleton instance of the BatchScheduler.
+
+    Returns:
+        BatchScheduler: A singleton scheduler wrapping the profanity service
+    """
+    with _scheduler_lock:
+        return _create_batch_scheduler()
+
+
+@lru_cache
+def _create_batch_scheduler() -> BatchScheduler:
+    """
+    Create and cache a singleton instance of the BatchScheduler.
+
+    Returns:
+        BatchScheduler: A singleton scheduler wrapping the profanity service
+    """
+    settings = get_settings()
+    return BatchScheduler(
+        get_profanity_service(),
+        max_batch_size=settings.BATCH_MAX_SIZE,
+        max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+        max_concurrent_batches=settings.INFERENCE_WORKERS,
+        max_queued=settings.ADMISSION_MAX_QUEUED,
+        max_queue_wait_ms=settings.ADMISSION_MAX_WAIT_MS,
+    )
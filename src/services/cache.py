@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with TTL for profanity scores.
+
+    Besides caching finished results, the cache tracks keys that are currently
+    being computed, so identical texts arriving during a forward pass wait for
+    that result instead of computing it again.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached results
+            ttl_seconds: Time in seconds after which a result expires (0 disables expiry)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[bytes, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(text: str, model_name: str) -> bytes:
+        """
+        Build a cache key from a text and the model that scores it.
+
+        Args:
+            text: The text to score
+            model_name: Name of the model
+
+        Returns:
+            bytes: A fixed-size digest identifying the text for this model
+        """
+        return hashlib.blake2b(
+            f"{model_name}\0{text}".encode(), digest_size=16, usedforsecurity=False
+        ).digest()
+
+    def reserve(
+        self, keys: list[bytes]
+    ) -> tuple[dict[bytes, Any], dict[bytes, Future], list[bytes]]:
+        """
+        Look up keys and reserve the missing ones for computation by the caller.
+
+        Args:
+            keys: The keys to look up (duplicates are allowed)
+
+        Returns:
+            Tuple: Cached values by key, futures for keys another caller is
+            computing, and the keys the caller must compute and then fulfill()
+        """
+        hits: dict[bytes, Any] = {}
+        waiting: dict[bytes, Future] = {}
+        owned: list[bytes] = []
+        seen: set[bytes] = set()
+
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                entry = self._entries.get(key)
+                if entry is not None:
+                    expires_at, value = entry
+                    if not self.ttl_seconds or expires_at > now:
+                        self._entries.move_to_end(key)
+                        hits[key] = value
+                        self.hits += 1
+                        continue
+                    del self._entries[key]
+                    self.expirations += 1
+
+                future = self._in_flight.get(key)
+                if future is not None:
+                    waiting[key] = future
+                    self.coalesced += 1
+                    continue
+
+                self._in_flight[key] = Future()
+                owned.append(key)
+                self.misses += 1
+
+        return hits, waiting, owned
+
+    def fulfill(self, key: bytes, value: Any) -> None:
+        """
+        Store the computed value of a reserved key and wake up waiting callers.
+
+        Args:
+            key: A key returned as owned by reserve()
+            value: The computed value
+        """
+        with self._lock:
+            if self.max_size > 0:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            future = self._in_flight.pop(key, None)
+
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key: bytes, error: BaseException) -> None:
+        """
+        Release a reserved key after its computation failed.
+
+        Args:
+            key: A key returned as owned by reserve()
+            error: The error raised while computing the value
+        """
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+
+        if future is not None:
+            future.set_exception(error)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get cache counters for sizing the cache.
+
+        Returns:
+            Dict: Current size, capacity, TTL and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "in_flight": len(self._in_flight),
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, TypeVar
+
+from src.config import Settings, get_settings
+from src.config.logging import get_logger
+from src.services.metrics import get_metrics
+from src.services.profiling import get_profiler
+
+logger = get_logger("services.executor")
+
+T = TypeVar("T")
+
+
+def configure_torch_threads(s: Settings) -> None:
+    """
+    Apply the configured intra-op and inter-op thread counts to torch.
+
+    Args:
+        s: Application settings with TORCH_NUM_THREADS and TORCH_INTEROP_THREADS
+    """
+    import torch
+
+    if s.TORCH_NUM_THREADS:
+        torch.set_num_threads(s.TORCH_NUM_THREADS)
+
+    if s.TORCH_INTEROP_THREADS:
+        try:
+            torch.set_num_interop_threads(s.TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op parallel work has started
+            logger.warning(f"Could not set torch inter-op threads: {e}")
+
+    logger.info(
+        f"Torch threads: intra-op={torch.get_num_threads()}, "
+        f"inter-op={torch.get_num_interop_threads()}"
+    )
+
+
+@lru_cache
+def get_inference_executor() -> ThreadPoolExecutor:
+    """
+    Create and cache the executor that runs all model inference.
+
+    Keeping inference on its own threads leaves the event loop free to serve
+    other requests (e.g. health checks) while a forward pass runs.
+
+    Returns:
+        ThreadPoolExecutor: A singleton executor with INFERENCE_WORKERS threads
+    """
+    settings = get_settings()
+    logger.info(f"Starting inference executor with {settings.INFERENCE_WORKERS} worker(s)")
+    return ThreadPoolExecutor(
+        max_workers=settings.INFERENCE_WORKERS, thread_name_prefix="inference"
+    )
+
+
+async def run_inference(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a blocking inference call on the inference executor.
+
+    The time the call waits for a free inference thread is recorded in the
+    queue wait metrics. The call is profiled if the current request asked for
+    a profile or the call is sampled for one.
+
+    Args:
+        func: The blocking function to run
+        *args: Positional arguments for func
+
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    submitted_at = time.perf_counter()
+
+    # Decided here, the request's context does not reach the executor thread
+    profiler = get_profiler()
+    profile_id = profiler.choose()
+
+    def call() -> T:
+        get_metrics().queue_seconds.labels(stage="executor").observe(
+            time.perf_counter() - submitted_at
+        )
+        if profile_id is not None:
+            return profiler.run(profile_id, func, *args)
+        return func(*args)
+
+    return await loop.run_in_executor(get_inference_executor(), call)
@@ -0,0 +1,577 @@
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+from src.config import Settings, get_settings
+from src.config.logging import get_logger
+
+logger = get_logger("services.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    language TEXT,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+"""
+
+_JOB_COLUMNS = "id, status, language, total, processed, error, created_at, updated_at"
+
+
+class QueueFullError(Exception):
+    """Raised when a job would exceed the number of texts the queue may hold."""
+
+    def __init__(self, queued: int, limit: int):
+        super().__init__(f"Job queue is full ({queued} of {limit} texts waiting)")
+        self.queued = queued
+        self.limit = limit
+
+
+class JobStore:
+    """
+    Persistent queue of scoring jobs in a SQLite database.
+
+    A job is a list of texts whose results are stored next to them as they
+    are scored, so a job that was interrupted by a restart continues with its
+    remaining texts. Workers claim a job and renew their claim with every
+    chunk of results; a claim that was not renewed for stale_seconds (e.g.
+    because the process died) can be taken over by another worker. SQLite
+    locking makes this safe across the worker processes of the production
+    server.
+
+    The database file is created on the first submission.
+    """
+
+    def __init__(self, path: Path, max_queued_texts: int, stale_seconds: float = 60.0):
+        """
+        Initialize the store without opening the database.
+
+        Args:
+            path: Path of the SQLite database file
+            max_queued_texts: Maximum number of texts waiting to be scored across all jobs
+            stale_seconds: Time after which the claim of a silent worker expires
+        """
+        self.path = path
+        self.max_queued_texts = max_queued_texts
+        self.stale_seconds = stale_seconds
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Whether the database has been created, i.e. any job was ever submitted."""
+        return self.path.exists()
+
+    def submit(
+        self, texts: list[str], language: Optional[str] = None, errors: Optional[dict] = None
+    ) -> dict[str, Any]:
+        """
+        Add a job to the queue.
+
+        Args:
+            texts: The texts to score
+            language: Language of all texts (None to detect it per text)
+            errors: Error messages by index of texts that must not be scored
+
+        Returns:
+            Dict: The new job
+
+        Raises:
+            QueueFullError: If the texts to score would exceed max_queued_texts
+        """
+        errors = errors or {}
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pending = len(texts) - len(errors)
+        status = QUEUED if pending else COMPLETED
+
+        with self._transaction() as conn:
+            (queued,) = conn.execute(
+                "SELECT COALESCE(SUM(total - processed), 0) FROM jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchone()
+            if pending and queued + pending > self.max_queued_texts:
+                raise QueueFullError(queued, self.max_queued_texts)
+
+            conn.execute(
+                "INSERT INTO jobs (id, status, language, total, processed, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, language, len(texts), len(errors), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO items (job_id, idx, text, result) VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        job_id,
+                        index,
+                        text,
+                        json.dumps({"error": errors[index]}) if index in errors else None,
+                    )
+                    for index, text in enumerate(texts)
+                ),
+            )
+
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        """
+        Get a job.
+
+        Args:
+            job_id: Id of the job
+
+        Returns:
+            Optional[Dict]: The job, or None if it does not exist
+        """
+        if not self.exists():
+            return None
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job(row) if row else None
+
+    def results(self, job_id: str, offset: int, limit: int) -> list[dict[str, Any]]:
+        """
+        Get a page of the results of a job.
+
+        Args:
+            job_id: Id of the job
+            offset: Index of the first text of the page
+            limit: Number of texts in the page
+
+        Returns:
+            List[Dict]: The results of the scored texts of the page, in input order,
+            with their index and original_text
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT idx, text, result FROM items WHERE job_id = ? AND idx >= ? AND idx < ? "
+                "AND result IS NOT NULL ORDER BY idx",
+                (job_id, offset, offset + limit),
+            ).fetchall()
+        return [
+            {"index": index, "original_text": text, **json.loads(result)}
+            for index, text, result in rows
+        ]
+
+    def delete(self, job_id: str) -> bool:
+        """
+        Delete a job and its results, cancelling it if it is still running.
+
+        Args:
+            job_id: Id of the job
+
+        Returns:
+            bool: Whether the job existed
+        """
+        if not self.exists():
+            return False
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            return conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    def claim(self, worker: str) -> Optional[dict[str, Any]]:
+        """
+        Claim the oldest job that is queued or whose worker went silent.
+
+        Args:
+            worker: Id of the claiming worker
+
+        Returns:
+            Optional[Dict]: The claimed job, or None if there is nothing to do
+        """
+        if not self.exists():
+            return None
+
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND heartbeat < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now - self.stale_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, heartbeat = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, worker, now, now, row[0]),
+            )
+            job = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", row).fetchone()
+        return _job(job)
+
+    def pending_items(self, job_id: str, limit: int) -> list[tuple[int, str]]:
+        """
+        Get the next texts of a job that have not been scored yet.
+
+        Args:
+            job_id: Id of the job
+            limit: Maximum number of texts
+
+        Returns:
+            List[Tuple[int, str]]: Index and text of each unscored text, in input order
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "SELECT idx, text FROM items WHERE job_id = ? AND result IS NULL "
+                "ORDER BY idx LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+
+    def save_results(self, job_id: str, worker: str, results: list[tuple[int, dict]]) -> bool:
+        """
+        Store the results of scored texts and renew the claim of the worker.
+
+        The job is completed once all of its texts have a result.
+
+        Args:
+            job_id: Id of the job
+            worker: Id of the worker that claimed the job
+            results: Index and result of each scored text
+
+        Returns:
+            bool: False if the job was deleted or taken over by another worker,
+            in which case nothing is stored
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if not conn.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND status = ? AND worker = ?",
+                (job_id, RUNNING, worker),
+            ).fetchone():
+                return False
+
+            saved = conn.executemany(
+                "UPDATE items SET result = ? WHERE job_id = ? AND idx = ? AND result IS NULL",
+                ((json.dumps(result), job_id, index) for index, result in results),
+            ).rowcount
+            conn.execute(
+                "UPDATE jobs SET processed = processed + ?, heartbeat = ?, updated_at = ?, "
+                "status = CASE WHEN processed + ? >= total THEN ? ELSE status END WHERE id = ?",
+                (saved, now, now, saved, COMPLETED, job_id),
+            )
+        return True
+
+    def renew(self, job_id: str, worker: str) -> bool:
+        """
+        Renew the claim of a worker that is not saving results, e.g. while it waits to retry.
+
+        Args:
+            job_id: Id of the job
+            worker: Id of the worker that claimed the job
+
+        Returns:
+            bool: False if the job was deleted or taken over by another worker
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            return (
+                conn.execute(
+                    "UPDATE jobs SET heartbeat = ?, updated_at = ? "
+                    "WHERE id = ? AND status = ? AND worker = ?",
+                    (now, now, job_id, RUNNING, worker),
+                ).rowcount
+                > 0
+            )
+
+    def release(self, job_id: str, worker: str) -> None:
+        """
+        Put a claimed job back into the queue, e.g. on shutdown.
+
+        Args:
+            job_id: Id of the job
+            worker: Id of the worker that claimed the job
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (QUEUED, time.time(), job_id, RUNNING, worker),
+            )
+
+    def fail(self, job_id: str, worker: str, error: str) -> None:
+        """
+        Mark a job as failed, keeping the results scored so far.
+
+        Args:
+            job_id: Id of the job
+            worker: Id of the worker that claimed the job
+            error: Why the job failed
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                (FAILED, error, time.time(), job_id, worker),
+            )
+
+    def cleanup(self, retention_seconds: float) -> int:
+        """
+        Delete finished jobs that were last updated longer ago than the retention time.
+
+        Args:
+            retention_seconds: How long finished jobs are kept
+
+        Returns:
+            int: Number of deleted jobs
+        """
+        if not self.exists():
+            return 0
+
+        expired = time.time() - retention_seconds
+        with self._transaction() as conn:
+            job_ids = conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (COMPLETED, FAILED, expired),
+            ).fetchall()
+            conn.executemany("DELETE FROM items WHERE job_id = ?", job_ids)
+            conn.executemany("DELETE FROM jobs WHERE id = ?", job_ids)
+        return len(job_ids)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction on this process's connection."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database (again after a fork), creating it if necessary."""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+
+def _job(row: tuple) -> dict[str, Any]:
+    """Convert a jobs row into a dict."""
+    return dict(zip([column.strip() for column in _JOB_COLUMNS.split(",")], row))
+
+
+class JobRunner:
+    """
+    Background tasks scoring queued jobs chunk by chunk.
+
+    Each chunk is scored with one check_batch call of the model registry, so
+    jobs run on the same inference executor as the online endpoints and share
+    their batched forward passes. Idle workers poll the queue, which also
+    picks up jobs submitted to other worker processes. A chunk that fails,
+    e.g. because its model cannot be loaded within the memory budget right
+    now, is retried with exponential backoff before the job is failed.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        registry: Any,
+        workers: int = 1,
+        chunk_size: int = 256,
+        poll_interval: float = 1.0,
+        retention_seconds: float = 86400.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 1.0,
+    ):
+        """
+        Initialize the runner without starting it.
+
+        Args:
+            store: The job queue
+            registry: The model registry scoring the texts
+            workers: Number of jobs scored at the same time by this process
+            chunk_size: Number of texts scored and stored at once
+            poll_interval: Seconds between polls of an idle worker
+            retention_seconds: How long finished jobs are kept
+            max_attempts: Number of times a chunk is scored before its job fails
+            retry_backoff: Seconds before the first retry of a chunk, doubled for each further retry
+        """
+        self.store = store
+        self.registry = registry
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._last_cleanup = 0.0
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(f"{os.getpid()}-{uuid.uuid4().hex[:8]}"))
+            for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers. Interrupted jobs go back into the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake up idle workers after a job was submitted."""
+        self._wakeup.set()
+
+    async def _run(self, worker: str) -> None:
+        """Claim and score jobs until cancelled."""
+        while True:
+            try:
+                await self._cleanup()
+                job = await asyncio.to_thread(self.store.claim, worker)
+                if job is not None:
+                    try:
+                        await self._process(job, worker)
+                    except asyncio.CancelledError:
+                        await asyncio.shield(
+                            asyncio.to_thread(self.store.release, job["id"], worker)
+                        )
+                        raise
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker {worker} failed: {e}")
+
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+
+    async def _process(self, job: dict[str, Any], worker: str) -> None:
+        """Score the remaining texts of a claimed job."""
+        start_time = time.time()
+        logger.info(f"Job {job['id']}: scoring {job['total'] - job['processed']} texts")
+
+        while True:
+            items = await asyncio.to_thread(self.store.pending_items, job["id"], self.chunk_size)
+            if not items:
+                break
+
+            texts = [text for _, text in items]
+            attempt = 1
+            while True:
+                try:
+                    results = await self.registry.check_batch(texts, [job["language"]] * len(texts))
+                    break
+                except Exception as e:
+                    if attempt >= self.max_attempts:
+                        logger.error(f"Job {job['id']} failed after {attempt} attempts: {e}")
+                        await asyncio.to_thread(self.store.fail, job["id"], worker, str(e))
+                        return
+
+                    delay = self.retry_backoff * 2 ** (attempt - 1)
+                    logger.warning(
+                        f"Job {job['id']}: attempt {attempt} failed, retrying in {delay:.1f}s: {e}"
+                    )
+                    await asyncio.sleep(delay)
+                    if not await asyncio.to_thread(self.store.renew, job["id"], worker):
+                        logger.info(f"Job {job['id']} was deleted or taken over, stopping")
+                        return
+                    attempt += 1
+
+            saved = await asyncio.to_thread(
+                self.store.save_results,
+                job["id"],
+                worker,
+                [(index, result) for (index, _), result in zip(items, results)],
+            )
+            if not saved:
+                logger.info(f"Job {job['id']} was deleted or taken over, stopping")
+                return
+
+        logger.info(f"Job {job['id']}: completed in {time.time() - start_time:.2f}s")
+
+    async def _cleanup(self) -> None:
+        """Delete expired jobs, at most once a minute."""
+        if time.time() - self._last_cleanup < 60:
+            return
+        self._last_cleanup = time.time()
+
+        deleted = await asyncio.to_thread(self.store.cleanup, self.retention_seconds)
+        if deleted:
+            logger.info(f"Deleted {deleted} expired jobs")
+
+
+def create_job_store(s: Settings) -> JobStore:
+    """
+    Create the job queue from the settings.
+
+    Args:
+        s: Application settings
+
+    Returns:
+        JobStore: The queue in JOBS_DB_PATH, or DATA_DIR/jobs/jobs.sqlite3 if unset
+    """
+    path = Path(s.JOBS_DB_PATH) if s.JOBS_DB_PATH else Path(s.DATA_DIR) / "jobs" / "jobs.sqlite3"
+    return JobStore(path, s.JOBS_MAX_QUEUED_TEXTS, s.JOBS_STALE_SECONDS)
+
+
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """
+    Get the singleton instance of the JobStore.
+
+    Returns:
+        JobStore: A singleton job queue
+    """
+    with _store_lock:
+        return _create_job_store()
+
+
+@lru_cache
+def _create_job_store() -> JobStore:
+    """
+    Create and cache a singleton instance of the JobStore.
+
+    Returns:
+        JobStore: A singleton job queue
+    """
+    return create_job_store(get_settings())
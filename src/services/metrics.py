@@ -0,0 +1,256 @@
+import os
+import shutil
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from src.config import Settings
+from src.config.logging import get_logger
+
+logger = get_logger("services.metrics")
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Latency buckets from half a millisecond (tokenization) up to ten seconds
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+TOKEN_BUCKETS = (4, 8, 16, 32, 64, 128, 256, 512, 1024)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Metrics:
+    """
+    Prometheus metrics of the API and the inference pipeline.
+
+    prometheus_client is imported here rather than at module level, because
+    multi-process mode has to be configured before it is first imported.
+    """
+
+    def __init__(self):
+        from prometheus_client import Counter, Gauge, Histogram
+
+        self.requests = Counter(
+            "badwords_requests",
+            "HTTP requests by route and status code",
+            ["method", "route", "status"],
+        )
+        self.request_seconds = Histogram(
+            "badwords_request_duration_seconds",
+            "End-to-end HTTP request latency",
+            ["method", "route"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.queue_seconds = Histogram(
+            "badwords_queue_wait_seconds",
+            "Time spent waiting for a batch to fill up (batching) or for a free inference "
+            "thread (executor)",
+            ["stage"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.tokenize_seconds = Histogram(
+            "badwords_tokenize_duration_seconds",
+            "Time spent tokenizing one batch of texts",
+            ["model"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.forward_seconds = Histogram(
+            "badwords_forward_duration_seconds",
+            "Time spent in one forward pass of the model",
+            ["model"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.tokens = Histogram(
+            "badwords_text_tokens",
+            "Number of tokens per text scored by the model",
+            ["model"],
+            buckets=TOKEN_BUCKETS,
+        )
+        self.batch_size = Histogram(
+            "badwords_forward_batch_size",
+            "Number of sequences per forward pass",
+            ["model"],
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.decisions = Counter(
+            "badwords_decisions",
+            "Checked texts by model, by what decided the result and by the result",
+            ["model", "decided_by", "result"],
+        )
+        self.dropped = Counter(
+            "badwords_dropped_requests",
+            "Check requests refused by admission control or dropped before inference",
+            ["reason"],
+        )
+        self.model_loads = Counter(
+            "badwords_model_loads",
+            "Models loaded by the model registry",
+            ["model"],
+        )
+        self.model_evictions = Counter(
+            "badwords_model_evictions",
+            "Idle models unloaded to stay within the memory budget",
+            ["model"],
+        )
+        # Per worker process, the sum would count weight pages shared across the fork twice
+        self.process_rss = Gauge(
+            "badwords_process_resident_memory_bytes",
+            "Resident memory of the process",
+            multiprocess_mode="liveall",
+        )
+        self.model_memory = Gauge(
+            "badwords_model_memory_bytes",
+            "Estimated size of each loaded model (0 once unloaded)",
+            ["model"],
+            multiprocess_mode="liveall",
+        )
+
+    def record_decisions(self, results: list[dict], model: str) -> None:
+        """
+        Count the results of checked texts.
+
+        Args:
+            results: Results with is_profane and decided_by, as returned by check_batch
+            model: Name of the model that checked the texts
+        """
+        for result in results:
+            self.decisions.labels(
+                model=model,
+                decided_by=result.get("decided_by", "model"),
+                result="profane" if result["is_profane"] else "clean",
+            ).inc()
+
+    def record_memory(self, models: dict[str, int]) -> int:
+        """
+        Update the memory gauges.
+
+        Args:
+            models: Size in bytes of each loaded model
+
+        Returns:
+            int: The resident memory of this process in bytes
+        """
+        rss = process_rss_bytes()
+        self.process_rss.set(rss)
+        for model, size in models.items():
+            self.model_memory.labels(model=model).set(size)
+        return rss
+
+
+def process_rss_bytes() -> int:
+    """
+    Get the resident memory of this process.
+
+    Returns:
+        int: The current resident set size in bytes, or the peak where the
+        current size is not available (0 if neither is)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """
+    Get the metrics of this process.
+
+    Returns:
+        Metrics: The singleton metrics instance
+    """
+    # Models may be loaded on several threads, which must not register the metrics twice
+    with _metrics_lock:
+        return _create_metrics()
+
+
+@lru_cache
+def _create_metrics() -> Metrics:
+    """
+    Create and cache the metrics of this process.
+
+    Returns:
+        Metrics: The singleton metrics instance
+    """
+    return Metrics()
+
+
+def setup_multiprocess_metrics(s: Settings) -> None:
+    """
+    Make worker processes share their metrics through files in METRICS_DIR.
+
+    An existing PROMETHEUS_MULTIPROC_DIR environment variable takes precedence.
+
+    Must be called before forking the workers and before the metrics are
+    first used. Files from earlier runs are removed, so counters start at zero.
+
+    Args:
+        s: Application settings
+    """
+    default_dir = s.METRICS_DIR or str(Path(s.DATA_DIR) / "metrics")
+    metrics_dir = Path(os.environ.setdefault(MULTIPROC_DIR_ENV, default_dir))
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Sharing metrics of worker processes in {metrics_dir}")
+
+
+def mark_worker_dead(pid: int) -> None:
+    """
+    Drop the live values of an exited worker process, keeping its counts.
+
+    Args:
+        pid: Process id of the worker
+    """
+    if MULTIPROC_DIR_ENV in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    With several worker processes, the values of all workers are merged.
+
+    Returns:
+        Tuple[bytes, str]: The exposition and its content type
+    """
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    # Create the metrics, so they are exposed before their first observation
+    get_metrics()
+
+    if MULTIPROC_DIR_ENV in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
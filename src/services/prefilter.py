@@ -0,0 +1,306 @@
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Optional
+
+from src.config import Settings
+from src.config.logging import get_logger
+
+logger = get_logger("services.prefilter")
+
+BLOCKLIST = "blocklist"
+ALLOWLIST = "allowlist"
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher finding all occurrences of many phrases in one pass.
+
+    Patterns are compiled once into a trie with failure links, so matching
+    costs one step per character of the text regardless of how many patterns
+    there are.
+    """
+
+    def __init__(self, patterns: list[tuple[str, Any]]):
+        """
+        Compile the patterns.
+
+        Args:
+            patterns: Pairs of pattern string and a value reported with each match
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._outputs: list[list[tuple[int, Any]]] = [[]]
+
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((len(pattern), value))
+
+        # Breadth-first, so the failure state of a node is always finished first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] = (
+                    self._outputs[next_state] + self._outputs[self._fail[next_state]]
+                )
+
+    def __len__(self) -> int:
+        """Number of states of the compiled automaton."""
+        return len(self._goto)
+
+    def find_all(self, text: str) -> list[tuple[int, int, Any]]:
+        """
+        Find all (possibly overlapping) occurrences of the patterns in a text.
+
+        Args:
+            text: The text to search
+
+        Returns:
+            List[Tuple[int, int, Any]]: Start, end and value of each match
+        """
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in outputs[state]:
+                matches.append((end - length, end, value))
+        return matches
+
+
+class Prefilter:
+    """
+    Decides obvious cases without running the model.
+
+    Texts containing a blocklisted phrase are profane. Texts that are too
+    short, contain no letters or digits (e.g. emoji only) or consist only of
+    allowlisted phrases are clean. Everything else is left to the model.
+
+    Phrases match whole words, case-insensitively; a phrase ending in "*"
+    also matches as a word prefix. Allowlisted phrases take precedence over
+    blocklisted phrases they contain. The lists are read from text files (one
+    phrase per line, "#" starts a comment) and reloaded when they change.
+    """
+
+    def __init__(
+        self,
+        blocklist_path: Path,
+        allowlist_path: Path,
+        min_text_length: int = 0,
+        reload_interval: float = 5.0,
+    ):
+        """
+        Initialize the prefilter and load the phrase lists.
+
+        Args:
+            blocklist_path: File with phrases that make a text profane
+            allowlist_path: File with phrases that are known to be clean
+            min_text_length: Texts with fewer non-space characters are clean
+            reload_interval: Minimum time in seconds between checks for changed files
+        """
+        self.blocklist_path = blocklist_path
+        self.allowlist_path = allowlist_path
+        self.min_text_length = min_text_length
+        self.reload_interval = reload_interval
+
+        self._matcher = AhoCorasick([])
+        self._mtimes: tuple[Optional[float], Optional[float]] = (None, None)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        self.reload()
+
+    def reload(self) -> bool:
+        """
+        Reload the phrase lists if the files changed since they were last read.
+
+        Returns:
+            bool: Whether the lists were reloaded
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtimes = (_mtime(self.blocklist_path), _mtime(self.allowlist_path))
+            if mtimes == self._mtimes:
+                return False
+
+            blocklist = _read_phrases(self.blocklist_path)
+            allowlist = _read_phrases(self.allowlist_path)
+
+            # Swap in the new matcher at once, concurrent checks keep the old one
+            self._matcher = AhoCorasick(
+                [(phrase, (BLOCKLIST, prefix)) for phrase, prefix in blocklist]
+                + [(phrase, (ALLOWLIST, prefix)) for phrase, prefix in allowlist]
+            )
+            self._mtimes = mtimes
+
+        logger.info(
+            f"Prefilter loaded {len(blocklist)} blocklisted and {len(allowlist)} allowlisted phrases"
+        )
+        return True
+
+    def maybe_reload(self) -> None:
+        """Reload the phrase lists if they changed and reload_interval has passed."""
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def decide(self, text: str) -> Optional[dict[str, Any]]:
+        """
+        Decide a text without the model if it is a clear case.
+
+        Args:
+            text: The text to check
+
+        Returns:
+            Optional[Dict]: is_profane, confidence and decided_by ("blocklist",
+            "allowlist" or "trivial"), or None if the model has to decide
+        """
+        normalized = text.casefold()
+        blocked, allowed = self._find(normalized)
+
+        if blocked:
+            return {"is_profane": True, "confidence": 1.0, "decided_by": BLOCKLIST}
+
+        if len("".join(text.split())) < self.min_text_length or not any(
+            char.isalnum() for char in text
+        ):
+            return {"is_profane": False, "confidence": 0.0, "decided_by": "trivial"}
+
+        if allowed:
+            remainder = list(normalized)
+            for start, end in allowed:
+                remainder[start:end] = " " * (end - start)
+            if not any(char.isalnum() for char in remainder):
+                return {"is_profane": False, "confidence": 0.0, "decided_by": ALLOWLIST}
+
+        return None
+
+    def blocked_spans(self, text: str) -> list[tuple[int, int]]:
+        """
+        Find the blocklisted phrases in a text, e.g. to mask them.
+
+        Args:
+            text: The text to search
+
+        Returns:
+            List[Tuple[int, int]]: Start and end offset of each blocklisted
+            phrase (or word, for prefix phrases) not covered by an allowlisted
+            one, in text order
+        """
+        # Casefolding can lengthen characters (e.g. "ß" to "ss"), so map the
+        # offsets of the matches back to the original text
+        folded = [char.casefold() for char in text]
+        origin = [index for index, char in enumerate(folded) for _ in char]
+
+        spans = set()
+        for start, end in self._find("".join(folded))[0]:
+            end = origin[end - 1] + 1
+            # Prefix phrases cover the rest of the word they start
+            while end < len(text) and text[end].isalnum():
+                end += 1
+            spans.add((origin[start], end))
+        return sorted(spans)
+
+    def _find(self, normalized: str) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+        """
+        Find the whole-word matches of both lists in a casefolded text.
+
+        Returns:
+            Tuple[List, List]: Spans of the blocklisted phrases that no
+            allowlisted phrase contains, and spans of the allowlisted phrases
+        """
+        allowed: list[tuple[int, int]] = []
+        blocked: list[tuple[int, int]] = []
+        for start, end, (kind, prefix) in self._matcher.find_all(normalized):
+            if _is_word(normalized, start, end, prefix):
+                (blocked if kind == BLOCKLIST else allowed).append((start, end))
+
+        blocked = [
+            (start, end)
+            for start, end in blocked
+            if not any(a <= start and end <= b for a, b in allowed)
+        ]
+        return blocked, allowed
+
+
+def _is_word(text: str, start: int, end: int, prefix: bool) -> bool:
+    """Whether a match starts at a word boundary and (unless prefix) ends at one."""
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    return prefix or end == len(text) or not text[end].isalnum()
+
+
+def _mtime(path: Path) -> Optional[float]:
+    """Modification time of a file, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _read_phrases(path: Path) -> list[tuple[str, bool]]:
+    """
+    Read a phrase list file.
+
+    Args:
+        path: The file to read (a missing file is an empty list)
+
+    Returns:
+        List[Tuple[str, bool]]: Normalized phrases and whether each is a prefix pattern
+    """
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+
+    phrases = []
+    for line in lines:
+        phrase = line.split("#", 1)[0].strip().casefold()
+        prefix = phrase.endswith("*")
+        phrase = phrase.rstrip("*").strip()
+        if phrase:
+            phrases.append((phrase, prefix))
+    return phrases
+
+
+def create_prefilter(s: Settings) -> Optional[Prefilter]:
+    """
+    Create the prefilter if it is enabled.
+
+    Args:
+        s: Application settings
+
+    Returns:
+        Optional[Prefilter]: The prefilter reading its lists from DATA_DIR/prefilter,
+        or None if PREFILTER_ENABLED is off
+    """
+    if not s.PREFILTER_ENABLED:
+        return None
+
+    list_dir = Path(s.DATA_DIR) / "prefilter"
+    return Prefilter(
+        list_dir / "blocklist.txt",
+        list_dir / "allowlist.txt",
+        min_text_length=s.PREFILTER_MIN_TEXT_LENGTH,
+        reload_interval=s.PREFILTER_RELOAD_INTERVAL_SECONDS,
+    )
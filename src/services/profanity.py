@@ -1,16 +1,27 @@
+import re
+import threading
 import time
 from functools import lru_cache
 from pathlib import Path
-from typing import Any
-
-import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from typing import Any, Optional
 
 from src.config import Settings, get_settings
 from src.config.logging import get_logger
+from src.services.cache import ResultCache
+from src.services.executor import configure_torch_threads
+from src.services.metrics import get_metrics
+from src.services.prefilter import BLOCKLIST, create_prefilter
+from src.services.profiling import label
+from src.services.tokenization import TokenEncoder
 
 logger = get_logger("services.profanity")
 
+# Words are the units the censor endpoint attributes a score to and masks
+_WORD = re.compile(r"\w+")
+
+# Character that replaces every character of a masked span
+MASK_CHAR = "*"
+
 
 class ProfanityService:
     """
@@ -22,44 +33,83 @@ class ProfanityService:
         Initialize the profanity service with persistent model storage.
 
         Models are loaded from disk if available, otherwise downloaded and saved
-        for future use.
+        for future use. torch and transformers are only imported here, so that
+        importing this module (and the API) stays fast.
         """
+        from transformers import AutoTokenizer
+
+        from src.services.backends import create_backend
+
         logger.info(f"Initializing ProfanityService with model: {s.MODEL_NAME}")
         start_time = time.time()
 
+        self.model_name = s.MODEL_NAME
+
+        # Limit torch threads before any model work starts
+        configure_torch_threads(s)
+
         model_dir = Path(s.DATA_DIR) / "models" / s.MODEL_NAME
 
         # Create model directory if it doesn't exist
         model_dir.mkdir(parents=True, exist_ok=True)
         logger.debug(f"Using model directory: {model_dir}")
 
-        model_path = model_dir / "model"
         tokenizer_path = model_dir / "tokenizer"
 
-        # Check if the model and tokenizer have been saved locally
-        if model_path.exists() and tokenizer_path.exists():
-            # Load from local storage
-            logger.info(f"Loading model from cache: {model_path}")
-            self.model = AutoModelForSequenceClassification.from_pretrained(str(model_path))
+        # Check if the tokenizer has been saved locally
+        if tokenizer_path.exists():
             self.tokenizer = AutoTokenizer.from_pretrained(str(tokenizer_path))
-            logger.info(f"Model loaded from cache in {time.time() - start_time:.2f}s")
         else:
             # Download and save for future use
-            logger.info(f"Downloading model: {s.MODEL_NAME}")
-            self.model = AutoModelForSequenceClassification.from_pretrained(s.MODEL_NAME)
+            logger.info(f"Downloading tokenizer: {s.MODEL_NAME}")
             self.tokenizer = AutoTokenizer.from_pretrained(s.MODEL_NAME)
-
-            # Save model and tokenizer
-            logger.info(f"Saving model to: {model_path}")
-            self.model.save_pretrained(str(model_path))
             self.tokenizer.save_pretrained(str(tokenizer_path))
-            logger.info(f"Model downloaded and saved in {time.time() - start_time:.2f}s")
+
+        # Encode batches with the fast tokenizer, caching the ids of recent texts
+        self.encoder = TokenEncoder(
+            self.tokenizer,
+            pad_to_multiple_of=s.TOKENIZER_PAD_MULTIPLE,
+            cache_size=s.TOKEN_CACHE_MAX_SIZE,
+            require_fast=s.TOKENIZER_REQUIRE_FAST,
+        )
+
+        # Load (or download, export and save) the model for the configured backend
+        self.backend = create_backend(s, model_dir)
+        logger.info(f"Model ready in {time.time() - start_time:.2f}s")
 
         # Configurable threshold, could be moved to settings if needed
         self.threshold = 0.5
 
-        # Set model to evaluation mode for inference
-        self.model.eval()
+        # Largest number of texts scored in one forward pass
+        self.max_batch_size = max(1, s.BATCH_MAX_SIZE)
+
+        # Largest padded batch (texts times sequence length) of one forward pass,
+        # which bounds the activation memory (0 for no limit)
+        self.max_batch_tokens = max(0, s.BATCH_MAX_TOKENS)
+
+        # Rounds of occlusion scoring when looking for the words that make a text profane
+        self.censor_max_rounds = max(1, s.CENSOR_MAX_ROUNDS)
+
+        # Long texts are scored in overlapping windows of at most this many tokens,
+        # which the model must accept; the tokenizer needs windows to advance
+        self.window_max_tokens = min(s.WINDOW_MAX_TOKENS, self.tokenizer.model_max_length)
+        self.window_overlap_tokens = min(
+            max(0, s.WINDOW_OVERLAP_TOKENS),
+            self.window_max_tokens - self.tokenizer.num_special_tokens_to_add() - 1,
+        )
+        if self.window_max_tokens < s.WINDOW_MAX_TOKENS:
+            logger.warning(
+                f"WINDOW_MAX_TOKENS={s.WINDOW_MAX_TOKENS} exceeds the maximum of the model, "
+                f"using windows of {self.window_max_tokens} tokens"
+            )
+
+        # Decide clear cases from the block- and allowlist without the model
+        self.prefilter = create_prefilter(s)
+
+        # Cache scores of recently seen texts and coalesce identical in-flight texts
+        self.cache = (
+            ResultCache(s.CACHE_MAX_SIZE, s.CACHE_TTL_SECONDS) if s.CACHE_MAX_SIZE > 0 else None
+        )
 
         logger.info("ProfanityService initialization complete")
 
@@ -71,31 +121,417 @@ class ProfanityService:
             text: The text to check
 
         Returns:
-            Dict: Results containing whether is_profane (bool) and confidence score (0-1)
+            Dict: Results containing whether is_profane (bool), confidence score (0-1)
+            and decided_by (the prefilter rule or "model")
+        """
+        return self.check_batch([text])[0]
+
+    def check_batch(self, texts: list[str]) -> list[dict[str, Any]]:
+        """
+        Check several texts for profanity in as few padded forward passes as possible.
+
+        Texts the prefilter can decide never reach the model. Texts already in
+        the result cache, or currently being scored by another batch, are not
+        scored again. The remaining texts are sorted by token
+        length and split into buckets of at most max_batch_size (and at most
+        max_batch_tokens padded tokens), so that each bucket only pads to
+        similar lengths.
+
+        Args:
+            texts: The texts to check
+
+        Returns:
+            List[Dict]: One result per text, in input order, as returned by check_text
+        """
+        if not texts:
+            return []
+
+        results = self._prefilter(texts)
+        model_indices = [i for i, result in enumerate(results) if result is None]
+
+        model_texts = [texts[i] for i in model_indices]
+        if not model_texts:
+            predictions = []
+        elif self.cache is not None:
+            predictions = self._cached_scores(model_texts)
+        else:
+            predictions = self._compute_scores(model_texts)
+
+        for index, prediction in zip(model_indices, predictions):
+            is_profane = prediction > self.threshold
+            logger.debug(f"Profanity check result: {is_profane} (confidence: {prediction:.4f})")
+            results[index] = {
+                "is_profane": is_profane,
+                "confidence": prediction,
+                "decided_by": "model",
+            }
+
+        get_metrics().record_decisions(results, self.model_name)
+        return results
+
+    def check_long_text(self, text: str) -> dict[str, Any]:
+        """
+        Check a text of any length for profanity in overlapping token windows.
+
+        Texts that fit into one window are checked like check_text. Longer texts
+        are split by the tokenizer into windows of window_max_tokens tokens,
+        consecutive windows sharing window_overlap_tokens tokens, which are
+        scored in batches of at most max_batch_size (and at most
+        max_batch_tokens padded tokens). Scoring stops after the
+        first batch in which a window crosses the threshold.
+
+        Args:
+            text: The text to check
+
+        Returns:
+            Dict: is_profane and confidence (the highest window score), the
+            window with that score as character offsets and text, and the number
+            of windows scored out of the total
         """
-        logger.debug(f"Processing text: {text[:30]}...")
+        decision = self._prefilter([text])[0]
+        if decision is not None:
+            get_metrics().record_decisions([decision], self.model_name)
+            return {
+                **decision,
+                "window": {"start": 0, "end": len(text), "text": text},
+                "windows_scored": 0,
+                "windows_total": 0,
+            }
+
+        start_time = time.perf_counter()
+        with label("tokenize"):
+            encoding = self.tokenizer(
+                text,
+                truncation=True,
+                max_length=self.window_max_tokens,
+                stride=self.window_overlap_tokens,
+                return_overflowing_tokens=True,
+                return_offsets_mapping=True,
+            )
+        get_metrics().tokenize_seconds.labels(model=self.model_name).observe(
+            time.perf_counter() - start_time
+        )
+        windows = encoding["input_ids"]
 
-        # Tokenize the input text
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        if len(windows) == 1:
+            result = self.check_text(text)
+            return {
+                **result,
+                "window": {"start": 0, "end": len(text), "text": text},
+                "windows_scored": 1,
+                "windows_total": 1,
+            }
 
-        with torch.no_grad():
-            # Get model outputs (no need for attention in production)
-            outputs = self.model(**inputs)
+        batch_size = self.max_batch_size
+        if self.max_batch_tokens:
+            batch_size = min(batch_size, max(1, self.max_batch_tokens // self.window_max_tokens))
 
-            # Get prediction score
-            prediction = torch.softmax(outputs.logits, dim=1)[0][1].item()
+        best_score, best_index = -1.0, 0
+        scored = 0
+        for start in range(0, len(windows), batch_size):
+            scores = self._score(windows[start : start + batch_size])
+            for index, score in enumerate(scores, start):
+                if score > best_score:
+                    best_score, best_index = score, index
+            scored += len(scores)
 
-        is_profane = prediction > self.threshold
-        logger.debug(f"Profanity check result: {is_profane} (confidence: {prediction:.4f})")
+            # Any window over the threshold decides the text, skip the rest
+            if best_score > self.threshold:
+                break
 
-        return {
-            "is_profane": is_profane,
-            "confidence": prediction,
+        logger.debug(
+            f"Scored {scored} of {len(windows)} windows (max confidence: {best_score:.4f})"
+        )
+
+        # Special tokens have empty character spans
+        spans = [span for span in encoding["offset_mapping"][best_index] if span[1] > span[0]]
+        char_start, char_end = spans[0][0], spans[-1][1]
+        result = {
+            "is_profane": best_score > self.threshold,
+            "confidence": best_score,
+            "decided_by": "model",
+            "window": {"start": char_start, "end": char_end, "text": text[char_start:char_end]},
+            "windows_scored": scored,
+            "windows_total": len(windows),
         }
+        get_metrics().record_decisions([result], self.model_name)
+        return result
+
+    def censor_text(self, text: str) -> dict[str, Any]:
+        """
+        Check a text for profanity and locate the words that make it profane.
+
+        Texts checked as clean are returned unchanged without further work.
+        Otherwise the words are found by occlusion: every variant of the text
+        with one more word left out is scored in one batched call, and the
+        words whose removal brings the score under the threshold are flagged.
+        If no single word does, the word whose removal lowers the score the
+        most is flagged, and the next round occludes the remaining words of
+        the text without it, up to censor_max_rounds rounds. Texts decided by
+        the blocklist get their blocklisted phrases masked instead.
+
+        Args:
+            text: The text to censor
+
+        Returns:
+            Dict: The result of check_text, the text with every character of
+            the flagged spans replaced by MASK_CHAR, and the flagged spans as
+            character offsets with the drop in confidence their removal caused
+            (1.0 for blocklisted phrases)
+        """
+        result = self.check_text(text)
+        if not result["is_profane"]:
+            return {**result, "censored_text": text, "spans": []}
+
+        if result["decided_by"] == BLOCKLIST:
+            spans = [
+                {"start": start, "end": end, "score": 1.0}
+                for start, end in self.prefilter.blocked_spans(text)
+            ]
+        else:
+            spans = self._occlude(text, result["confidence"])
+
+        censored = list(text)
+        for span in spans:
+            censored[span["start"] : span["end"]] = MASK_CHAR * (span["end"] - span["start"])
+        return {**result, "censored_text": "".join(censored), "spans": spans}
+
+    def warmup(self, rounds: int = 3) -> None:
+        """
+        Run dummy batches through the model so the first real requests are fast.
+
+        Each round scores a batch of a different size, which lets the backend
+        allocate its buffers and pick its kernels before traffic arrives. The
+        result cache is bypassed.
+
+        Args:
+            rounds: Number of dummy batches to run
+        """
+        start_time = time.time()
+        for round_index in range(rounds):
+            batch_size = min(self.max_batch_size, 2**round_index)
+            texts = [f"warmup text {i} " * (round_index + 1) for i in range(batch_size)]
+            self._compute_scores(texts)
+        logger.info(f"Warmup with {rounds} batches finished in {time.time() - start_time:.2f}s")
+
+    def _prefilter(self, texts: list[str]) -> list[Optional[dict[str, Any]]]:
+        """
+        Decide the clear cases among texts without the model.
+
+        Args:
+            texts: The texts to check
+
+        Returns:
+            List[Optional[Dict]]: The prefilter result of each text, or None
+            where the model has to decide
+        """
+        if self.prefilter is None:
+            return [None] * len(texts)
+
+        self.prefilter.maybe_reload()
+        return [self.prefilter.decide(text) for text in texts]
+
+    def _occlude(self, text: str, confidence: float) -> list[dict[str, Any]]:
+        """
+        Find the words whose removal makes a profane text clean, as described in censor_text.
+
+        Args:
+            text: The profane text
+            confidence: The model's score of the whole text
+
+        Returns:
+            List[Dict]: Start, end and score (the drop in confidence when the
+            word was left out) of each flagged word, in text order
+        """
+        words = [match.span() for match in _WORD.finditer(text)]
+        flagged: dict[int, float] = {}
+
+        for _ in range(self.censor_max_rounds):
+            candidates = [index for index in range(len(words)) if index not in flagged]
+            if not candidates:
+                break
+
+            variants = [_without(text, words, [*flagged, index]) for index in candidates]
+            # The variants are seen once, caching their tokens or scores is wasted work
+            scores = self._compute_scores(variants, cache_tokens=False)
+            drops = {index: confidence - score for index, score in zip(candidates, scores)}
+
+            decisive = [
+                index for index, score in zip(candidates, scores) if score <= self.threshold
+            ]
+            if decisive:
+                flagged.update((index, drops[index]) for index in decisive)
+                break
+
+            strongest = max(candidates, key=drops.__getitem__)
+            if drops[strongest] <= 0:
+                break
+            flagged[strongest] = drops[strongest]
+            confidence -= drops[strongest]
+
+        logger.debug(f"Flagged {len(flagged)} of {len(words)} words")
+        return [
+            {"start": words[index][0], "end": words[index][1], "score": score}
+            for index, score in sorted(flagged.items())
+        ]
+
+    def _cached_scores(self, texts: list[str]) -> list[float]:
+        """
+        Score texts, reusing cached and in-flight results for texts seen before.
+
+        Args:
+            texts: The texts to score
+
+        Returns:
+            List[float]: The profanity confidence of each text, in input order
+        """
+        keys = [ResultCache.make_key(text, self.model_name) for text in texts]
+        scores, waiting, owned = self.cache.reserve(keys)
+
+        if owned:
+            text_by_key = dict(zip(keys, texts))
+            try:
+                computed = self._compute_scores([text_by_key[key] for key in owned])
+            except BaseException as e:
+                for key in owned:
+                    self.cache.fail(key, e)
+                raise
+
+            for key, score in zip(owned, computed):
+                self.cache.fulfill(key, score)
+                scores[key] = score
+
+        # Wait for identical texts another batch is currently scoring
+        for key, future in waiting.items():
+            scores[key] = future.result()
+
+        return [scores[key] for key in keys]
+
+    def _compute_scores(self, texts: list[str], cache_tokens: bool = True) -> list[float]:
+        """
+        Score texts in length-sorted buckets of at most max_batch_size and max_batch_tokens.
+
+        Args:
+            texts: The texts to score
+            cache_tokens: Keep the token ids of the texts in the encoder's cache
+
+        Returns:
+            List[float]: The profanity confidence of each text, in input order
+        """
+        logger.debug(f"Processing batch of {len(texts)} texts")
+
+        # Tokenize all texts at once without padding to learn their lengths
+        metrics = get_metrics()
+        start_time = time.perf_counter()
+        with label("tokenize"):
+            input_ids = self.encoder.encode(texts, cache=cache_tokens)
+        metrics.tokenize_seconds.labels(model=self.model_name).observe(
+            time.perf_counter() - start_time
+        )
+        tokens = metrics.tokens.labels(model=self.model_name)
+        for ids in input_ids:
+            tokens.observe(len(ids))
+
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+
+        predictions: list[float] = [0.0] * len(texts)
+        for bucket in self._buckets(order, [len(ids) for ids in input_ids]):
+            scores = self._score([input_ids[i] for i in bucket])
+            for i, score in zip(bucket, scores):
+                predictions[i] = score
+
+        return predictions
+
+    def _buckets(self, order: list[int], lengths: list[int]) -> list[list[int]]:
+        """
+        Split length-sorted texts into the buckets of one forward pass each.
+
+        A bucket is closed when it holds max_batch_size texts or when adding
+        the next (longest so far) text would pad it to more than
+        max_batch_tokens tokens. A text longer than the budget gets a bucket
+        of its own.
+
+        Args:
+            order: Indices of the texts, sorted by token length
+            lengths: Token length of each text
+
+        Returns:
+            List[List[int]]: The indices of the texts in each bucket
+        """
+        buckets: list[list[int]] = []
+        bucket: list[int] = []
+        for index in order:
+            size = len(bucket) + 1
+            padded_tokens = size * self.encoder.padded_length(lengths[index], size)
+            if bucket and (
+                size > self.max_batch_size
+                or (self.max_batch_tokens and padded_tokens > self.max_batch_tokens)
+            ):
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(index)
+        if bucket:
+            buckets.append(bucket)
+        return buckets
+
+    def _score(self, input_ids: list[list[int]]) -> list[float]:
+        """
+        Run one forward pass over token ids padded to (about) the longest sequence.
+
+        Args:
+            input_ids: Token ids of each text in the bucket
+
+        Returns:
+            List[float]: The profanity confidence of each text
+        """
+        import torch
+
+        padded, attention_mask = self.encoder.pad(input_ids)
+
+        metrics = get_metrics()
+        metrics.batch_size.labels(model=self.model_name).observe(len(input_ids))
+        start_time = time.perf_counter()
+        with label("forward"):
+            logits = self.backend.predict(padded, attention_mask)
+        metrics.forward_seconds.labels(model=self.model_name).observe(
+            time.perf_counter() - start_time
+        )
+
+        # Get prediction scores for the "toxic" label
+        return torch.softmax(logits, dim=1)[:, 1].tolist()
+
+
+def _without(text: str, words: list[tuple[int, int]], indices: list[int]) -> str:
+    """Leave the words with the given indices out of a text."""
+    parts = []
+    position = 0
+    for index in sorted(indices):
+        start, end = words[index]
+        parts.append(text[position:start])
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+_service_lock = threading.Lock()
 
 
-@lru_cache
 def get_profanity_service() -> ProfanityService:
+    """
+    Get the singleton instance of the ProfanityService.
+
+    Dependencies are resolved on worker threads, so concurrent first requests
+    must not each load their own copy of the model.
+
+    Returns:
+        ProfanityService: A singleton instance of the profanity detection service
+    """
+    with _service_lock:
+        return _create_profanity_service()
+
+
+@lru_cache
+def _create_profanity_service() -> ProfanityService:
     """
     Create and cache a singleton instance of the ProfanityService.
 
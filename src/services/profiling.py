@@ -0,0 +1,281 @@
+import contextlib
+import contextvars
+import cProfile
+import random
+import secrets
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from src.config import Settings, get_settings
+from src.config.logging import get_logger
+
+logger = get_logger("services.profiling")
+
+T = TypeVar("T")
+
+# Files written for each profile: the torch profiler trace (open it in
+# chrome://tracing or Perfetto) and the Python profile (open it with pstats or snakeviz)
+TRACE_SUFFIX = ".trace.json"
+STATS_SUFFIX = ".pstats"
+SUFFIXES = (TRACE_SUFFIX, STATS_SUFFIX)
+
+# Id of the profile requested for the current request, inherited by the tasks it starts
+_requested: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "requested_profile", default=None
+)
+
+
+# Set on the thread running a profiled call
+_profiling = threading.local()
+
+
+def label(name: str) -> contextlib.AbstractContextManager:
+    """
+    Name a range of a profiled call in the torch profiler trace.
+
+    Outside of profiled calls this costs nothing, unlike torch's record_function.
+
+    Args:
+        name: Name of the range, e.g. "forward"
+
+    Returns:
+        A context manager covering the range
+    """
+    if not getattr(_profiling, "active", False):
+        return contextlib.nullcontext()
+
+    from torch.profiler import record_function
+
+    return record_function(name)
+
+
+def new_profile_id(trigger: str) -> str:
+    """
+    Create a unique profile id that sorts by creation time.
+
+    Args:
+        trigger: What started the profile ("request" or "sample")
+
+    Returns:
+        str: The id, e.g. 20240101T120000-request-1a2b3c4d
+    """
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{trigger}-{uuid.uuid4().hex[:8]}"
+
+
+def request_profile(profile_id: str) -> None:
+    """
+    Profile the inference calls of the current request (and of the tasks it starts).
+
+    Args:
+        profile_id: Id under which the profile is saved
+    """
+    _requested.set(profile_id)
+
+
+def requested_profile() -> Optional[str]:
+    """
+    Get the id of the profile requested for the current request.
+
+    Returns:
+        Optional[str]: The profile id, or None if no profile was requested
+    """
+    return _requested.get()
+
+
+def is_admin(token: Optional[str], s: Settings) -> bool:
+    """
+    Whether a request carries the admin token.
+
+    Args:
+        token: The token sent by the client
+        s: Application settings with PROFILING_ADMIN_TOKEN
+
+    Returns:
+        bool: False if no admin token is configured
+    """
+    if not s.PROFILING_ADMIN_TOKEN or token is None:
+        return False
+    return secrets.compare_digest(token.encode(), s.PROFILING_ADMIN_TOKEN.encode())
+
+
+class Profiler:
+    """
+    Profiles inference calls with the torch profiler and cProfile.
+
+    A call is profiled if the request it serves asked for a profile (see
+    request_profile) or if it is sampled with probability sample_rate. Both
+    profilers are process-wide, so only one call is profiled at a time;
+    calls that would be profiled while another profile runs are not. The
+    profiles are written to directory, which keeps the newest max_profiles.
+    """
+
+    def __init__(self, directory: Path, sample_rate: float = 0.0, max_profiles: int = 20):
+        """
+        Initialize the profiler.
+
+        Args:
+            directory: Where the profiles are written
+            sample_rate: Share of inference calls profiled without being requested
+            max_profiles: Number of profiles kept before the oldest are deleted
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_profiles = max(1, max_profiles)
+
+        self._lock = threading.Lock()
+
+    def choose(self) -> Optional[str]:
+        """
+        Decide whether the next inference call of the current request is profiled.
+
+        Returns:
+            Optional[str]: The id to save the profile under, or None to run unprofiled
+        """
+        profile_id = requested_profile()
+        if profile_id is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            profile_id = new_profile_id("sample")
+        return profile_id
+
+    def run(self, profile_id: str, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking call under the torch profiler and cProfile and save both profiles.
+
+        Args:
+            profile_id: Id to save the profile under
+            func: The blocking function to run
+            *args: Positional arguments for func
+
+        Returns:
+            The return value of func
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.debug(f"Skipping profile {profile_id}, another profile is running")
+            return func(*args)
+
+        try:
+            from torch.profiler import ProfilerActivity, profile
+
+            python_profile = cProfile.Profile()
+            torch_profile = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            try:
+                with torch_profile:
+                    _profiling.active = True
+                    python_profile.enable()
+                    try:
+                        return func(*args)
+                    finally:
+                        python_profile.disable()
+                        _profiling.active = False
+            finally:
+                # Failed calls are saved too, they may be what is being diagnosed
+                try:
+                    self._save(profile_id, torch_profile, python_profile)
+                except Exception as e:
+                    logger.error(f"Could not save profile {profile_id}: {e}")
+        finally:
+            self._lock.release()
+
+    def list_profiles(self) -> list[dict[str, Any]]:
+        """
+        List the saved profiles, newest first.
+
+        Returns:
+            List[Dict]: id, created_at (Unix time) and the file names and sizes of each profile
+        """
+        profiles: dict[str, dict[str, Any]] = {}
+        for path in self._files():
+            profile_id = _profile_id(path.name)
+            stat = path.stat()
+            entry = profiles.setdefault(
+                profile_id, {"id": profile_id, "created_at": stat.st_mtime, "files": []}
+            )
+            entry["created_at"] = min(entry["created_at"], stat.st_mtime)
+            entry["files"].append({"name": path.name, "size_bytes": stat.st_size})
+
+        return sorted(
+            profiles.values(), key=lambda entry: (entry["created_at"], entry["id"]), reverse=True
+        )
+
+    def profile_file(self, name: str) -> Optional[Path]:
+        """
+        Get a profile file by name.
+
+        Args:
+            name: The file name as listed by list_profiles()
+
+        Returns:
+            Optional[Path]: The file, or None if there is no profile file of that name
+        """
+        # Only plain names of profile files, so that no other file can be read
+        if Path(name).name != name or _profile_id(name) == name:
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def _save(self, profile_id: str, torch_profile: Any, python_profile: cProfile.Profile) -> None:
+        """Write both profiles of a call and delete the oldest profiles over max_profiles."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Write under temporary names, so listed profiles are always complete
+        for suffix, write in (
+            (TRACE_SUFFIX, torch_profile.export_chrome_trace),
+            (STATS_SUFFIX, python_profile.dump_stats),
+        ):
+            path = self.directory / f"{profile_id}{suffix}"
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            write(str(tmp_path))
+            tmp_path.replace(path)
+        logger.info(f"Saved profile {profile_id} to {self.directory}")
+
+        newest_first = self.list_profiles()
+        for entry in newest_first[self.max_profiles :]:
+            for file in entry["files"]:
+                (self.directory / file["name"]).unlink(missing_ok=True)
+
+    def _files(self) -> list[Path]:
+        """The complete profile files in the directory."""
+        if not self.directory.is_dir():
+            return []
+        return [path for path in self.directory.iterdir() if path.name.endswith(SUFFIXES)]
+
+
+def _profile_id(name: str) -> str:
+    """Get the profile id of a profile file name (or the name itself for other files)."""
+    for suffix in SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    """
+    Get the singleton instance of the Profiler.
+
+    Returns:
+        Profiler: A singleton profiler writing to DATA_DIR/profiles
+    """
+    with _profiler_lock:
+        return _create_profiler()
+
+
+@lru_cache
+def _create_profiler() -> Profiler:
+    """
+    Create and cache a singleton instance of the Profiler.
+
+    Returns:
+        Profiler: A singleton profiler writing to DATA_DIR/profiles
+    """
+    settings = get_settings()
+    return Profiler(
+        Path(settings.DATA_DIR) / "profiles",
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        max_profiles=settings.PROFILING_MAX_PROFILES,
+    )
@@ -0,0 +1,427 @@
+import abc
+import asyncio
+import hashlib
+import mmap
+import multiprocessing
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from src.config import Settings
+from src.config.logging import get_logger
+
+logger = get_logger("services.ratelimit")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+_RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+class Rate(NamedTuple):
+    """A rate limit of `limit` requests per `period` seconds."""
+
+    limit: int
+    period: float
+
+    @property
+    def refill_per_second(self) -> float:
+        """Tokens added back to a bucket per second."""
+        return self.limit / self.period
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of taking a token from a bucket."""
+
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+
+def parse_rate(spec: str) -> Optional[Rate]:
+    """
+    Parse a rate limit like "10/minute", "100 per second" or "50/5minutes".
+
+    Args:
+        spec: The rate limit string ("unlimited" disables the limit)
+
+    Returns:
+        Optional[Rate]: The parsed rate, or None for "unlimited"
+
+    Raises:
+        ValueError: If the string is not a valid rate limit
+    """
+    if spec.strip().lower() == "unlimited":
+        return None
+
+    match = _RATE_PATTERN.match(spec.lower())
+    if match is None:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'")
+
+    limit, multiplier, unit = match.groups()
+    return Rate(int(limit), int(multiplier or 1) * PERIODS[unit])
+
+
+class RateLimitStorage(abc.ABC):
+    """
+    Base class for storages holding token buckets.
+
+    Each bucket starts full with `limit` tokens and refills continuously at
+    `limit / period` tokens per second. Taking a token is a single atomic
+    operation on the storage.
+    """
+
+    @abc.abstractmethod
+    async def acquire(self, key: str, rate: Rate, cost: float = 1.0) -> RateLimitResult:
+        """
+        Take tokens from the bucket of a key if enough are left.
+
+        Args:
+            key: Identifies the bucket (e.g. route and client address)
+            rate: The rate limit of the bucket
+            cost: Number of tokens to take
+
+        Returns:
+            RateLimitResult: Whether the tokens were taken, the tokens left and
+            the seconds until enough tokens are available again
+        """
+
+
+def _take(
+    tokens: float, updated_at: float, now: float, rate: Rate, cost: float
+) -> tuple[float, RateLimitResult]:
+    """Refill a bucket up to now and take tokens from it if enough are left."""
+    tokens = min(rate.limit, tokens + max(0.0, now - updated_at) * rate.refill_per_second)
+    if tokens >= cost:
+        tokens -= cost
+        return tokens, RateLimitResult(True, tokens, 0.0)
+    return tokens, RateLimitResult(False, tokens, (cost - tokens) / rate.refill_per_second)
+
+
+class MemoryStorage(RateLimitStorage):
+    """
+    Token buckets in a dictionary of the current process.
+
+    Buckets are kept in least recently used order and the oldest are dropped
+    beyond max_keys, so memory stays bounded with many clients.
+    """
+
+    def __init__(self, max_keys: int = 65536):
+        """
+        Initialize the storage.
+
+        Args:
+            max_keys: Maximum number of buckets kept
+        """
+        self.max_keys = max_keys
+
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, rate: Rate, cost: float = 1.0) -> RateLimitResult:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (rate.limit, now))
+            tokens, result = _take(tokens, updated_at, now, rate, cost)
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return result
+
+
+class SharedMemoryStorage(RateLimitStorage):
+    """
+    Token buckets in an anonymous shared memory table, shared by forked workers.
+
+    The table must be created before the worker processes are forked. Each
+    slot holds a 64-bit key hash, the token count and the last update time.
+    A key is looked up in a few neighbouring slots; if all of them are taken
+    by other keys, the least recently updated bucket is replaced.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+    _PROBES = 8
+    # Pause between attempts to take a busy table lock, the lock is only ever held for microseconds
+    _LOCK_RETRY_SECONDS = 0.0005
+
+    def __init__(self, slots: int = 65536, lock_timeout: float = 0.1):
+        """
+        Initialize the storage.
+
+        Args:
+            slots: Number of buckets the table can hold
+            lock_timeout: Seconds to wait for the table lock before letting a request through
+        """
+        self.slots = max(self._PROBES, slots)
+        self.lock_timeout = lock_timeout
+
+        self._table = mmap.mmap(-1, self.slots * self._SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+    async def acquire(self, key: str, rate: Rate, cost: float = 1.0) -> RateLimitResult:
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8, usedforsecurity=False).digest(), "little"
+        )
+        key_hash = digest or 1
+        first = digest % self.slots
+
+        # Never block the event loop on the lock, and let the request through
+        # if a worker died while holding it
+        deadline = time.monotonic() + self.lock_timeout
+        while not self._lock.acquire(block=False):
+            if time.monotonic() >= deadline:
+                logger.warning("Rate limit table lock timed out, letting request through")
+                return RateLimitResult(True, 0.0, 0.0)
+            await asyncio.sleep(self._LOCK_RETRY_SECONDS)
+
+        try:
+            now = time.monotonic()
+            slot, tokens, updated_at = self._find_slot(key_hash, first, rate, now)
+            tokens, result = _take(tokens, updated_at, now, rate, cost)
+            self._SLOT.pack_into(self._table, slot * self._SLOT.size, key_hash, tokens, now)
+        finally:
+            self._lock.release()
+
+        return result
+
+    def _find_slot(
+        self, key_hash: int, first: int, rate: Rate, now: float
+    ) -> tuple[int, float, float]:
+        """Find the slot of a key, or claim a free or the least recently updated one."""
+        oldest_slot, oldest_time = first, float("inf")
+        for probe in range(self._PROBES):
+            slot = (first + probe) % self.slots
+            slot_hash, tokens, updated_at = self._SLOT.unpack_from(
+                self._table, slot * self._SLOT.size
+            )
+            if slot_hash == key_hash:
+                return slot, tokens, updated_at
+            if slot_hash == 0:
+                return slot, rate.limit, now
+            if updated_at < oldest_time:
+                oldest_slot, oldest_time = slot, updated_at
+
+        return oldest_slot, rate.limit, now
+
+
+# Refill and take tokens atomically on the server, using the server clock so
+# that all API hosts agree on time
+TOKEN_BUCKET_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - updated_at) * refill)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(limit / refill * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+class RedisStorage(RateLimitStorage):
+    """
+    Token buckets in Redis (or any server speaking the Redis protocol).
+
+    Buckets are shared by all workers and hosts using the same server. Each
+    request runs one server-side script, so it costs one round trip. Needs
+    the optional redis dependency.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        timeout: float = 0.5,
+        prefix: str = "badwords:ratelimit:",
+    ):
+        """
+        Initialize the storage.
+
+        Args:
+            url: The Redis URL, like redis://:password@host:6379/0
+            timeout: Seconds to wait for a connection or reply
+            prefix: Prefix of the bucket keys
+
+        Raises:
+            RuntimeError: If the optional redis dependency is missing
+        """
+        _require_redis()
+        self.url = url
+        self.timeout = timeout
+        self.prefix = prefix
+
+        self._script: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, key: str, rate: Rate, cost: float = 1.0) -> RateLimitResult:
+        # The script runs with EVALSHA, falling back to EVAL after a script cache flush
+        allowed, remaining, retry_after = await self._get_script()(
+            keys=[self.prefix + key],
+            args=[rate.limit, repr(rate.refill_per_second), repr(cost)],
+        )
+        return RateLimitResult(allowed == 1, float(remaining), float(retry_after))
+
+    def _get_script(self) -> Any:
+        """Get the token bucket script bound to a client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections cannot be shared across event loops
+            import redis.asyncio
+
+            client = redis.asyncio.Redis.from_url(
+                self.url,
+                socket_timeout=self.timeout,
+                socket_connect_timeout=self.timeout,
+                redis_connect_func=_load_script_on_connect,
+            )
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            self._loop = loop
+        return self._script
+
+
+async def _load_script_on_connect(connection: Any) -> None:
+    """Set up a new Redis connection and load the script, so EVALSHA finds it even after a server restart."""
+    await connection.on_connect()
+    await connection.send_command("SCRIPT", "LOAD", TOKEN_BUCKET_SCRIPT)
+    await connection.read_response()
+
+
+def _require_redis() -> None:
+    """Raise a helpful error if the optional Redis dependency is missing."""
+    try:
+        import redis.asyncio  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "RATE_LIMIT_STORAGE_URI=redis:// requires the optional Redis dependency: "
+            "pip install 'bad-words[redis]'"
+        ) from e
+
+
+class RateLimiter:
+    """
+    Applies per-route token bucket limits per client.
+
+    Routes are identified by their path template (e.g. /api/v1/jobs/{job_id}).
+    Routes listed in route_rates use their own rate, all other routes use
+    default_rate. Exempt routes are never limited. If the storage fails, the
+    request is let through rather than failing the API.
+    """
+
+    def __init__(
+        self,
+        storage: RateLimitStorage,
+        default_rate: Optional[Rate],
+        route_rates: Optional[dict[str, Optional[Rate]]] = None,
+        exempt_paths: Optional[set[str]] = None,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            storage: Where the token buckets are kept
+            default_rate: Rate for routes without their own rate (None for unlimited)
+            route_rates: Rates by route path template (None for unlimited)
+            exempt_paths: Route path templates that are never limited
+        """
+        self.storage = storage
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+        self.exempt_paths = exempt_paths or set()
+
+        self._last_error_log = 0.0
+
+    def rate_for(self, route: str) -> Optional[Rate]:
+        """
+        Get the rate limit of a route.
+
+        Args:
+            route: The path template of the route
+
+        Returns:
+            Optional[Rate]: The rate, or None if the route is not limited
+        """
+        if route in self.exempt_paths:
+            return None
+        return self.route_rates.get(route, self.default_rate)
+
+    async def hit(self, route: str, client: str) -> Optional[RateLimitResult]:
+        """
+        Count a request of a client against the limit of its route.
+
+        Args:
+            route: The path template of the matched route
+            client: Identifies the client, e.g. its address
+
+        Returns:
+            Optional[RateLimitResult]: The outcome, or None if the route is not limited
+        """
+        rate = self.rate_for(route)
+        if rate is None:
+            return None
+
+        try:
+            return await self.storage.acquire(f"{route}:{client}", rate)
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._last_error_log > 10:
+                self._last_error_log = now
+                logger.warning(f"Rate limit storage failed, letting requests through: {e}")
+            return None
+
+
+def create_rate_limiter(s: Settings) -> RateLimiter:
+    """
+    Create the rate limiter configured by the RATE_LIMIT_* settings.
+
+    Must be called before worker processes are forked, so that they share
+    the shared memory storage.
+
+    Args:
+        s: Application settings
+
+    Returns:
+        RateLimiter: The configured rate limiter
+
+    Raises:
+        ValueError: If a rate limit or RATE_LIMIT_STORAGE_URI is invalid
+    """
+    uri = s.RATE_LIMIT_STORAGE_URI
+    scheme = urlparse(uri).scheme
+
+    storage: RateLimitStorage
+    if scheme == "memory":
+        storage = MemoryStorage(max_keys=s.RATE_LIMIT_MAX_CLIENTS)
+    elif scheme == "shared":
+        storage = SharedMemoryStorage(slots=s.RATE_LIMIT_MAX_CLIENTS)
+    elif scheme == "redis":
+        storage = RedisStorage(uri)
+    else:
+        raise ValueError(
+            f"Unknown RATE_LIMIT_STORAGE_URI {uri!r}, expected memory://, shared:// or redis://"
+        )
+
+    route_rates = {path: parse_rate(spec) for path, spec in s.RATE_LIMIT_ROUTES.items()}
+    logger.info(f"Rate limiting with {type(storage).__name__}, default {s.RATE_LIMIT_DEFAULT}")
+    return RateLimiter(
+        storage,
+        default_rate=parse_rate(s.RATE_LIMIT_DEFAULT),
+        route_rates=route_rates,
+        exempt_paths=set(s.RATE_LIMIT_EXEMPT_PATHS),
+    )
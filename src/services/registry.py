@@ -0,0 +1,509 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Optional
+
+from src.config import Settings, get_settings
+from src.config.logging import get_logger
+from src.services.batching import BatchScheduler, get_batch_scheduler
+from src.services.executor import run_inference
+from src.services.language import STOPWORDS, detect_language
+from src.services.metrics import get_metrics
+from src.services.profanity import ProfanityService, get_profanity_service
+
+logger = get_logger("services.registry")
+
+
+class UnsupportedLanguageError(ValueError):
+    """Raised when a text is explicitly routed to a language without a model."""
+
+
+class LoadedModel:
+    """A model loaded by the registry, with its own batching queue."""
+
+    def __init__(
+        self,
+        model_name: str,
+        service: ProfanityService,
+        scheduler: BatchScheduler,
+        memory_bytes: int = 0,
+        pinned: bool = False,
+    ):
+        """
+        Initialize the entry.
+
+        Args:
+            model_name: Name of the model
+            service: The profanity service running the model
+            scheduler: The batch scheduler of this model
+            memory_bytes: Estimated size of the model in memory
+            pinned: Whether the model is never unloaded
+        """
+        self.model_name = model_name
+        self.service = service
+        self.scheduler = scheduler
+        self.memory_bytes = memory_bytes
+        self.pinned = pinned
+
+        self.in_flight = 0
+        self.loaded_at = time.time()
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """
+    Routes texts to the model of their language and loads models on demand.
+
+    MODEL_NAME serves DEFAULT_LANGUAGE and is loaded at startup (before the
+    production server forks) and never unloaded. The models in MODELS are
+    loaded on first use, off the inference threads so other models keep
+    serving meanwhile. When the loaded models exceed MODEL_MEMORY_BUDGET_MB,
+    the least recently used models without requests in flight are unloaded.
+
+    Each model has its own batch scheduler, so a busy or loading model never
+    delays the batches of another.
+    """
+
+    def __init__(self, s: Settings):
+        """
+        Initialize the registry without loading any model.
+
+        Args:
+            s: Application settings with MODEL_NAME, DEFAULT_LANGUAGE, MODELS
+                and MODEL_MEMORY_BUDGET_MB
+        """
+        self.settings = s
+        self.default_language = s.DEFAULT_LANGUAGE.lower()
+        self.languages = {
+            self.default_language: s.MODEL_NAME,
+            **{language.lower(): name for language, name in s.MODELS.items()},
+        }
+        self.memory_budget = int(s.MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+        # Loaded models by name, least recently used first
+        self._loaded: OrderedDict[str, LoadedModel] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.languages.values()}
+        # Loads whose requests were cancelled, finished in the background
+        self._abandoned_loads: set[asyncio.Task] = set()
+
+        # Texts in languages the detection does not know always go to the default model
+        undetectable = sorted(
+            language
+            for language in self.languages
+            if language != self.default_language and language not in STOPWORDS
+        )
+        if undetectable:
+            logger.warning(
+                f"No language detection for {', '.join(undetectable)}, texts in these "
+                f"languages only reach their model if the client sends the language "
+                f"(detected: {', '.join(sorted(STOPWORDS))})"
+            )
+
+    def resolve_language(self, text: str, language: Optional[str] = None) -> str:
+        """
+        Choose the language (and so the model) for a text.
+
+        Args:
+            text: The text to check
+            language: Language requested by the client, detected if not given
+
+        Returns:
+            str: A language code with a model
+
+        Raises:
+            UnsupportedLanguageError: If the requested language has no model
+        """
+        if language:
+            language = language.lower()
+            if language not in self.languages:
+                raise UnsupportedLanguageError(
+                    f"Unsupported language {language!r}, expected one of: "
+                    f"{', '.join(sorted(self.languages))}"
+                )
+            return language
+
+        if len(self.languages) == 1:
+            return self.default_language
+        return detect_language(text, self.languages) or self.default_language
+
+    def register(
+        self, model_name: str, service: ProfanityService, scheduler: BatchScheduler
+    ) -> LoadedModel:
+        """
+        Add an already loaded model, which is never unloaded.
+
+        Args:
+            model_name: Name of the model
+            service: The profanity service running the model
+            scheduler: The batch scheduler of the model
+
+        Returns:
+            LoadedModel: The registry entry
+        """
+        model = LoadedModel(
+            model_name, service, scheduler, model_memory_bytes(service), pinned=True
+        )
+        with self._lock:
+            self._loaded[model_name] = model
+        return model
+
+    def preload(self) -> LoadedModel:
+        """
+        Load the model of DEFAULT_LANGUAGE, e.g. at startup, unless it is loaded already.
+
+        Returns:
+            LoadedModel: The registry entry of MODEL_NAME
+        """
+        model_name = self.settings.MODEL_NAME
+        with self._load_locks[model_name]:
+            with self._lock:
+                model = self._loaded.get(model_name)
+            if model is None:
+                model = self._create(model_name)
+                get_metrics().model_loads.labels(model=model_name).inc()
+                with self._lock:
+                    self._sizes[model_name] = model.memory_bytes
+                    self._loaded[model_name] = model
+        return model
+
+    async def check(
+        self, text: str, language: Optional[str] = None, deadline: Optional[float] = None
+    ) -> dict[str, Any]:
+        """
+        Check a text with the model of its language, batched with concurrent requests.
+
+        Args:
+            text: The text to check
+            language: Language of the text, detected if not given
+            deadline: time.monotonic() by which the caller needs the result
+
+        Returns:
+            Dict: The result of ProfanityService.check_text and the language
+
+        Raises:
+            OverloadedError: If the model's queue refuses the text
+        """
+        language = self.resolve_language(text, language)
+        async with self._use(self.languages[language]) as model:
+            result = await model.scheduler.submit(text, deadline)
+        return {**result, "language": language}
+
+    async def check_batch(
+        self,
+        texts: list[str],
+        languages: Optional[list[Optional[str]]] = None,
+        admit: bool = False,
+        deadline: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Check several texts, scoring the texts of each model in one call.
+
+        Args:
+            texts: The texts to check
+            languages: Language of each text (None to detect it)
+            admit: Whether to refuse the texts like check() while a model's queue is overloaded
+            deadline: time.monotonic() by which the caller needs the result
+
+        Returns:
+            List[Dict]: One result per text, in input order, with the language
+
+        Raises:
+            UnsupportedLanguageError: If a requested language has no model
+            OverloadedError: If admit is set and a model's queue refuses the texts
+        """
+        resolved = [
+            self.resolve_language(text, language)
+            for text, language in zip(texts, languages or [None] * len(texts))
+        ]
+
+        groups: dict[str, list[int]] = {}
+        for index, language in enumerate(resolved):
+            groups.setdefault(self.languages[language], []).append(index)
+
+        async def score(model_name: str, indices: list[int]) -> None:
+            async with self._use(model_name) as model:
+                if admit:
+                    model.scheduler.admit(deadline)
+                scores = await run_inference(model.service.check_batch, [texts[i] for i in indices])
+            for index, result in zip(indices, scores):
+                results[index] = {**result, "language": resolved[index]}
+
+        results: list[dict[str, Any]] = [{} for _ in texts]
+        await asyncio.gather(*(score(name, indices) for name, indices in groups.items()))
+        return results
+
+    async def check_long_text(
+        self, text: str, language: Optional[str] = None, deadline: Optional[float] = None
+    ) -> dict[str, Any]:
+        """
+        Check a long text in windows with the model of its language.
+
+        Args:
+            text: The text to check
+            language: Language of the text, detected if not given
+            deadline: time.monotonic() by which the caller needs the result
+
+        Returns:
+            Dict: The result of ProfanityService.check_long_text and the language
+
+        Raises:
+            OverloadedError: If the model's queue is overloaded
+        """
+        language = self.resolve_language(text, language)
+        async with self._use(self.languages[language]) as model:
+            model.scheduler.admit(deadline)
+            result = await run_inference(model.service.check_long_text, text)
+        return {**result, "language": language}
+
+    async def censor(
+        self, text: str, language: Optional[str] = None, deadline: Optional[float] = None
+    ) -> dict[str, Any]:
+        """
+        Check a text and mask its profane words with the model of its language.
+
+        Args:
+            text: The text to censor
+            language: Language of the text, detected if not given
+            deadline: time.monotonic() by which the caller needs the result
+
+        Returns:
+            Dict: The result of ProfanityService.censor_text and the language
+
+        Raises:
+            OverloadedError: If the model's queue is overloaded
+        """
+        language = self.resolve_language(text, language)
+        async with self._use(self.languages[language]) as model:
+            model.scheduler.admit(deadline)
+            result = await run_inference(model.service.censor_text, text)
+        return {**result, "language": language}
+
+    def stats(self) -> list[dict[str, Any]]:
+        """
+        Describe the configured models.
+
+        Returns:
+            List[Dict]: Name, languages, whether loaded, estimated size and
+            requests in flight of each model
+        """
+        with self._lock:
+            loaded = dict(self._loaded)
+
+        stats = []
+        for model_name in dict.fromkeys(self.languages.values()):
+            model = loaded.get(model_name)
+            stats.append(
+                {
+                    "model_name": model_name,
+                    "languages": [
+                        language for language, name in self.languages.items() if name == model_name
+                    ],
+                    "loaded": model is not None,
+                    "pinned": model is not None and model.pinned,
+                    "memory_mb": (model.memory_bytes if model else 0) / (1024 * 1024),
+                    "in_flight": model.in_flight if model else 0,
+                }
+            )
+        return stats
+
+    def memory_usage(self) -> dict[str, Any]:
+        """
+        Measure the memory of this process and of the loaded models, updating the memory gauges.
+
+        Returns:
+            Dict: process_rss_mb and the model_memory_mb of each loaded model
+        """
+        with self._lock:
+            models = {name: model.memory_bytes for name, model in self._loaded.items()}
+
+        rss = get_metrics().record_memory(models)
+        return {
+            "process_rss_mb": rss / (1024 * 1024),
+            "model_memory_mb": {name: size / (1024 * 1024) for name, size in models.items()},
+        }
+
+    @asynccontextmanager
+    async def _use(self, model_name: str) -> AsyncIterator[LoadedModel]:
+        """Get a model, loading it if necessary, and keep it loaded while in use."""
+        with self._lock:
+            model = self._acquire(model_name)
+
+        evicted: list[LoadedModel] = []
+        if model is None:
+            # The load marks the model as in use on its thread, so it must be
+            # released even if this request is cancelled while waiting for it
+            load = asyncio.ensure_future(asyncio.to_thread(self._load, model_name))
+            try:
+                model, evicted = await asyncio.shield(load)
+            except asyncio.CancelledError:
+                task = asyncio.create_task(self._finish_abandoned_load(load))
+                self._abandoned_loads.add(task)
+                task.add_done_callback(self._abandoned_loads.discard)
+                raise
+
+        try:
+            if evicted:
+                await asyncio.shield(_stop_schedulers(evicted))
+            yield model
+        finally:
+            self._release(model)
+
+    async def _finish_abandoned_load(self, load: asyncio.Future) -> None:
+        """Release a model loaded for a cancelled request and stop the models it evicted."""
+        try:
+            model, evicted = await load
+        except Exception:
+            # Logged by the requests waiting for the same load, if any
+            return
+        self._release(model)
+        await _stop_schedulers(evicted)
+
+    def _release(self, model: LoadedModel) -> None:
+        """Mark the end of a request to a model."""
+        # Eviction reads the counter on worker threads
+        with self._lock:
+            model.in_flight -= 1
+            model.last_used = time.time()
+
+    def _acquire(self, model_name: str) -> Optional[LoadedModel]:
+        """Mark a loaded model as in use (with the lock held), or return None."""
+        model = self._loaded.get(model_name)
+        if model is not None:
+            self._loaded.move_to_end(model_name)
+            model.in_flight += 1
+        return model
+
+    def _load(self, model_name: str) -> tuple[LoadedModel, list[LoadedModel]]:
+        """
+        Load a model and unload idle models to stay within the memory budget.
+
+        Runs on a worker thread. Concurrent requests for the same model wait
+        for a single load.
+
+        Returns:
+            Tuple[LoadedModel, List[LoadedModel]]: The model, marked as in use,
+            and the models that were unloaded to make room for it
+        """
+        with self._load_locks[model_name]:
+            with self._lock:
+                model = self._acquire(model_name)
+                if model is not None:
+                    return model, []
+                # Make room up front if the size is known from an earlier load
+                evicted = self._evict_idle(model_name, self._sizes.get(model_name, 0))
+
+            model = self._create(model_name)
+            get_metrics().model_loads.labels(model=model_name).inc()
+
+            with self._lock:
+                self._sizes[model_name] = model.memory_bytes
+                self._loaded[model_name] = model
+                model.in_flight += 1
+                evicted += self._evict_idle(model_name)
+
+        self.memory_usage()
+        return model, evicted
+
+    def _create(self, model_name: str) -> LoadedModel:
+        """Load a model with its own batch scheduler."""
+        start_time = time.time()
+        s = self.settings
+
+        if model_name == s.MODEL_NAME:
+            # The default model is shared with warmup and the production server
+            service = get_profanity_service()
+            scheduler = get_batch_scheduler()
+            pinned = True
+        else:
+            service = ProfanityService(s.model_copy(update={"MODEL_NAME": model_name}))
+            scheduler = BatchScheduler(
+                service,
+                max_batch_size=s.BATCH_MAX_SIZE,
+                max_wait_ms=s.BATCH_MAX_WAIT_MS,
+                max_concurrent_batches=s.INFERENCE_WORKERS,
+                max_queued=s.ADMISSION_MAX_QUEUED,
+                max_queue_wait_ms=s.ADMISSION_MAX_WAIT_MS,
+            )
+            pinned = False
+
+        model = LoadedModel(model_name, service, scheduler, model_memory_bytes(service), pinned)
+        logger.info(
+            f"Loaded model {model_name} ({model.memory_bytes / (1024 * 1024):.0f} MB) "
+            f"in {time.time() - start_time:.2f}s"
+        )
+        return model
+
+    def _evict_idle(self, keep: str, extra_bytes: int = 0) -> list[LoadedModel]:
+        """
+        Unload idle models, least recently used first, until the loaded models
+        (plus extra_bytes) fit into the memory budget. Called with the lock held.
+        """
+        if not self.memory_budget:
+            return []
+
+        total = extra_bytes + sum(model.memory_bytes for model in self._loaded.values())
+        evicted = []
+        for model_name, model in list(self._loaded.items()):
+            if total <= self.memory_budget:
+                break
+            if model_name == keep or model.pinned or model.in_flight:
+                continue
+
+            del self._loaded[model_name]
+            total -= model.memory_bytes
+            evicted.append(model)
+            get_metrics().model_evictions.labels(model=model_name).inc()
+            get_metrics().model_memory.labels(model=model_name).set(0)
+            logger.info(f"Unloaded idle model {model_name} to stay within the memory budget")
+
+        if total > self.memory_budget:
+            logger.warning(
+                f"Loaded models need {total / (1024 * 1024):.0f} MB, more than the memory budget "
+                f"of {self.memory_budget / (1024 * 1024):.0f} MB, because the others are pinned or in use"
+            )
+        return evicted
+
+
+async def _stop_schedulers(models: list[LoadedModel]) -> None:
+    """Stop the batch schedulers of unloaded models."""
+    for model in models:
+        await model.scheduler.stop()
+
+
+def model_memory_bytes(service: ProfanityService) -> int:
+    """Estimated size of the model of a service, or 0 if unknown."""
+    try:
+        return service.backend.memory_bytes()
+    except (AttributeError, NotImplementedError):
+        return 0
+
+
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get the singleton instance of the ModelRegistry.
+
+    Returns:
+        ModelRegistry: A singleton registry of the configured models
+    """
+    with _registry_lock:
+        return _create_model_registry()
+
+
+@lru_cache
+def _create_model_registry() -> ModelRegistry:
+    """
+    Create and cache a singleton instance of the ModelRegistry.
+
+    Returns:
+        ModelRegistry: A singleton registry of the configured models
+    """
+    return ModelRegistry(get_settings())
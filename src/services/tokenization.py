@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from src.config.logging import get_logger
+
+logger = get_logger("services.tokenization")
+
+# Longest token sequence the model accepts
+MAX_SEQUENCE_LENGTH = 512
+
+
+class TokenEncoder:
+    """
+    Tokenization stage between the texts and the model.
+
+    Whole batches are encoded in one call of the (Rust-backed) fast tokenizer,
+    and the token ids of recently seen texts are kept in a thread-safe LRU
+    cache, so repeated texts are not tokenized again. Batches are padded only
+    to their longest sequence, rounded up to a multiple of pad_to_multiple_of
+    so the backend sees few distinct shapes.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        max_length: int = MAX_SEQUENCE_LENGTH,
+        pad_to_multiple_of: int = 8,
+        cache_size: int = 10000,
+        require_fast: bool = False,
+    ):
+        """
+        Initialize the stage.
+
+        Args:
+            tokenizer: The Hugging Face tokenizer of the model
+            max_length: Texts are truncated to this many tokens
+            pad_to_multiple_of: Padded lengths are rounded up to a multiple of this (1 to disable)
+            cache_size: Maximum number of texts whose token ids are cached (0 disables the cache)
+            require_fast: Refuse tokenizers that are not Rust-backed
+
+        Raises:
+            ValueError: If require_fast is set and the tokenizer is not a fast tokenizer
+        """
+        if not getattr(tokenizer, "is_fast", False):
+            message = (
+                f"{type(tokenizer).__name__} is not a fast tokenizer, tokenization runs in "
+                "pure Python and will be slow"
+            )
+            if require_fast:
+                raise ValueError(message)
+            logger.warning(message)
+
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.pad_to_multiple_of = max(1, pad_to_multiple_of)
+        self.cache_size = cache_size
+
+        self._cache: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, texts: list[str], cache: bool = True) -> list[list[int]]:
+        """
+        Get the token ids of texts, tokenizing only those not in the cache.
+
+        Args:
+            texts: The texts to encode
+            cache: Look up and keep the texts in the cache (off for one-off
+                texts that would only push out useful entries)
+
+        Returns:
+            List[List[int]]: Token ids (with special tokens, without padding) of
+            each text, in input order. The lists are shared with the cache and
+            must not be modified.
+        """
+        if self.cache_size <= 0 or not cache:
+            return self._tokenize(texts)
+
+        encoded: dict[str, list[int]] = {}
+        with self._lock:
+            for text in texts:
+                ids = self._cache.get(text)
+                if ids is not None:
+                    self._cache.move_to_end(text)
+                    encoded[text] = ids
+                    self.hits += 1
+
+        missing = list(dict.fromkeys(text for text in texts if text not in encoded))
+        if missing:
+            encoded.update(zip(missing, self._tokenize(missing)))
+            with self._lock:
+                self.misses += len(missing)
+                for text in missing:
+                    self._cache[text] = encoded[text]
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [encoded[text] for text in texts]
+
+    def padded_length(self, longest: int, batch_size: int) -> int:
+        """
+        Get the sequence length a batch is padded to.
+
+        Args:
+            longest: Number of tokens of the longest sequence in the batch
+            batch_size: Number of sequences in the batch
+
+        Returns:
+            int: The padded sequence length
+        """
+        # A lone sequence is not padded at all: an all-ones attention mask lets
+        # the model skip masking, which costs more than the rounding saves
+        if batch_size <= 1:
+            return longest
+        length = -(-longest // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        return min(length, max(longest, self.max_length))
+
+    def pad(self, input_ids: list[list[int]]) -> tuple[Any, Any]:
+        """
+        Pad token ids to a rectangular batch.
+
+        Args:
+            input_ids: Token ids of each text
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]: The padded ids and the attention mask
+        """
+        import numpy as np
+        import torch
+
+        lengths = [len(ids) for ids in input_ids]
+        length = self.padded_length(max(lengths), len(input_ids))
+
+        # Filling a numpy buffer row by row is much faster than building
+        # tensors from nested lists
+        padded = np.full((len(input_ids), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        for row, ids in enumerate(input_ids):
+            padded[row, : len(ids)] = ids
+        attention_mask = np.arange(length) < np.array(lengths)[:, None]
+
+        return torch.from_numpy(padded), torch.from_numpy(attention_mask.astype(np.int64))
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the token id cache counters.
+
+        Returns:
+            Dict: Size, max_size, hits, misses and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _tokenize(self, texts: list[str]) -> list[list[int]]:
+        """Tokenize a batch of texts in one call, without padding."""
+        return self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
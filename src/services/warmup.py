@@ -0,0 +1,70 @@
+import time
+from typing import Optional
+
+from src.config import Settings
+from src.config.logging import get_logger
+from src.services.executor import run_inference
+from src.services.registry import get_model_registry
+
+logger = get_logger("services.warmup")
+
+
+class Readiness:
+    """
+    Tracks whether the model is loaded and warm enough to take traffic.
+    """
+
+    STARTING = "starting"
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, status: str = STARTING):
+        self.status = status
+        self.error: Optional[str] = None
+        self.since = time.time()
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether inference is loaded and warm."""
+        return self.status == self.READY
+
+    def set(self, status: str, error: Optional[str] = None) -> None:
+        """Move to a new status."""
+        self.status = status
+        self.error = error
+        self.since = time.time()
+        logger.info(f"Readiness: {status}" + (f" ({error})" if error else ""))
+
+
+async def warm_up(s: Settings, readiness: Readiness) -> None:
+    """
+    Load the model and run warmup batches on the inference executor.
+
+    Runs in the background during startup, so liveness checks already
+    succeed while the model loads and readiness follows once it is warm.
+
+    Args:
+        s: Application settings
+        readiness: The readiness state to update
+    """
+    try:
+        readiness.set(Readiness.LOADING)
+        registry = get_model_registry()
+        model = await run_inference(registry.preload)
+
+        readiness.set(Readiness.WARMING)
+        await run_inference(model.service.warmup, s.WARMUP_BATCHES)
+
+        # Measured after the warmup batches, so the resident memory includes their activations
+        memory = registry.memory_usage()
+        logger.info(
+            f"Memory after warmup: {memory['process_rss_mb']:.0f} MB resident, "
+            f"model {model.memory_bytes / (1024 * 1024):.0f} MB ({s.MODEL_PRECISION})"
+        )
+
+        readiness.set(Readiness.READY)
+    except Exception as e:
+        logger.error(f"Model warmup failed: {e}")
+        readiness.set(Readiness.FAILED, str(e))
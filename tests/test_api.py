@@ -1,33 +1,61 @@
+import json
+import time
 from unittest import mock
 
+import msgpack
 import pytest
 from fastapi.testclient import TestClient
 
 from src.api.app import create_app
-from src.services.profanity import ProfanityService
+from src.config import get_settings
+from src.services.batching import BatchScheduler, get_batch_scheduler
+from src.services.jobs import JobStore, get_job_store
+from src.services.profanity import ProfanityService, get_profanity_service
+from src.services.profiling import Profiler, get_profiler
+from src.services.registry import ModelRegistry, get_model_registry
+
+
+def _result_for_each(result):
+    """Build a check_batch side effect returning the same result for every text."""
+    return lambda texts: [dict(result) for _ in texts]
 
 
 @pytest.fixture
 def mock_profanity_service():
     """Fixture for mocked profanity service."""
-    # Use a more strict way of patching that affects the test client
-    with mock.patch("src.api.v1.endpoints.profanity.get_profanity_service") as mock_get_service:
-        service = mock.MagicMock(spec=ProfanityService)
+    service = mock.MagicMock(spec=ProfanityService)
 
-        # Default behavior: not profane
-        service.check_text.return_value = {
-            "is_profane": False,
-            "confidence": 0.1,
-        }
+    # Default behavior: not profane
+    service.check_batch.side_effect = _result_for_each({"is_profane": False, "confidence": 0.1})
 
-        mock_get_service.return_value = service
-        yield service
+    return service
 
 
 @pytest.fixture
-def client(mock_profanity_service):
+def job_store(tmp_path):
+    """Fixture for a job queue in a temporary database."""
+    return JobStore(tmp_path / "jobs.sqlite3", max_queued_texts=5)
+
+
+@pytest.fixture
+def client(mock_profanity_service, job_store):
     """Fixture for TestClient with mocked dependencies."""
     app = create_app()
+
+    # Route the check endpoints through a scheduler backed by the mocked service
+    settings = get_settings()
+    scheduler = BatchScheduler(
+        mock_profanity_service,
+        max_batch_size=settings.BATCH_MAX_SIZE,
+        max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+    )
+    registry = ModelRegistry(settings)
+    registry.register(settings.MODEL_NAME, mock_profanity_service, scheduler)
+    app.dependency_overrides[get_batch_scheduler] = lambda: scheduler
+    app.dependency_overrides[get_profanity_service] = lambda: mock_profanity_service
+    app.dependency_overrides[get_model_registry] = lambda: registry
+    app.dependency_overrides[get_job_store] = lambda: job_store
+
     return TestClient(app)
 
 
@@ -42,6 +70,47 @@ def test_health_endpoint(client):
     assert "version" in data
 
 
+def test_ready_endpoint_before_warmup(client):
+    """Test the readiness endpoint fails while the model is not warm."""
+    response = client.get("/api/v1/ready")
+
+    assert response.status_code == 503
+
+    data = response.json()
+    assert data["ready"] is False
+    assert data["status"] == "starting"
+
+
+def test_ready_endpoint_after_warmup(mock_profanity_service):
+    """Test the readiness endpoint succeeds once the lifespan warmup loaded the model."""
+    mock_profanity_service.backend = mock.MagicMock()
+    mock_profanity_service.backend.memory_bytes.return_value = 3 * 1024 * 1024
+    settings = get_settings()
+    registry = ModelRegistry(settings)
+    app = create_app()
+    app.dependency_overrides[get_model_registry] = lambda: registry
+
+    with (
+        mock.patch("src.services.warmup.get_model_registry", return_value=registry),
+        mock.patch(
+            "src.services.registry.get_profanity_service", return_value=mock_profanity_service
+        ),
+        mock.patch("src.services.registry.get_batch_scheduler"),
+        TestClient(app) as client,
+    ):
+        for _ in range(100):
+            response = client.get("/api/v1/ready")
+            if response.status_code == 200:
+                break
+        config = client.get("/api/v1/config").json()
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "ready": True}
+    mock_profanity_service.warmup.assert_called_once()
+    # The warmup loads the default model into the registry, whose memory /config reports
+    assert config["model_memory_mb"] == {settings.MODEL_NAME: 3.0}
+
+
 def test_config_endpoint(client):
     """Test the config endpoint."""
     response = client.get("/api/v1/config")
@@ -55,15 +124,32 @@ def test_config_endpoint(client):
     assert "rate_limit" in data
     assert "max_text_length" in data
     assert "model_name" in data
+    assert data["model_precision"] == "fp32"
+    assert data["process_rss_mb"] > 0
+    assert data["model_memory_mb"] == {get_settings().MODEL_NAME: 0}
+
+
+def test_rate_limit(client):
+    """Test that clients over the default rate limit get 429 with Retry-After."""
+    limit = int(get_settings().RATE_LIMIT_DEFAULT.split("/")[0])
+
+    responses = [client.get("/api/v1/config") for _ in range(limit + 1)]
+
+    assert all(r.status_code == 200 for r in responses[:limit])
+    assert responses[limit].status_code == 429
+    assert responses[limit].json() == {"detail": "Rate limit exceeded", "status_code": 429}
+    assert int(responses[limit].headers["retry-after"]) > 0
+
+    # Health checks are never limited
+    assert client.get("/api/v1/health").status_code == 200
 
 
 def test_check_profanity_clean_text(client, mock_profanity_service):
     """Test check endpoint with clean text."""
     # Configure mock to return clean result with specific confidence
-    mock_profanity_service.check_text.return_value = {
-        "is_profane": False,
-        "confidence": 0.1,
-    }
+    mock_profanity_service.check_batch.side_effect = _result_for_each(
+        {"is_profane": False, "confidence": 0.1}
+    )
 
     response = client.post("/api/v1/check", json={"text": "This is a clean text"})
 
@@ -73,15 +159,42 @@ def test_check_profanity_clean_text(client, mock_profanity_service):
     assert "is_profane" in data
     assert "confidence" in data
     assert data["original_text"] == "This is a clean text"
+    assert data["language"] == get_settings().DEFAULT_LANGUAGE
+
+
+def test_check_without_text_as_msgpack(client):
+    """Test that the input echo can be turned off and MessagePack be negotiated."""
+    response = client.post(
+        "/api/v1/check/batch",
+        json={"texts": ["one", "two"], "include_text": False},
+        headers={"Accept": "application/msgpack"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    results = msgpack.unpackb(response.content)["results"]
+    assert [r["confidence"] for r in results] == [0.1, 0.1]
+    assert all("original_text" not in r for r in results)
+
+    response = client.post("/api/v1/check", json={"text": "one", "include_text": False})
+    assert response.headers["content-type"] == "application/json"
+    assert "original_text" not in response.json()
+
+
+def test_check_profanity_unsupported_language(client):
+    """Test check endpoint rejects languages without a model."""
+    response = client.post("/api/v1/check", json={"text": "some text", "language": "xx"})
+
+    assert response.status_code == 422
+    assert "Unsupported language" in response.text
 
 
 def test_check_profanity_bad_text(client, mock_profanity_service):
     """Test check endpoint with profane text."""
     # Configure mock to return profane result
-    mock_profanity_service.check_text.return_value = {
-        "is_profane": True,
-        "confidence": 0.9,
-    }
+    mock_profanity_service.check_batch.side_effect = _result_for_each(
+        {"is_profane": True, "confidence": 0.9}
+    )
 
     response = client.post("/api/v1/check", json={"text": "This is a bad text"})
 
@@ -90,6 +203,7 @@ def test_check_profanity_bad_text(client, mock_profanity_service):
     data = response.json()
     assert "is_profane" in data
     assert "confidence" in data
+    assert data["is_profane"] is True
     assert data["original_text"] == "This is a bad text"
 
 
@@ -101,3 +215,267 @@ def test_check_profanity_too_long(client):
     response = client.post("/api/v1/check", json={"text": too_long_text})
 
     assert response.status_code == 422  # Validation error (handled by Pydantic)
+
+
+def test_check_deadline(client, mock_profanity_service):
+    """Test that checks answer 504 after their deadline and 503 if it cannot be met."""
+
+    def slow(texts):
+        time.sleep(0.3)
+        return [{"is_profane": False, "confidence": 0.1} for _ in texts]
+
+    mock_profanity_service.check_batch.side_effect = slow
+    headers = {"X-Request-Deadline-Ms": "50"}
+
+    response = client.post("/api/v1/check", json={"text": "slow"}, headers=headers)
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Deadline exceeded", "status_code": 504}
+
+    # Shorter than the time a batch waits to fill up
+    response = client.post(
+        "/api/v1/check", json={"text": "slow"}, headers={"X-Request-Deadline-Ms": "1"}
+    )
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+    response = client.post("/api/v1/check/batch", json={"texts": ["slow"]}, headers=headers)
+    assert response.status_code == 504
+
+    # The other checks are refused under the same conditions
+    for path, body in [
+        ("/api/v1/check/batch", {"texts": ["slow"]}),
+        ("/api/v1/check/long", {"text": "slow"}),
+        ("/api/v1/censor", {"text": "slow"}),
+    ]:
+        response = client.post(path, json=body, headers={"X-Request-Deadline-Ms": "1"})
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+    response = client.post(
+        "/api/v1/check", json={"text": "slow"}, headers={"X-Request-Deadline-Ms": "soon"}
+    )
+    assert response.status_code == 400
+
+
+def test_check_batch_endpoint(client, mock_profanity_service):
+    """Test batch endpoint with valid and too long texts."""
+    too_long_text = "x" * 1000
+
+    response = client.post(
+        "/api/v1/check/batch", json={"texts": ["clean text", too_long_text, "other text"]}
+    )
+
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [r["original_text"] for r in results] == ["clean text", too_long_text, "other text"]
+    assert results[0]["is_profane"] is False
+    assert "error" not in results[0]
+    assert "Text exceeds maximum length" in results[1]["error"]
+    assert "is_profane" not in results[1]
+    assert results[2]["confidence"] == 0.1
+
+    # Only the valid texts reach the model
+    mock_profanity_service.check_batch.assert_called_once_with(["clean text", "other text"])
+
+
+def test_check_long_text_endpoint(client, mock_profanity_service):
+    """Test long text endpoint returns the offending window."""
+    long_text = "clean " * 200 + "bad words"
+    mock_profanity_service.check_long_text.return_value = {
+        "is_profane": True,
+        "confidence": 0.9,
+        "window": {"start": 1100, "end": len(long_text), "text": long_text[1100:]},
+        "windows_scored": 2,
+        "windows_total": 2,
+    }
+
+    response = client.post("/api/v1/check/long", json={"text": long_text})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["is_profane"] is True
+    assert data["window"]["text"].endswith("bad words")
+    assert data["windows_scored"] == 2
+    mock_profanity_service.check_long_text.assert_called_once_with(long_text)
+
+
+def test_censor_endpoint(client, mock_profanity_service):
+    """Test censor endpoint returns the masked text and the flagged spans."""
+    mock_profanity_service.censor_text.return_value = {
+        "is_profane": True,
+        "confidence": 0.9,
+        "decided_by": "model",
+        "censored_text": "you ***** person",
+        "spans": [{"start": 4, "end": 9, "score": 0.6}],
+    }
+
+    response = client.post("/api/v1/censor", json={"text": "you worse person"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["censored_text"] == "you ***** person"
+    assert data["spans"] == [{"start": 4, "end": 9, "score": 0.6}]
+    assert data["original_text"] == "you worse person"
+    assert data["language"] == get_settings().DEFAULT_LANGUAGE
+    mock_profanity_service.censor_text.assert_called_once_with("you worse person")
+
+
+def test_check_batch_endpoint_empty(client):
+    """Test batch endpoint rejects an empty list."""
+    response = client.post("/api/v1/check/batch", json={"texts": []})
+
+    assert response.status_code == 422
+
+
+def test_stats_endpoint(client, mock_profanity_service):
+    """Test the stats endpoint exposes result and token cache counters."""
+    mock_profanity_service.cache = mock.MagicMock()
+    mock_profanity_service.cache.stats.return_value = {
+        "size": 1,
+        "max_size": 10,
+        "ttl_seconds": 60.0,
+        "hits": 3,
+        "misses": 1,
+        "coalesced": 0,
+        "evictions": 0,
+        "expirations": 0,
+        "in_flight": 0,
+        "hit_ratio": 0.75,
+    }
+    mock_profanity_service.encoder = mock.MagicMock()
+    mock_profanity_service.encoder.stats.return_value = {
+        "size": 2,
+        "max_size": 10,
+        "hits": 5,
+        "misses": 2,
+        "hit_ratio": 5 / 7,
+    }
+
+    response = client.get("/api/v1/stats")
+
+    assert response.status_code == 200
+    assert response.json()["cache"]["hits"] == 3
+    assert response.json()["token_cache"]["hits"] == 5
+    assert response.json()["models"][0]["loaded"] is True
+
+
+def test_metrics_endpoint(client):
+    """Test the metrics endpoint exposes request metrics in the Prometheus format."""
+    client.get("/api/v1/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'badwords_requests_total{method="GET",route="health_check",status="200"}' in response.text
+    )
+    assert "# TYPE badwords_forward_duration_seconds histogram" in response.text
+
+
+def test_check_stream_endpoint(client, mock_profanity_service):
+    """Test streaming endpoint returns one NDJSON result per input line in order."""
+    body = "\n".join(
+        [
+            '{"id": "a", "text": "clean text"}',
+            '"bare string"',
+            "not json",
+            "",
+            json.dumps({"id": "b", "text": "x" * 1000}),
+            '{"text": "last"}',
+            # Within MAX_TEXT_LENGTH once the escapes are decoded
+            json.dumps({"text": "\U0001f600" * get_settings().MAX_TEXT_LENGTH}),
+        ]
+    )
+
+    response = client.post(
+        "/api/v1/check/stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4, 5]
+    assert lines[0]["id"] == "a"
+    assert lines[0]["original_text"] == "clean text"
+    assert lines[0]["is_profane"] is False
+    assert lines[1]["original_text"] == "bare string"
+    assert lines[2]["error"] == "Line is not valid JSON"
+    assert lines[3]["id"] == "b"
+    assert "Text exceeds maximum length" in lines[3]["error"]
+    assert lines[4]["original_text"] == "last"
+    assert lines[5]["original_text"] == "\U0001f600" * get_settings().MAX_TEXT_LENGTH
+
+
+def test_jobs_endpoints(client, job_store):
+    """Test submitting, polling, paging through and deleting a job."""
+    response = client.post("/api/v1/jobs", json={"texts": ["one", "x" * 1000, "three"]})
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["processed"] == 1
+    assert response.headers["location"] == f"/api/v1/jobs/{job['id']}"
+
+    job_store.claim("worker")
+    job_store.save_results(job["id"], "worker", [(0, {"is_profane": False, "confidence": 0.1})])
+    job_store.save_results(job["id"], "worker", [(2, {"is_profane": True, "confidence": 0.9})])
+
+    assert client.get(f"/api/v1/jobs/{job['id']}").json()["status"] == "completed"
+
+    page = client.get(f"/api/v1/jobs/{job['id']}/results", params={"limit": 2}).json()
+    assert [r["index"] for r in page["results"]] == [0, 1]
+    assert "Text exceeds maximum length" in page["results"][1]["error"]
+    assert page["next_offset"] == 2
+
+    page = client.get(f"/api/v1/jobs/{job['id']}/results", params={"offset": 2}).json()
+    assert page["results"][0]["is_profane"] is True
+    assert "next_offset" not in page
+
+    assert client.delete(f"/api/v1/jobs/{job['id']}").status_code == 204
+    assert client.get(f"/api/v1/jobs/{job['id']}").status_code == 404
+
+
+def test_jobs_queue_full(client):
+    """Test that jobs are refused with 503 and Retry-After while the queue is full."""
+    assert client.post("/api/v1/jobs", json={"texts": ["a"] * 4}).status_code == 202
+
+    response = client.post("/api/v1/jobs", json={"texts": ["b"] * 2})
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 0
+
+
+def test_profiling(client, tmp_path):
+    """Test that admins can profile a request and download its profile."""
+    profiler = Profiler(tmp_path / "profiles")
+    client.app.dependency_overrides[get_profiler] = lambda: profiler
+    admin = {"X-Admin-Token": "secret"}
+
+    with (
+        mock.patch.object(get_settings(), "PROFILING_ADMIN_TOKEN", "secret"),
+        mock.patch("src.services.executor.get_profiler", return_value=profiler),
+    ):
+        assert (
+            client.post("/api/v1/check", json={"text": "a"}, headers={"X-Profile": "1"}).status_code
+            == 403
+        )
+        assert client.get("/api/v1/profiles").status_code == 403
+
+        response = client.post(
+            "/api/v1/check", json={"text": "a"}, headers={"X-Profile": "1", **admin}
+        )
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+
+        profiles = client.get("/api/v1/profiles", headers=admin).json()["profiles"]
+        assert [profile["id"] for profile in profiles] == [profile_id]
+
+        response = client.get(f"/api/v1/profiles/{profile_id}.trace.json", headers=admin)
+        assert response.status_code == 200
+        assert "traceEvents" in response.json()
+        assert client.get("/api/v1/profiles/missing.pstats", headers=admin).status_code == 404
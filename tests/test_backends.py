@@ -0,0 +1,145 @@
+from unittest import mock
+
+import pytest
+import torch
+
+from src.config import Settings
+from src.services.backends import (
+    OnnxBackend,
+    TorchBackend,
+    TorchScriptBackend,
+    create_backend,
+    export_onnx,
+    load_bf16_model,
+    load_int8_model,
+)
+
+
+@pytest.fixture
+def tiny_model():
+    """Fixture for a small randomly initialized classifier that needs no download."""
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+    torch.manual_seed(0)
+    config = DistilBertConfig(
+        vocab_size=100, dim=16, hidden_dim=32, n_layers=1, n_heads=2, num_labels=2
+    )
+    return DistilBertForSequenceClassification(config).eval()
+
+
+def test_unknown_backend():
+    """Test that an unknown MODEL_BACKEND is rejected."""
+    with pytest.raises(ValueError, match="Unknown MODEL_BACKEND"):
+        create_backend(Settings(MODEL_BACKEND="tensorflow"), mock.MagicMock())
+
+
+def test_onnx_export_is_reused(tmp_path):
+    """Test that an existing ONNX export is used without loading the torch model."""
+    pytest.importorskip("onnxruntime")
+    onnx_path = tmp_path / "onnx" / "model.onnx"
+    onnx_path.parent.mkdir()
+    onnx_path.touch()
+
+    with mock.patch("src.services.backends.load_torch_model") as load_torch_model:
+        backend = create_backend(Settings(MODEL_BACKEND="onnx"), tmp_path)
+
+    load_torch_model.assert_not_called()
+    assert isinstance(backend, OnnxBackend)
+    assert backend.model_path == onnx_path
+
+
+def test_onnx_backend_matches_torch(tiny_model, tmp_path):
+    """Test that the ONNX export produces the same logits as the torch model."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnxscript")
+
+    onnx_path = tmp_path / "onnx" / "model.onnx"
+    export_onnx(tiny_model, onnx_path)
+
+    input_ids = torch.tensor([[2, 10, 11, 12, 3], [2, 20, 3, 0, 0]])
+    attention_mask = torch.tensor([[1, 1, 1, 1, 1], [1, 1, 1, 0, 0]])
+
+    expected = TorchBackend(tiny_model).predict(input_ids, attention_mask)
+    actual = OnnxBackend(onnx_path).predict(input_ids, attention_mask)
+
+    assert torch.allclose(actual, expected, atol=1e-5)
+
+
+def test_int8_model_is_saved_and_reused(tiny_model, tmp_path):
+    """Test that the INT8 model is quantized once and loaded from disk afterwards."""
+    tiny_model.save_pretrained(str(tmp_path / "model"))
+    input_ids = torch.tensor([[2, 10, 11, 3]])
+    attention_mask = torch.ones_like(input_ids)
+
+    first = TorchBackend(load_int8_model(tmp_path, "tiny"))
+    assert (tmp_path / "model-int8" / "quantized.pt").exists()
+
+    with mock.patch("src.services.backends.load_torch_model") as load_torch_model:
+        second = TorchBackend(load_int8_model(tmp_path, "tiny"))
+    load_torch_model.assert_not_called()
+
+    expected = TorchBackend(tiny_model).predict(input_ids, attention_mask)
+    assert torch.allclose(
+        first.predict(input_ids, attention_mask), second.predict(input_ids, attention_mask)
+    )
+    assert torch.allclose(first.predict(input_ids, attention_mask), expected, atol=1e-2)
+
+
+def test_bf16_model_is_saved_and_reused(tiny_model, tmp_path):
+    """Test that the bf16 model is converted once and stays close to the fp32 model."""
+    tiny_model.save_pretrained(str(tmp_path / "model"))
+    input_ids = torch.tensor([[2, 10, 11, 12, 3], [2, 20, 3, 0, 0]])
+    attention_mask = torch.tensor([[1, 1, 1, 1, 1], [1, 1, 1, 0, 0]])
+
+    first = TorchBackend(load_bf16_model(tmp_path, "tiny"))
+    assert (tmp_path / "model-bf16").exists()
+
+    with mock.patch("src.services.backends.load_torch_model") as load_torch_model:
+        second = TorchBackend(load_bf16_model(tmp_path, "tiny"))
+    load_torch_model.assert_not_called()
+
+    expected = TorchBackend(tiny_model).predict(input_ids, attention_mask)
+    logits = second.predict(input_ids, attention_mask)
+    assert logits.dtype == torch.float32
+    assert torch.equal(first.predict(input_ids, attention_mask), logits)
+    assert torch.allclose(logits, expected, atol=2e-2)
+    assert second.memory_bytes() * 2 == TorchBackend(tiny_model).memory_bytes()
+
+
+def test_onnx_rejects_int8():
+    """Test that INT8 precision is only accepted by the torch backend."""
+    with pytest.raises(ValueError, match="not supported by the onnx backend"):
+        create_backend(Settings(MODEL_BACKEND="onnx", MODEL_PRECISION="int8"), mock.MagicMock())
+
+
+def test_torchscript_model_is_saved_and_reused(tiny_model, tmp_path):
+    """Test that the model is traced once per bucket and loaded from disk afterwards."""
+    tiny_model.save_pretrained(str(tmp_path / "model"))
+    settings = Settings(MODEL_BACKEND="torchscript", TORCHSCRIPT_SEQUENCE_BUCKETS=[8])
+    input_ids = torch.tensor([[2, 10, 11, 12, 3], [2, 20, 3, 0, 0]])
+    attention_mask = torch.tensor([[1, 1, 1, 1, 1], [1, 1, 1, 0, 0]])
+
+    first = create_backend(settings, tmp_path)
+    assert isinstance(first, TorchScriptBackend)
+    assert first.buckets == [8, 512]
+    assert len(list((tmp_path / "torchscript").glob("fp32-torch*.pt"))) == 1
+
+    with mock.patch("src.services.backends.load_torch_model") as load_torch_model:
+        second = create_backend(settings, tmp_path)
+    load_torch_model.assert_not_called()
+
+    expected = TorchBackend(tiny_model).predict(input_ids, attention_mask)
+    assert torch.allclose(first.predict(input_ids, attention_mask), expected, atol=1e-5)
+    assert torch.allclose(second.predict(input_ids, attention_mask), expected, atol=1e-5)
+
+
+def test_torchscript_falls_back_to_eager(tiny_model, tmp_path):
+    """Test that the eager model is used if tracing fails."""
+    tiny_model.save_pretrained(str(tmp_path / "model"))
+
+    with mock.patch(
+        "src.services.backends.trace_torchscript", side_effect=RuntimeError("not traceable")
+    ):
+        backend = create_backend(Settings(MODEL_BACKEND="torchscript"), tmp_path)
+
+    assert isinstance(backend, TorchBackend)
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from src.services.batching import BatchScheduler, OverloadedError
+from src.services.profanity import ProfanityService
+
+
+@pytest.fixture
+def mock_service():
+    """Fixture for a profanity service that records the batches it receives."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.check_batch.side_effect = lambda texts: [
+        {"is_profane": text == "bad", "confidence": float(len(text))} for text in texts
+    ]
+    return service
+
+
+def test_concurrent_requests_share_a_batch(mock_service):
+    """Test that concurrent submissions are scored in a single forward pass."""
+    scheduler = BatchScheduler(mock_service, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        results = await asyncio.gather(*(scheduler.submit(t) for t in ["a", "bad", "ccc"]))
+        await scheduler.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert mock_service.check_batch.call_count == 1
+    assert [r["confidence"] for r in results] == [1.0, 3.0, 3.0]
+    assert [r["is_profane"] for r in results] == [False, True, False]
+
+
+def test_batches_respect_max_batch_size(mock_service):
+    """Test that the scheduler never exceeds the configured batch size."""
+    scheduler = BatchScheduler(mock_service, max_batch_size=2, max_wait_ms=50)
+
+    async def run():
+        results = await asyncio.gather(*(scheduler.submit("x" * i) for i in range(1, 6)))
+        await scheduler.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    batch_sizes = [len(call.args[0]) for call in mock_service.check_batch.call_args_list]
+    assert max(batch_sizes) <= 2
+    assert sum(batch_sizes) == 5
+    assert [r["confidence"] for r in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_batch_errors_reach_every_caller(mock_service):
+    """Test that a failing forward pass is reported to all waiting requests."""
+    mock_service.check_batch.side_effect = RuntimeError("model exploded")
+    scheduler = BatchScheduler(mock_service, max_batch_size=8, max_wait_ms=10)
+
+    async def run():
+        results = await asyncio.gather(
+            scheduler.submit("a"), scheduler.submit("b"), return_exceptions=True
+        )
+        await scheduler.stop()
+        return results
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_concurrent_batches(mock_service):
+    """Test that several batches can run at the same time."""
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def check_batch(texts):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return [{"is_profane": False, "confidence": 0.0} for _ in texts]
+
+    mock_service.check_batch.side_effect = check_batch
+    scheduler = BatchScheduler(
+        mock_service, max_batch_size=1, max_wait_ms=0, max_concurrent_batches=2
+    )
+
+    async def run():
+        await asyncio.gather(*(scheduler.submit(str(i)) for i in range(4)))
+        await scheduler.stop()
+
+    with mock.patch("src.services.executor.get_inference_executor") as get_executor:
+        get_executor.return_value = ThreadPoolExecutor(max_workers=4)
+        asyncio.run(run())
+
+    assert max(peak) == 2
+
+
+def test_admission_control_and_abandoned_texts(mock_service):
+    """Test that a full queue refuses texts and abandoned texts never reach the model."""
+    release = threading.Event()
+    scored = []
+
+    def check_batch(texts):
+        release.wait(5)
+        scored.extend(texts)
+        return [{"is_profane": False, "confidence": 0.0} for _ in texts]
+
+    mock_service.check_batch.side_effect = check_batch
+    scheduler = BatchScheduler(mock_service, max_batch_size=1, max_wait_ms=0, max_queued=2)
+
+    async def run():
+        running = asyncio.create_task(scheduler.submit("a"))
+        while not mock_service.check_batch.called:
+            await asyncio.sleep(0.001)
+
+        # "a" is being scored, so "b" and "c" fill up the queue
+        abandoned = asyncio.create_task(scheduler.submit("b"))
+        queued = asyncio.create_task(scheduler.submit("c"))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+        with pytest.raises(OverloadedError) as refused:
+            await scheduler.submit("d")
+        assert refused.value.reason == "queue_full"
+        assert refused.value.retry_after >= 1
+
+        # Giving up on "b" frees its place in the queue
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+        admitted = asyncio.create_task(scheduler.submit("e"))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(running, queued, admitted)
+        await scheduler.stop()
+
+    asyncio.run(run())
+
+    assert scored == ["a", "c", "e"]
+
+
+def test_unreachable_deadline_is_refused(mock_service):
+    """Test that a text is refused up front when the queue cannot meet its deadline."""
+    scheduler = BatchScheduler(mock_service, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        with pytest.raises(OverloadedError) as refused:
+            await scheduler.submit("a", deadline=time.monotonic() + 0.01)
+        assert refused.value.reason == "deadline_unreachable"
+        result = await scheduler.submit("a", deadline=time.monotonic() + 1)
+        await scheduler.stop()
+        return result
+
+    assert asyncio.run(run())["confidence"] == 1.0
+    assert mock_service.check_batch.call_count == 1
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from unittest import mock
+
+from fastapi import FastAPI
+
+from src.cli.benchmark import (
+    bench_service,
+    compare_runs,
+    main,
+    make_texts,
+    percentile,
+    run_load,
+)
+from src.services.profanity import ProfanityService
+
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = [float(v) for v in range(100, 0, -1)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_make_texts():
+    """Test that texts are distinct, of the requested length and reproducible."""
+    texts = make_texts(20, 40, seed=1)
+
+    assert len(set(texts)) == 20
+    assert all(len(text) == 40 for text in texts)
+    assert texts == make_texts(20, 40, seed=1)
+    assert "sample" in make_texts(1, 30, samples=["sample words"])[0]
+
+
+def test_bench_service():
+    """Test that check_text and check_batch are timed for each length and batch size."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.check_batch.side_effect = lambda texts: [{"is_profane": False}] * len(texts)
+
+    results = bench_service(service, [10, 50], [4], repeats=5, warmup=1)
+
+    assert [r["name"] for r in results] == [
+        "check_text[length=10]",
+        "check_text[length=50]",
+        "check_batch[batch_size=4]",
+    ]
+    assert service.check_text.call_count == 12
+    assert results[2]["items"] == 20
+    assert all(len(call.args[0]) == 4 for call in service.check_batch.call_args_list)
+
+
+def test_run_load():
+    """Test that the load generator drives an ASGI app at the given concurrency."""
+    app = FastAPI()
+    active = 0
+    peak = 0
+
+    @app.post("/check")
+    async def check(payload: dict):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        return {"ok": payload["text"] != "bad"}
+
+    bodies = [json.dumps({"text": "fine"}).encode()] * 30
+    result = asyncio.run(run_load(app, "/check", bodies, concurrency=4, warmup=2))
+
+    assert result["calls"] == 28
+    assert result["errors"] == 0
+    assert peak == 4
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+    result = asyncio.run(run_load(app, "/missing", bodies[:3], concurrency=1))
+    assert result["errors"] == 3
+
+
+def _run(results):
+    """Build a benchmark run with the given results."""
+    return {"results": results}
+
+
+def test_compare_runs():
+    """Test that metrics getting worse by more than the threshold are regressions."""
+    baseline = _run(
+        [
+            {"name": "a", "throughput_per_second": 100.0, "p95_ms": 10.0},
+            {"name": "gone", "p95_ms": 1.0},
+        ]
+    )
+    current = _run(
+        [
+            {"name": "a", "throughput_per_second": 80.0, "p95_ms": 10.5},
+            {"name": "new", "p95_ms": 1.0},
+        ]
+    )
+
+    report = compare_runs(baseline, current, threshold=0.1)
+
+    assert [(c["metric"], c["regression"]) for c in report["changes"]] == [
+        ("p95_ms", False),
+        ("throughput_per_second", True),
+    ]
+    assert len(report["regressions"]) == 1
+    assert report["only_in_baseline"] == ["gone"]
+    assert report["only_in_current"] == ["new"]
+
+
+def test_compare_exit_status(tmp_path):
+    """Test that compare fails only when there are regressions."""
+    baseline = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    baseline.write_text(json.dumps(_run([{"name": "a", "p99_ms": 10.0}])))
+
+    current.write_text(json.dumps(_run([{"name": "a", "p99_ms": 9.0}])))
+    assert main(["compare", str(baseline), str(current), "--output", str(tmp_path / "r")]) == 0
+
+    current.write_text(json.dumps(_run([{"name": "a", "p99_ms": 20.0}])))
+    assert main(["compare", str(baseline), str(current), "--output", str(tmp_path / "r")]) == 1
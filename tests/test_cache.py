@@ -0,0 +1,99 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from src.services.cache import ResultCache
+
+
+def test_reserve_and_fulfill():
+    """Test that fulfilled keys are served from the cache."""
+    cache = ResultCache(max_size=10, ttl_seconds=60)
+
+    hits, waiting, owned = cache.reserve([b"a", b"b", b"a"])
+    assert hits == {}
+    assert waiting == {}
+    assert owned == [b"a", b"b"]
+
+    cache.fulfill(b"a", 0.1)
+    cache.fulfill(b"b", 0.9)
+
+    hits, waiting, owned = cache.reserve([b"a", b"b"])
+    assert hits == {b"a": 0.1, b"b": 0.9}
+    assert owned == []
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["size"] == 2
+
+
+def test_lru_eviction():
+    """Test that the least recently used result is evicted first."""
+    cache = ResultCache(max_size=2, ttl_seconds=60)
+
+    for key in (b"a", b"b"):
+        cache.reserve([key])
+        cache.fulfill(key, 0.5)
+
+    # Touch "a" so that "b" becomes the least recently used entry
+    cache.reserve([b"a"])
+    cache.reserve([b"c"])
+    cache.fulfill(b"c", 0.5)
+
+    hits, _, owned = cache.reserve([b"a", b"b", b"c"])
+    assert set(hits) == {b"a", b"c"}
+    assert owned == [b"b"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test that results expire after the TTL."""
+    cache = ResultCache(max_size=10, ttl_seconds=5)
+
+    with mock.patch("src.services.cache.time.monotonic", return_value=100.0):
+        cache.reserve([b"a"])
+        cache.fulfill(b"a", 0.5)
+
+    with mock.patch("src.services.cache.time.monotonic", return_value=106.0):
+        hits, _, owned = cache.reserve([b"a"])
+
+    assert hits == {}
+    assert owned == [b"a"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_in_flight_requests_are_coalesced():
+    """Test that a key being computed is awaited instead of recomputed."""
+    cache = ResultCache(max_size=10, ttl_seconds=60)
+
+    _, _, owned = cache.reserve([b"a"])
+    assert owned == [b"a"]
+
+    _, waiting, owned = cache.reserve([b"a"])
+    assert owned == []
+
+    threading.Timer(0.01, cache.fulfill, args=(b"a", 0.7)).start()
+    assert waiting[b"a"].result(timeout=1) == 0.7
+    assert cache.stats()["coalesced"] == 1
+
+
+def test_failed_computation_wakes_waiters():
+    """Test that waiters see the error of a failed computation and may retry."""
+    cache = ResultCache(max_size=10, ttl_seconds=60)
+
+    cache.reserve([b"a"])
+    _, waiting, _ = cache.reserve([b"a"])
+    cache.fail(b"a", RuntimeError("boom"))
+
+    with pytest.raises(RuntimeError):
+        waiting[b"a"].result(timeout=1)
+
+    _, _, owned = cache.reserve([b"a"])
+    assert owned == [b"a"]
+
+
+def test_key_depends_on_model():
+    """Test that the same text scored by different models gets different keys."""
+    assert ResultCache.make_key("hello", "model-a") != ResultCache.make_key("hello", "model-b")
+    assert ResultCache.make_key("hello", "model-a") == ResultCache.make_key("hello", "model-a")
@@ -1,7 +1,13 @@
+import logging
 import os
+import re
 import tempfile
 from unittest import mock
 
+import pytest
+from pydantic import ValidationError
+
+from src.config import logging as logging_config
 from src.config.settings import Settings, get_settings
 
 
@@ -60,3 +66,35 @@ def test_data_dir_settings():
             settings = Settings()
 
             assert test_path == settings.DATA_DIR
+
+
+def test_window_settings_are_validated():
+    """Test that windows must hold a token besides the special tokens and advance."""
+    assert Settings(WINDOW_MAX_TOKENS=64, WINDOW_OVERLAP_TOKENS=61).WINDOW_OVERLAP_TOKENS == 61
+
+    with pytest.raises(ValidationError, match="WINDOW_OVERLAP_TOKENS"):
+        Settings(WINDOW_MAX_TOKENS=64, WINDOW_OVERLAP_TOKENS=62)
+    with pytest.raises(ValidationError):
+        Settings(WINDOW_MAX_TOKENS=2)
+    with pytest.raises(ValidationError):
+        Settings(WINDOW_OVERLAP_TOKENS=-1)
+
+
+def test_log_lines_are_formatted_once(monkeypatch, capsys):
+    """Test that a log record passing the log queue is written in the log format."""
+    monkeypatch.setattr(logging_config, "_listener", None)
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    root.handlers = []
+    try:
+        logging_config.setup_logging(Settings(LOG_LEVEL="INFO"))
+        logging_config.get_logger("test").warning("hello %s", "world")
+        logging_config.stop_logging()
+    finally:
+        root.handlers = handlers
+
+    lines = capsys.readouterr().out.splitlines()
+    assert re.fullmatch(
+        r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d \| WARNING  \| bad_words\.test:\d+ \| hello world",
+        lines[-1],
+    )
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+from unittest import mock
+
+from src.config import Settings
+from src.services.executor import configure_torch_threads, run_inference
+
+
+def test_run_inference_uses_inference_thread():
+    """Test that inference runs on the executor instead of the event loop thread."""
+
+    async def run():
+        return threading.current_thread().name, await run_inference(
+            lambda: threading.current_thread().name
+        )
+
+    loop_thread, inference_thread = asyncio.run(run())
+
+    assert inference_thread.startswith("inference")
+    assert inference_thread != loop_thread
+
+
+def test_configure_torch_threads():
+    """Test that configured thread counts are passed to torch."""
+    settings = Settings(TORCH_NUM_THREADS=3, TORCH_INTEROP_THREADS=2)
+
+    with (
+        mock.patch("torch.set_num_threads") as set_num_threads,
+        mock.patch("torch.set_num_interop_threads") as set_num_interop_threads,
+    ):
+        configure_torch_threads(settings)
+
+    set_num_threads.assert_called_once_with(3)
+    set_num_interop_threads.assert_called_once_with(2)
+
+
+def test_configure_torch_threads_defaults():
+    """Test that torch defaults are kept when no thread counts are configured."""
+    with (
+        mock.patch("torch.set_num_threads") as set_num_threads,
+        mock.patch("torch.set_num_interop_threads") as set_num_interop_threads,
+    ):
+        configure_torch_threads(Settings())
+
+    set_num_threads.assert_not_called()
+    set_num_interop_threads.assert_not_called()
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from src.services.jobs import COMPLETED, FAILED, QUEUED, JobRunner, JobStore, QueueFullError
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture for a job queue in a temporary database."""
+    return JobStore(tmp_path / "jobs.sqlite3", max_queued_texts=10, stale_seconds=60)
+
+
+def _registry():
+    """Build a mocked model registry that scores the length of each text."""
+    registry = mock.MagicMock()
+
+    async def check_batch(texts, languages):
+        return [
+            {"is_profane": text == "bad", "confidence": float(len(text)), "language": "de"}
+            for text in texts
+        ]
+
+    registry.check_batch.side_effect = check_batch
+    return registry
+
+
+def test_submit_claim_and_complete(store):
+    """Test that a job is completed once all of its texts have results."""
+    job = store.submit(["a", "bb", "x" * 9], errors={2: "too long"})
+    assert job["status"] == QUEUED
+    assert job["processed"] == 1
+
+    assert store.claim("w1")["id"] == job["id"]
+    assert store.claim("w2") is None
+    assert store.pending_items(job["id"], 10) == [(0, "a"), (1, "bb")]
+
+    assert store.save_results(job["id"], "w1", [(0, {"is_profane": False, "confidence": 0.1})])
+    assert store.get(job["id"])["status"] != COMPLETED
+    assert store.save_results(job["id"], "w1", [(1, {"is_profane": True, "confidence": 0.9})])
+
+    assert store.get(job["id"])["status"] == COMPLETED
+    results = store.results(job["id"], offset=1, limit=5)
+    assert [r["index"] for r in results] == [1, 2]
+    assert results[0]["original_text"] == "bb"
+    assert results[1]["error"] == "too long"
+
+
+def test_queue_applies_backpressure(store):
+    """Test that jobs are refused once too many texts are waiting."""
+    store.submit(["a"] * 8)
+
+    with pytest.raises(QueueFullError):
+        store.submit(["b"] * 3)
+
+    # Jobs without texts to score are always accepted
+    assert store.submit(["c"], errors={0: "too long"})["status"] == COMPLETED
+
+
+def test_stale_claims_are_taken_over(store):
+    """Test that a job of a silent worker moves to another one, and the old one stops."""
+    job = store.submit(["a", "b"])
+    store.claim("dead")
+
+    with mock.patch("src.services.jobs.time.time", return_value=time.time() + 61):
+        assert store.claim("alive")["id"] == job["id"]
+
+    assert not store.save_results(job["id"], "dead", [(0, {"is_profane": False})])
+    assert store.save_results(job["id"], "alive", [(0, {"is_profane": False})])
+
+
+def test_release_requeues_and_cleanup_deletes_expired(store):
+    """Test that released jobs are queued again and finished jobs expire."""
+    job = store.submit(["a"])
+    store.claim("w1")
+    store.release(job["id"], "w1")
+    assert store.get(job["id"])["status"] == QUEUED
+
+    store.claim("w1")
+    store.fail(job["id"], "w1", "model missing")
+    assert store.get(job["id"])["status"] == FAILED
+
+    assert store.cleanup(retention_seconds=3600) == 0
+    assert store.cleanup(retention_seconds=-1) == 1
+    assert store.get(job["id"]) is None
+
+
+def test_runner_scores_jobs_in_chunks(store):
+    """Test that the runner scores a job chunk by chunk with the registry."""
+    registry = _registry()
+    job = store.submit(["a", "bad", "ccc", "dd", "e"], language="de")
+
+    async def run():
+        runner = JobRunner(store, registry, chunk_size=2, poll_interval=0.01)
+        runner.start()
+        for _ in range(200):
+            if store.get(job["id"])["status"] == COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+
+    assert store.get(job["id"])["status"] == COMPLETED
+    assert registry.check_batch.call_count == 3
+    registry.check_batch.assert_any_call(["a", "bad"], ["de", "de"])
+    results = store.results(job["id"], offset=0, limit=10)
+    assert [r["confidence"] for r in results] == [1.0, 3.0, 3.0, 2.0, 1.0]
+    assert results[1]["is_profane"] is True
+
+
+def _run_until(store, job_id, registry, status, **runner_options):
+    """Run a job runner until the job reaches a status."""
+
+    async def run():
+        runner = JobRunner(store, registry, poll_interval=0.01, **runner_options)
+        runner.start()
+        for _ in range(200):
+            if store.get(job_id)["status"] == status:
+                break
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+
+
+def test_runner_retries_failed_chunks(store):
+    """Test that a chunk failing for a while is retried instead of failing its job."""
+    registry = _registry()
+    score = registry.check_batch.side_effect
+
+    async def check_batch(texts, languages):
+        if registry.check_batch.call_count == 1:
+            raise RuntimeError("over memory budget")
+        return await score(texts, languages)
+
+    registry.check_batch.side_effect = check_batch
+    job = store.submit(["a", "bad"], language="de")
+
+    _run_until(store, job["id"], registry, COMPLETED, retry_backoff=0.01)
+
+    assert store.get(job["id"])["status"] == COMPLETED
+    assert registry.check_batch.call_count == 2
+
+
+def test_runner_fails_jobs_after_retries(store):
+    """Test that a job fails once its chunk failed max_attempts times."""
+    registry = _registry()
+    registry.check_batch.side_effect = RuntimeError("model missing")
+    job = store.submit(["a", "bad"], language="de")
+
+    _run_until(store, job["id"], registry, FAILED, max_attempts=3, retry_backoff=0.01)
+
+    job = store.get(job["id"])
+    assert job["status"] == FAILED
+    assert job["error"] == "model missing"
+    assert registry.check_batch.call_count == 3
+
+
+def test_stopped_runner_releases_jobs(store):
+    """Test that a job interrupted by stopping the runner is queued again."""
+    registry = _registry()
+    started = asyncio.Event()
+
+    async def check_batch(texts, languages):
+        started.set()
+        await asyncio.sleep(60)
+
+    registry.check_batch.side_effect = check_batch
+    job = store.submit(["a"], language="de")
+
+    async def run():
+        runner = JobRunner(store, registry, poll_interval=0.01)
+        runner.start()
+        await asyncio.wait_for(started.wait(), 5)
+        await runner.stop()
+
+    asyncio.run(run())
+
+    assert store.get(job["id"])["status"] == QUEUED
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+from src.services.metrics import get_metrics
+
+INCREMENT = """
+from src.services.metrics import get_metrics
+
+get_metrics().record_decisions([{"is_profane": True, "decided_by": "blocklist"}], "m")
+get_metrics().forward_seconds.labels(model="m").observe(0.01)
+"""
+
+RENDER = """
+from src.services.metrics import render_metrics
+
+print(render_metrics()[0].decode())
+"""
+
+
+def test_record_decisions():
+    """Test that decisions are counted by decision path and result."""
+    decisions = get_metrics().decisions
+    trivial = decisions.labels(model="m", decided_by="trivial", result="clean")
+    before = trivial._value.get()
+
+    get_metrics().record_decisions(
+        [{"is_profane": False, "decided_by": "trivial"}, {"is_profane": False}], "m"
+    )
+
+    assert trivial._value.get() == before + 1
+
+
+def test_metrics_are_merged_across_processes(tmp_path):
+    """Test that worker processes sharing a metrics directory report combined values."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", INCREMENT], env=env, check=True)
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER], env=env, capture_output=True, text=True, check=True
+    )
+
+    assert (
+        'badwords_decisions_total{decided_by="blocklist",model="m",result="profane"} 2.0'
+        in result.stdout
+    )
+    assert 'badwords_forward_duration_seconds_count{model="m"} 2.0' in result.stdout
@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from src.api.middleware import RequestLoggingMiddleware
+
+
+def _create_app(sample_rate: float) -> FastAPI:
+    """Create a small app with the request logging middleware."""
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {"status": "ok"}
+
+    @app.get("/missing")
+    async def missing():
+        raise HTTPException(status_code=404)
+
+    @app.get("/broken")
+    async def broken():
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestLoggingMiddleware, sample_rate=sample_rate)
+    return app
+
+
+def _request_logs(caplog) -> list[logging.LogRecord]:
+    """Get the records logged by the request logging middleware."""
+    return [r for r in caplog.records if r.name == "bad_words.api.middleware"]
+
+
+def test_request_logging(caplog):
+    """Test that requests are logged with method, path, status and time."""
+    caplog.set_level(logging.INFO, logger="bad_words")
+    client = TestClient(_create_app(sample_rate=1.0))
+
+    client.get("/ok?verbose=1")
+
+    (record,) = _request_logs(caplog)
+    assert record.levelno == logging.INFO
+    assert record.getMessage().startswith("GET /ok verbose=1 | Status: 200 | Time: ")
+
+
+def test_request_logging_sampling_keeps_errors(caplog):
+    """Test that unsampled successful requests are skipped but errors are always logged."""
+    caplog.set_level(logging.INFO, logger="bad_words")
+    client = TestClient(_create_app(sample_rate=0.0), raise_server_exceptions=False)
+
+    client.get("/ok")
+    client.get("/missing")
+    client.get("/broken")
+
+    records = _request_logs(caplog)
+    assert [r.levelno for r in records] == [logging.WARNING, logging.ERROR]
+    assert "Status: 404" in records[0].getMessage()
+    assert "Status: 500" in records[1].getMessage()
+
+
+def test_request_logging_reraises():
+    """Test that exceptions of the app are not swallowed."""
+    client = TestClient(_create_app(sample_rate=1.0))
+
+    with pytest.raises(RuntimeError):
+        client.get("/broken")
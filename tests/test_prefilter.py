@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from src.services.prefilter import AhoCorasick, Prefilter
+
+
+@pytest.fixture
+def prefilter(tmp_path):
+    """Fixture for a prefilter with small phrase lists."""
+    (tmp_path / "blocklist.txt").write_text("# slurs\narschloch\nidiot*\nass\n", encoding="utf-8")
+    (tmp_path / "allowlist.txt").write_text("guten morgen\nclass ass\n", encoding="utf-8")
+    return Prefilter(
+        tmp_path / "blocklist.txt", tmp_path / "allowlist.txt", min_text_length=2, reload_interval=0
+    )
+
+
+def test_aho_corasick_finds_overlapping_matches():
+    """Test that all occurrences of all patterns are found in one pass."""
+    matcher = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+
+    assert sorted(matcher.find_all("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+    assert matcher.find_all("nothing") == []
+
+
+def test_prefilter_blocklist(prefilter):
+    """Test that blocklisted words decide a text as profane."""
+    result = prefilter.decide("Du bist ein Arschloch!")
+
+    assert result == {"is_profane": True, "confidence": 1.0, "decided_by": "blocklist"}
+    assert prefilter.decide("So ein Idiotenverein")["decided_by"] == "blocklist"
+
+
+def test_prefilter_blocked_spans(prefilter):
+    """Test that the offsets of blocklisted words are found for masking."""
+    text = "Straße voller Idioten, class ass und ass"
+
+    assert [text[a:b] for a, b in prefilter.blocked_spans(text)] == ["Idioten", "ass"]
+    assert prefilter.blocked_spans("Guten Morgen") == []
+
+
+def test_prefilter_matches_whole_words(prefilter):
+    """Test that blocklisted words inside other words are left to the model."""
+    assert prefilter.decide("A classic assessment") is None
+
+
+def test_prefilter_allowlist(prefilter):
+    """Test that allowlisted phrases are clean and take precedence over the blocklist."""
+    assert prefilter.decide("Guten Morgen!")["decided_by"] == "allowlist"
+    assert prefilter.decide("class ass")["decided_by"] == "allowlist"
+    assert prefilter.decide("Guten Morgen, wie geht es?") is None
+
+
+def test_prefilter_trivial_texts(prefilter):
+    """Test that very short and emoji-only texts are clean."""
+    assert prefilter.decide("k")["decided_by"] == "trivial"
+    assert prefilter.decide("🙂🙂 !!")["decided_by"] == "trivial"
+
+
+def test_prefilter_reloads_changed_lists(prefilter):
+    """Test that changed list files are picked up without a restart."""
+    assert prefilter.decide("you donkey") is None
+
+    blocklist = prefilter.blocklist_path
+    blocklist.write_text("donkey\n", encoding="utf-8")
+    stat = blocklist.stat()
+    os.utime(blocklist, (stat.st_atime, stat.st_mtime + 10))
+    prefilter.maybe_reload()
+
+    assert prefilter.decide("you donkey")["decided_by"] == "blocklist"
+    assert prefilter.decide("Du Arschloch") is None
+    assert prefilter.reload() is False
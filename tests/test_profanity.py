@@ -12,16 +12,16 @@ class MockModel:
     def __init__(self):
         self.eval_called = False
 
-    def __call__(self, **kwargs):
+    def __call__(self, input_ids, **kwargs):
         """Mock for the model call."""
 
         class Outputs:
-            def __init__(self):
+            def __init__(self, batch_size):
                 import torch
 
-                self.logits = torch.tensor([[0.2, 0.8]])
+                self.logits = torch.tensor([[0.2, 0.8]] * batch_size)
 
-        return Outputs()
+        return Outputs(len(input_ids))
 
     def eval(self):
         """Mock for the model.eval call."""
@@ -36,9 +36,18 @@ class MockModel:
 class MockTokenizer:
     """Mock for the Hugging Face tokenizer."""
 
+    pad_token_id = 0
+    is_fast = True
+    model_max_length = 512
+
     def __call__(self, text, **kwargs):
         """Mock for the tokenizer call."""
-        return {"input_ids": [1, 2, 3], "attention_mask": [1, 1, 1]}
+        texts = [text] if isinstance(text, str) else text
+        return {"input_ids": [[1, 2, 3]] * len(texts), "attention_mask": [[1, 1, 1]] * len(texts)}
+
+    def num_special_tokens_to_add(self):
+        """Mock for the tokenizer.num_special_tokens_to_add call."""
+        return 2
 
     def save_pretrained(self, path):
         """Mock for the tokenizer.save_pretrained call."""
@@ -58,8 +67,8 @@ def mock_settings():
 def mock_service(mock_settings):
     """Fixture for profanity service with mocked model."""
     with (
-        mock.patch("src.services.profanity.AutoModelForSequenceClassification") as mock_model_cls,
-        mock.patch("src.services.profanity.AutoTokenizer") as mock_tokenizer_cls,
+        mock.patch("src.services.backends.AutoModelForSequenceClassification") as mock_model_cls,
+        mock.patch("transformers.AutoTokenizer") as mock_tokenizer_cls,
         mock.patch("src.services.profanity.Path") as mock_path,
         mock.patch("torch.no_grad"),
     ):
@@ -83,7 +92,20 @@ def mock_service(mock_settings):
 def test_profanity_service_init(mock_service):
     """Test that the profanity service initializes correctly."""
     assert mock_service.threshold == 0.5
-    assert mock_service.model.eval_called is True
+    assert mock_service.backend.name == "torch"
+    assert mock_service.backend.model.eval_called is True
+
+
+@pytest.fixture
+def short_model(monkeypatch):
+    """Fixture for a tokenizer whose model accepts at most 128 tokens."""
+    monkeypatch.setattr(MockTokenizer, "model_max_length", 128)
+
+
+def test_windows_fit_the_model(short_model, mock_service):
+    """Test that long text windows are clamped to the model's maximum length."""
+    assert mock_service.window_max_tokens == 128
+    assert mock_service.window_overlap_tokens == 64
 
 
 def test_check_text_basic(mock_service):
@@ -97,6 +119,173 @@ def test_check_text_basic(mock_service):
     assert isinstance(result["confidence"], float)
 
 
+def test_check_batch_keeps_input_order(mock_service):
+    """Test that check_batch returns one result per text."""
+    results = mock_service.check_batch(["first", "second", "third"])
+
+    assert len(results) == 3
+    assert all(result == mock_service.check_text("first") for result in results)
+    assert mock_service.check_batch([]) == []
+
+
+def test_check_batch_buckets_by_length(mock_service):
+    """Test that texts are scored in length-sorted buckets of max_batch_size."""
+    calls = []
+    lengths = {"a": 1, "abcd": 4, "ab": 2, "abc": 3, "abcde": 5}
+    mock_service.encoder.tokenizer = mock.MagicMock(pad_token_id=0)
+    mock_service.encoder.tokenizer.side_effect = lambda texts, **kwargs: {
+        "input_ids": [list(range(lengths[t])) for t in texts]
+    }
+    mock_service.max_batch_size = 2
+
+    def score(input_ids):
+        calls.append([len(ids) for ids in input_ids])
+        return [len(ids) / 10 for ids in input_ids]
+
+    with mock.patch.object(mock_service, "_score", side_effect=score):
+        results = mock_service.check_batch(list(lengths))
+
+    assert calls == [[1, 2], [3, 4], [5]]
+    assert [r["confidence"] for r in results] == [0.1, 0.4, 0.2, 0.3, 0.5]
+
+
+def test_check_batch_respects_token_budget(mock_service):
+    """Test that buckets are closed before they pad to more than max_batch_tokens."""
+    calls = []
+    lengths = {"a": 1, "abcd": 4, "ab": 2, "abc": 3, "abcde": 5}
+    mock_service.encoder.tokenizer = mock.MagicMock(pad_token_id=0)
+    mock_service.encoder.tokenizer.side_effect = lambda texts, **kwargs: {
+        "input_ids": [list(range(lengths[t])) for t in texts]
+    }
+    mock_service.encoder.pad_to_multiple_of = 1
+    mock_service.max_batch_tokens = 4
+
+    def score(input_ids):
+        calls.append([len(ids) for ids in input_ids])
+        return [len(ids) / 10 for ids in input_ids]
+
+    with mock.patch.object(mock_service, "_score", side_effect=score):
+        mock_service.check_batch(list(lengths))
+
+    # The text over the budget is still scored, on its own
+    assert calls == [[1, 2], [3], [4], [5]]
+
+
+def test_check_batch_uses_cache(mock_service):
+    """Test that repeated texts are only scored once."""
+    with mock.patch.object(
+        mock_service, "_score", side_effect=lambda ids: [0.8] * len(ids)
+    ) as score:
+        first = mock_service.check_batch(["hello", "hello", "world"])
+        second = mock_service.check_batch(["world", "hello"])
+
+    assert score.call_count == 1
+    assert sum(len(call.args[0]) for call in score.call_args_list) == 2
+    assert first[0] == first[1] == second[1]
+    assert mock_service.cache.stats()["hits"] == 2
+
+
+class WindowTokenizer:
+    """Tokenizer mock splitting text into windows of one token per character."""
+
+    pad_token_id = 0
+
+    def __call__(self, text, max_length, stride, **kwargs):
+        """Mock for the tokenizer call with overflowing tokens."""
+        size = max_length - 2
+        input_ids, offset_mapping = [], []
+        start = 0
+        while True:
+            end = min(start + size, len(text))
+            input_ids.append([101, *(ord(c) for c in text[start:end]), 102])
+            offset_mapping.append([(0, 0), *((i, i + 1) for i in range(start, end)), (0, 0)])
+            if end >= len(text):
+                return {"input_ids": input_ids, "offset_mapping": offset_mapping}
+            start = end - stride
+
+
+def test_check_long_text_windows(mock_service):
+    """Test that long texts are scored in overlapping windows in one batch."""
+    mock_service.tokenizer = WindowTokenizer()
+    mock_service.window_max_tokens = 6
+    mock_service.window_overlap_tokens = 1
+
+    def score(input_ids):
+        return [0.9 if ord("x") in ids else 0.1 for ids in input_ids]
+
+    with mock.patch.object(mock_service, "_score", side_effect=score) as scorer:
+        result = mock_service.check_long_text("abcdefghxjk")
+
+    # Windows of 4 tokens (6 minus 2 special tokens) overlapping by 1
+    windows = scorer.call_args.args[0]
+    assert [ids[1:-1] for ids in windows] == [
+        [ord(c) for c in part] for part in ["abcd", "defg", "ghxj", "jk"]
+    ]
+    assert scorer.call_count == 1
+    assert result["is_profane"] is True
+    assert result["window"] == {"start": 6, "end": 10, "text": "ghxj"}
+    assert result["windows_scored"] == result["windows_total"] == 4
+
+
+def test_check_long_text_stops_early(mock_service):
+    """Test that no further windows are scored once one crosses the threshold."""
+    mock_service.tokenizer = WindowTokenizer()
+    mock_service.window_max_tokens = 4
+    mock_service.window_overlap_tokens = 0
+    mock_service.max_batch_size = 2
+
+    with mock.patch.object(
+        mock_service, "_score", side_effect=lambda ids: [0.8] * len(ids)
+    ) as scorer:
+        result = mock_service.check_long_text("abcdefghij")
+
+    assert scorer.call_count == 1
+    assert result["windows_scored"] == 2
+    assert result["windows_total"] == 5
+    assert result["window"]["text"] == "ab"
+
+
+def test_check_long_text_short_text(mock_service):
+    """Test that a text fitting into one window is checked like check_text."""
+    mock_service.tokenizer = WindowTokenizer()
+
+    with mock.patch.object(mock_service, "check_text", return_value={"is_profane": False}):
+        result = mock_service.check_long_text("short")
+
+    assert result["windows_total"] == 1
+    assert result["window"] == {"start": 0, "end": 5, "text": "short"}
+
+
+def test_check_batch_skips_model_for_prefilter_decisions(mock_service):
+    """Test that texts decided by the prefilter are not scored by the model."""
+    mock_service.prefilter = mock.MagicMock()
+    mock_service.prefilter.decide.side_effect = lambda text: (
+        {"is_profane": True, "confidence": 1.0, "decided_by": "blocklist"}
+        if text == "blocked"
+        else None
+    )
+
+    with mock.patch.object(
+        mock_service, "_score", side_effect=lambda ids: [0.2] * len(ids)
+    ) as score:
+        results = mock_service.check_batch(["blocked", "unknown"])
+
+    assert sum(len(call.args[0]) for call in score.call_args_list) == 1
+    assert results[0]["decided_by"] == "blocklist"
+    assert results[1] == {"is_profane": False, "confidence": 0.2, "decided_by": "model"}
+
+
+def test_warmup_bypasses_cache(mock_service):
+    """Test that warmup runs forward passes without filling the result cache."""
+    with mock.patch.object(
+        mock_service, "_score", side_effect=lambda ids: [0.1] * len(ids)
+    ) as score:
+        mock_service.warmup(rounds=3)
+
+    assert score.call_count == 3
+    assert mock_service.cache.stats()["size"] == 0
+
+
 def test_threshold_property(mock_service):
     """Test that the threshold property can be modified."""
     # Get default threshold
@@ -108,3 +297,40 @@ def test_threshold_property(mock_service):
     # Check that it was set correctly
     assert mock_service.threshold == 0.9
     assert mock_service.threshold != default_threshold
+
+
+def _score_bad_words(texts, cache_tokens=True):
+    """Score texts by how many of the words "bad" and "worse" they contain."""
+    return [min(0.95, 0.3 * text.count("bad") + 0.6 * text.count("worse")) for text in texts]
+
+
+def test_censor_text_masks_decisive_words(mock_service):
+    """Test that the words whose removal makes the text clean are masked in one round."""
+    with mock.patch.object(mock_service, "_compute_scores", side_effect=_score_bad_words) as scorer:
+        result = mock_service.censor_text("you worse person")
+
+    assert result["is_profane"] is True
+    assert result["censored_text"] == "you ***** person"
+    assert result["spans"] == [{"start": 4, "end": 9, "score": pytest.approx(0.6)}]
+    # The whole text, then all three occlusion variants in one call
+    assert scorer.call_count == 2
+    assert scorer.call_args.args[0] == [" worse person", "you  person", "you worse "]
+
+
+def test_censor_text_needs_several_rounds(mock_service):
+    """Test that words that only make a text profane together are found round by round."""
+    with mock.patch.object(mock_service, "_compute_scores", side_effect=_score_bad_words):
+        result = mock_service.censor_text("bad, bad and worse")
+
+    assert result["censored_text"] == "***, *** and *****"
+    assert [span["start"] for span in result["spans"]] == [0, 5, 13]
+
+
+def test_censor_text_skips_clean_texts(mock_service):
+    """Test that clean texts are not occluded."""
+    with mock.patch.object(mock_service, "_compute_scores", side_effect=_score_bad_words) as scorer:
+        result = mock_service.censor_text("a nice text")
+
+    assert result["censored_text"] == "a nice text"
+    assert result["spans"] == []
+    assert scorer.call_count == 1
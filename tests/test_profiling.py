@@ -0,0 +1,53 @@
+import contextvars
+import pstats
+
+import pytest
+
+from src.services.profiling import Profiler, request_profile
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    """Fixture for a profiler writing to a temporary directory."""
+    return Profiler(tmp_path / "profiles", max_profiles=2)
+
+
+def test_run_saves_trace_and_python_profile(profiler):
+    """Test that a profiled call returns its result and leaves both profiles behind."""
+    assert profiler.run("p1", sum, [1, 2, 3]) == 6
+
+    (profile,) = profiler.list_profiles()
+    assert profile["id"] == "p1"
+    assert sorted(file["name"] for file in profile["files"]) == ["p1.pstats", "p1.trace.json"]
+    assert pstats.Stats(str(profiler.profile_file("p1.pstats"))).total_calls > 0
+
+
+def test_profiles_rotate(profiler):
+    """Test that only the newest max_profiles profiles are kept."""
+    for profile_id in ("p1", "p2", "p3"):
+        profiler.run(profile_id, sum, [1])
+
+    assert {profile["id"] for profile in profiler.list_profiles()} == {"p2", "p3"}
+    assert profiler.profile_file("p1.trace.json") is None
+
+
+def test_profile_file_only_serves_profiles(profiler, tmp_path):
+    """Test that no other files can be downloaded."""
+    profiler.run("p1", sum, [1])
+    (tmp_path / "secret.trace.json").write_text("{}")
+
+    assert profiler.profile_file("p1.trace.json") is not None
+    assert profiler.profile_file("../secret.trace.json") is None
+    assert profiler.profile_file("p1") is None
+
+
+def test_choose_requested_or_sampled(profiler):
+    """Test that calls are profiled when requested or sampled."""
+    assert profiler.choose() is None
+
+    context = contextvars.copy_context()
+    context.run(request_profile, "wanted")
+    assert context.run(profiler.choose) == "wanted"
+
+    profiler.sample_rate = 1.0
+    assert "-sample-" in profiler.choose()
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from src.cli import quantization_drift
+from src.cli.quantization_drift import drift_report, read_samples
+from src.config import Settings
+from src.services.profanity import ProfanityService
+
+
+def _service(confidences):
+    """Build a mocked service returning fixed confidences."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.check_batch.side_effect = lambda texts: [
+        {"is_profane": confidences[t] > 0.5, "confidence": confidences[t]} for t in texts
+    ]
+    return service
+
+
+def test_drift_report():
+    """Test that drift and decision flips are reported."""
+    reference = _service({"a": 0.1, "b": 0.49, "c": 0.9})
+    quantized = _service({"a": 0.1, "b": 0.52, "c": 0.8})
+
+    report = drift_report(reference, quantized, ["a", "b", "c"])
+
+    assert report["samples"] == 3
+    assert abs(report["max_abs_drift"] - 0.1) < 1e-9
+    assert report["decision_flips"] == 1
+    assert report["flipped_samples"][0]["text"] == "b"
+
+
+def test_read_samples(tmp_path):
+    """Test that samples are read from text and JSONL files."""
+    text_file = tmp_path / "samples.txt"
+    text_file.write_text("first\n\nsecond\nthird\n", encoding="utf-8")
+    jsonl_file = tmp_path / "samples.jsonl"
+    jsonl_file.write_text('{"text": "first"}\n{"text": "second"}\n', encoding="utf-8")
+
+    assert read_samples(text_file) == ["first", "second", "third"]
+    assert read_samples(text_file, limit=2) == ["first", "second"]
+    assert read_samples(jsonl_file) == ["first", "second"]
+
+
+def test_drift_services_skip_the_prefilter():
+    """Test that the compared services score every text with the model."""
+    with mock.patch.object(quantization_drift, "ProfanityService") as service_cls:
+        quantization_drift._service(Settings(PREFILTER_ENABLED=True), "int8")
+
+    settings = service_cls.call_args.args[0]
+    assert settings.PREFILTER_ENABLED is False
+    assert settings.MODEL_PRECISION == "int8"
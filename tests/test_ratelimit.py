@@ -0,0 +1,210 @@
+import asyncio
+import multiprocessing
+import threading
+from unittest import mock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.middleware import RateLimitMiddleware
+from src.services.ratelimit import (
+    MemoryStorage,
+    Rate,
+    RateLimiter,
+    RedisStorage,
+    SharedMemoryStorage,
+    parse_rate,
+)
+
+
+def _acquire_all(storage, key: str, rate: Rate, times: int) -> list[bool]:
+    """Take one token per call and report which calls were allowed."""
+
+    async def run():
+        return [(await storage.acquire(key, rate)).allowed for _ in range(times)]
+
+    return asyncio.run(run())
+
+
+def test_parse_rate():
+    """Test that rate limit strings are parsed into limit and period."""
+    assert parse_rate("10/minute") == Rate(10, 60)
+    assert parse_rate("100 per second") == Rate(100, 1)
+    assert parse_rate("50/5minutes") == Rate(50, 300)
+    assert parse_rate("unlimited") is None
+
+    with pytest.raises(ValueError, match="Invalid rate limit"):
+        parse_rate("ten a minute")
+
+
+def test_memory_storage_token_bucket():
+    """Test that a bucket runs empty and refills over time."""
+    storage = MemoryStorage()
+    rate = Rate(3, 60)
+
+    with mock.patch("src.services.ratelimit.time.monotonic", return_value=1000.0):
+        assert _acquire_all(storage, "client", rate, 4) == [True, True, True, False]
+        result = asyncio.run(storage.acquire("client", rate))
+        assert result.retry_after == pytest.approx(20.0)
+        assert _acquire_all(storage, "other", rate, 1) == [True]
+
+    # One token is back after a third of the period
+    with mock.patch("src.services.ratelimit.time.monotonic", return_value=1020.0):
+        assert _acquire_all(storage, "client", rate, 2) == [True, False]
+
+
+def test_memory_storage_drops_oldest_clients():
+    """Test that the number of buckets is bounded."""
+    storage = MemoryStorage(max_keys=2)
+    rate = Rate(1, 60)
+
+    for key in ("a", "b", "c"):
+        _acquire_all(storage, key, rate, 1)
+
+    assert list(storage._buckets) == ["b", "c"]
+
+
+def _take_two(storage: SharedMemoryStorage, rate: Rate) -> None:
+    """Take two tokens in a forked worker process."""
+    _acquire_all(storage, "client", rate, 2)
+
+
+def test_shared_memory_storage_is_shared_across_processes():
+    """Test that forked workers draw from the same buckets."""
+    storage = SharedMemoryStorage(slots=64)
+    rate = Rate(3, 3600)
+
+    worker = multiprocessing.get_context("fork").Process(target=_take_two, args=(storage, rate))
+    worker.start()
+    worker.join()
+
+    assert _acquire_all(storage, "client", rate, 2) == [True, False]
+
+
+def test_shared_memory_storage_replaces_oldest_slot():
+    """Test that a full neighbourhood of slots reuses the least recently updated one."""
+    storage = SharedMemoryStorage(slots=8)
+    rate = Rate(1, 3600)
+
+    for index in range(9):
+        assert _acquire_all(storage, f"client-{index}", rate, 1) == [True]
+
+    # client-0 was evicted, so it starts with a full bucket again
+    assert _acquire_all(storage, "client-0", rate, 1) == [True]
+    assert _acquire_all(storage, "client-8", rate, 1) == [False]
+
+
+def test_shared_memory_storage_waits_for_lock_without_blocking():
+    """Test that a lock held by a dead worker neither blocks the event loop nor traffic."""
+    storage = SharedMemoryStorage(slots=8, lock_timeout=0.05)
+    storage._lock.acquire()
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        result = await storage.acquire("client", Rate(1, 60))
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+
+    assert result.allowed
+    assert ticks > 10
+
+
+@pytest.fixture
+def redis_server():
+    """Fixture for a local Redis protocol stand-in."""
+    pytest.importorskip("redis")
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_storage_token_bucket(redis_server):
+    """Test the token bucket script against a Redis protocol server."""
+    host, port = redis_server
+    storage = RedisStorage(f"redis://{host}:{port}/0")
+    rate = Rate(2, 60)
+
+    async def run():
+        results = [await storage.acquire("client", rate) for _ in range(3)]
+        other = await storage.acquire("other", rate)
+        return results, other
+
+    results, other = asyncio.run(run())
+
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[1].remaining == pytest.approx(0.0, abs=0.01)
+    assert 0 < results[2].retry_after <= 30
+    assert other.allowed
+
+
+def test_rate_limiter_routes():
+    """Test per-route rates, exempt paths and the default rate."""
+    limiter = RateLimiter(
+        MemoryStorage(),
+        default_rate=Rate(1, 60),
+        route_rates={"/batch": Rate(2, 60), "/free": None},
+        exempt_paths={"/health"},
+    )
+
+    async def run():
+        return [
+            await limiter.hit(path, "1.2.3.4")
+            for path in ("/check", "/check", "/batch", "/batch", "/free", "/health")
+        ]
+
+    check, check_again, batch, batch_again, free, health = asyncio.run(run())
+
+    assert check.allowed
+    assert not check_again.allowed
+    assert batch.allowed
+    assert batch_again.allowed
+    assert free is None
+    assert health is None
+
+
+def test_rate_limiter_lets_requests_through_on_storage_errors():
+    """Test that a failing storage does not fail the API."""
+    storage = mock.MagicMock()
+    storage.acquire = mock.AsyncMock(side_effect=OSError("connection refused"))
+    limiter = RateLimiter(storage, default_rate=Rate(1, 60))
+
+    assert asyncio.run(limiter.hit("/check", "1.2.3.4")) is None
+
+
+def test_rate_limit_middleware_keys_buckets_by_route():
+    """Test that unknown paths are not counted and path parameters share one bucket."""
+    app = FastAPI()
+    app.get("/check")(lambda: {})
+    app.get("/jobs/{job_id}")(lambda job_id: {})
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=RateLimiter(MemoryStorage(max_keys=2), default_rate=Rate(1, 3600)),
+    )
+    client = TestClient(app)
+
+    assert client.get("/check").status_code == 200
+    assert client.get("/check").status_code == 429
+
+    # Unknown paths get no bucket, so they cannot push out (and so reset) the one of /check
+    assert all(client.get(f"/unknown-{index}").status_code == 404 for index in range(10))
+    assert client.get("/check").status_code == 429
+
+    assert client.get("/jobs/a").status_code == 200
+    assert client.get("/jobs/b").status_code == 429
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+from unittest import mock
+
+import pytest
+
+from src.config import Settings
+from src.services.batching import BatchScheduler
+from src.services.language import detect_language
+from src.services.profanity import ProfanityService
+from src.services.registry import ModelRegistry, UnsupportedLanguageError
+
+
+def _service(size_mb=0):
+    """Build a mocked profanity service whose model takes size_mb of memory."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.backend = mock.MagicMock()
+    service.backend.memory_bytes.return_value = int(size_mb * 1024 * 1024)
+    service.check_batch.side_effect = lambda texts: [
+        {"is_profane": False, "confidence": 0.1} for _ in texts
+    ]
+    return service
+
+
+@pytest.fixture
+def services():
+    """Fixture for the services the registry loads, by model name."""
+    return {}
+
+
+@pytest.fixture
+def make_registry(services):
+    """Fixture building a registry with a preloaded default model and mocked loading."""
+
+    def make(**settings):
+        s = Settings(
+            **{
+                "MODEL_NAME": "de-model",
+                "DEFAULT_LANGUAGE": "de",
+                "MODELS": {"en": "en-model", "fr": "fr-model"},
+                **settings,
+            }
+        )
+        registry = ModelRegistry(s)
+        default = _service()
+        registry.register(
+            "de-model", default, BatchScheduler(default, max_batch_size=8, max_wait_ms=1)
+        )
+        services["de-model"] = default
+        return registry
+
+    def load(s):
+        services[s.MODEL_NAME] = _service(size_mb=1)
+        return services[s.MODEL_NAME]
+
+    with mock.patch("src.services.registry.ProfanityService", side_effect=load):
+        yield make
+
+
+def test_detect_language():
+    """Test that texts are assigned to the language of their function words."""
+    languages = ["de", "en", "fr"]
+
+    assert detect_language("Das ist nicht schön", languages) == "de"
+    assert detect_language("You are not the one", languages) == "en"
+    assert detect_language("Tu es vraiment pas sympa", languages) == "fr"
+    assert detect_language("12345", languages) is None
+
+
+def test_resolve_language(make_registry):
+    """Test that explicit languages win, others are detected with the default as fallback."""
+    registry = make_registry()
+
+    assert registry.resolve_language("The cat is on the mat", "FR") == "fr"
+    assert registry.resolve_language("The cat is on the mat") == "en"
+    assert registry.resolve_language("xyz") == "de"
+    with pytest.raises(UnsupportedLanguageError):
+        registry.resolve_language("text", "xx")
+
+
+def test_check_batch_groups_texts_by_model(make_registry, services):
+    """Test that each model scores its texts in one call, loaded on first use."""
+    registry = make_registry()
+
+    results = asyncio.run(
+        registry.check_batch(
+            ["Das ist nicht gut", "This is not good", "Das auch nicht", "hm"],
+            [None, None, None, "en"],
+        )
+    )
+
+    assert [r["language"] for r in results] == ["de", "en", "de", "en"]
+    services["de-model"].check_batch.assert_called_once_with(
+        ["Das ist nicht gut", "Das auch nicht"]
+    )
+    services["en-model"].check_batch.assert_called_once_with(["This is not good", "hm"])
+    assert "fr-model" not in services
+
+
+def test_idle_models_are_unloaded_over_budget(make_registry, services):
+    """Test that loading a model unloads the least recently used idle one."""
+    registry = make_registry(MODEL_MEMORY_BUDGET_MB=1.5)
+
+    async def run():
+        await registry.check("hello", "en")
+        await registry.check("bonjour", "fr")
+        await registry.check("hallo", "de")
+
+    asyncio.run(run())
+
+    loaded = {m["model_name"]: m["loaded"] for m in registry.stats()}
+    assert loaded == {"de-model": True, "en-model": False, "fr-model": True}
+
+
+def test_models_in_use_are_not_unloaded(make_registry):
+    """Test that pinned models and models with requests in flight stay loaded."""
+    registry = make_registry(MODEL_MEMORY_BUDGET_MB=1.5)
+
+    async def run():
+        await registry.check("hello", "en")
+
+    asyncio.run(run())
+    registry._loaded["en-model"].in_flight = 1
+
+    model, evicted = registry._load("fr-model")
+
+    assert evicted == []
+    assert set(registry._loaded) == {"de-model", "en-model", "fr-model"}
+    assert model.in_flight == 1
+
+
+def test_undetectable_languages_are_reported(make_registry, caplog):
+    """Test that configured languages without language detection are logged at startup."""
+    make_registry(MODELS={"en": "en-model", "pl": "pl-model"})
+
+    warnings = [
+        r.getMessage()
+        for r in caplog.records
+        if r.name == "bad_words.services.registry" and r.levelname == "WARNING"
+    ]
+    assert len(warnings) == 1
+    assert warnings[0].startswith("No language detection for pl, ")
+
+
+def test_cancelled_loads_release_the_model(make_registry):
+    """Test that a request cancelled while its model loads does not keep the model in use."""
+    registry = make_registry(MODEL_MEMORY_BUDGET_MB=1.5)
+    loading = threading.Event()
+    create = registry._create
+
+    def slow_create(model_name):
+        loading.wait(5)
+        return create(model_name)
+
+    registry._create = slow_create
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(registry.check("hello", "en"), 0.05)
+        loading.set()
+        while "en-model" not in registry._loaded or registry._abandoned_loads:
+            await asyncio.sleep(0.01)
+        assert registry._loaded["en-model"].in_flight == 0
+
+        await registry.check("bonjour", "fr")
+
+    asyncio.run(run())
+
+    loaded = {m["model_name"]: m["loaded"] for m in registry.stats()}
+    assert loaded == {"de-model": True, "en-model": False, "fr-model": True}
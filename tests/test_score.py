@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from unittest import mock
+
+import pytest
+
+from src.cli import score
+from src.cli.score import read_records, score_file
+from src.config import get_settings
+from src.services.profanity import ProfanityService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Fixture for a mocked model shared by all (forked) workers."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.check_batch.side_effect = lambda texts: [
+        {"is_profane": "bad" in text, "confidence": 0.9 if "bad" in text else 0.1} for text in texts
+    ]
+    monkeypatch.setattr(score, "_service", service)
+    return service
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Fixture for a JSONL corpus with an invalid row."""
+    path = tmp_path / "corpus.jsonl"
+    lines = [
+        json.dumps({"id": f"c{i}", "text": "bad" if i % 3 == 0 else "fine"}) for i in range(50)
+    ]
+    lines.insert(10, "{broken")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def _read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_read_records_resumes_at_offset():
+    """Test that reading can continue at any yielded offset, also with multiline CSV rows."""
+    data = b'id,text\n1,"first\nline"\n2,second\n3,"x, ""quoted"""\n'
+
+    records = list(read_records(io.BytesIO(data), "csv"))
+    assert [r["text"] for _, r in records] == ["first\nline", "second", 'x, "quoted"']
+
+    offset = records[0][0]
+    resumed = list(read_records(io.BytesIO(data), "csv", offset=offset, first_row=1))
+    assert resumed == records[1:]
+
+
+def test_read_records_jsonl_errors():
+    """Test that invalid rows become error records numbered by row."""
+    data = b'{"text": "a"}\n\n[1]\n{"id": 7}\nnope\n'
+
+    records = [record for _, record in read_records(io.BytesIO(data), "jsonl")]
+
+    assert records[0] == {"id": 0, "text": "a"}
+    assert records[1]["error"] == "Row is not an object"
+    assert records[2] == {"id": 7, "error": 'Row has no "text" text'}
+    assert records[3] == {"id": 3, "error": "Row is not valid JSON"}
+
+
+def test_score_file(service, corpus, tmp_path):
+    """Test that all rows are scored in input order and the checkpoint is removed."""
+    output = tmp_path / "scores.jsonl"
+
+    stats = score_file(corpus, output, get_settings(), chunk_size=8)
+
+    results = _read_jsonl(output)
+    assert stats["rows"] == 51
+    assert stats["errors"] == 1
+    assert [r["id"] for r in results[:3]] == ["c0", "c1", "c2"]
+    assert results[0]["is_profane"] is True
+    assert results[10] == {"id": 10, "error": "Row is not valid JSON"}
+    assert not (tmp_path / "scores.jsonl.checkpoint").exists()
+
+
+def test_score_file_resumes(service, corpus, tmp_path):
+    """Test that an interrupted run continues after the last checkpoint."""
+    expected = tmp_path / "expected.jsonl"
+    score_file(corpus, expected, get_settings(), chunk_size=8)
+
+    output = tmp_path / "scores.jsonl"
+    calls = 0
+    check_batch = service.check_batch.side_effect
+
+    def interrupted(texts):
+        nonlocal calls
+        calls += 1
+        if calls == 4:
+            raise KeyboardInterrupt
+        return check_batch(texts)
+
+    service.check_batch.side_effect = interrupted
+    with pytest.raises(KeyboardInterrupt):
+        score_file(corpus, output, get_settings(), chunk_size=8, checkpoint_seconds=0)
+
+    checkpoint = json.loads((tmp_path / "scores.jsonl.checkpoint").read_text())
+    assert checkpoint["rows"] == 24
+
+    # Rows written after the checkpoint are dropped and scored again
+    with output.open("a", encoding="utf-8") as f:
+        f.write('{"id": "partial"')
+
+    service.check_batch.side_effect = check_batch
+    stats = score_file(corpus, output, get_settings(), chunk_size=8)
+
+    assert stats["rows"] == 27
+    assert output.read_text() == expected.read_text()
+
+
+def test_score_file_csv_with_process_pool(service, tmp_path):
+    """Test scoring a CSV file with several forked worker processes."""
+    corpus = tmp_path / "corpus.csv"
+    with corpus.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "key"])
+        for i in range(40):
+            writer.writerow([f"bad\n{i}" if i % 2 else f"fine {i}", i])
+    output = tmp_path / "scores.csv"
+
+    stats = score_file(corpus, output, get_settings(), workers=2, chunk_size=3, id_field="key")
+
+    with output.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert stats["rows"] == 40
+    assert [row["id"] for row in rows] == [str(i) for i in range(40)]
+    assert [row["is_profane"] for row in rows[:2]] == ["False", "True"]
+
+
+def test_score_file_rejects_other_checkpoint(service, corpus, tmp_path):
+    """Test that a checkpoint of another input is not resumed."""
+    output = tmp_path / "scores.jsonl"
+    output.write_text("")
+    (tmp_path / "scores.jsonl.checkpoint").write_text(
+        json.dumps({"input": "/other.jsonl", "input_offset": 0, "output_size": 0, "rows": 0})
+    )
+
+    with pytest.raises(ValueError, match="another input"):
+        score_file(corpus, output, get_settings())
+
+    assert score_file(corpus, output, get_settings(), restart=True)["rows"] == 51
@@ -0,0 +1,20 @@
+from starlette.requests import Request
+
+from src.api.serialization import wants_msgpack
+
+
+def _request(accept):
+    headers = [(b"accept", accept.encode())] if accept is not None else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_wants_msgpack():
+    """Test that MessagePack is chosen only if the client ranks it at least as high as JSON."""
+    assert wants_msgpack(_request("application/msgpack"))
+    assert wants_msgpack(_request("application/x-msgpack, application/json"))
+    assert wants_msgpack(_request("application/json;q=0.5, application/msgpack"))
+
+    assert not wants_msgpack(_request(None))
+    assert not wants_msgpack(_request("*/*"))
+    assert not wants_msgpack(_request("application/json, application/msgpack;q=0.5"))
+    assert not wants_msgpack(_request("application/msgpack;q=0"))
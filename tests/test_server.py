@@ -0,0 +1,39 @@
+from unittest import mock
+
+from src.config import Settings
+from src.server import serve, worker_torch_threads
+
+
+def test_worker_torch_threads_explicit():
+    """Test that an explicit per-worker thread count is used as is."""
+    settings = Settings(WORKERS=4, WORKER_TORCH_THREADS=3)
+
+    assert worker_torch_threads(settings) == 3
+
+
+def test_worker_torch_threads_split_cores():
+    """Test that CPU cores are split across workers by default."""
+    settings = Settings(WORKERS=4)
+
+    with mock.patch("src.server.os.cpu_count", return_value=16):
+        assert worker_torch_threads(settings) == 4
+
+    with mock.patch("src.server.os.cpu_count", return_value=2):
+        assert worker_torch_threads(settings) == 1
+
+
+def test_serve_loads_model_before_serving():
+    """Test that the model is loaded before the server starts accepting requests."""
+    calls = []
+    app = mock.MagicMock()
+
+    with (
+        mock.patch("src.server.get_model_registry") as mock_registry,
+        mock.patch("src.server.uvicorn.run", side_effect=lambda *a, **k: calls.append("serve")),
+        mock.patch("src.server.os.fork") as mock_fork,
+    ):
+        mock_registry.return_value.preload.side_effect = lambda: calls.append("model")
+        serve(app, Settings(WORKERS=1), host="127.0.0.1", port=8000)
+
+    assert calls == ["model", "serve"]
+    mock_fork.assert_not_called()
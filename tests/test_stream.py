@@ -0,0 +1,37 @@
+import asyncio
+
+from src.api.v1.endpoints.stream import _read_lines
+
+
+class _FakeRequest:
+    """Minimal request whose body arrives in the given chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _lines(chunks, max_line_bytes=100):
+    async def collect():
+        return [line async for line in _read_lines(_FakeRequest(chunks), max_line_bytes)]
+
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks():
+    """Test that lines are reassembled across network chunks."""
+    assert _lines([b'"fir', b'st"\n"sec', b'ond"\n"third"']) == [
+        b'"first"',
+        b'"second"',
+        b'"third"',
+    ]
+
+
+def test_overlong_lines_are_skipped_without_buffering():
+    """Test that an overlong line is reported once and the stream continues."""
+    chunks = [b'"ok"\n', b"x" * 60, b"x" * 60, b"x" * 60, b'x\n"next"\n']
+
+    assert _lines(chunks, max_line_bytes=100) == [b'"ok"', None, b'"next"']
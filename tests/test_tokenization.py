@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+
+from src.services.tokenization import TokenEncoder
+
+
+class CountingTokenizer:
+    """Fast tokenizer mock with one token per character that records its calls."""
+
+    pad_token_id = 0
+    is_fast = True
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, truncation=False, max_length=None):
+        self.calls.append(list(texts))
+        ids = [[101] + [ord(c) for c in text][: max_length - 2] + [102] for text in texts]
+        return {"input_ids": ids}
+
+
+def test_encode_batches_and_caches():
+    """Test that only unseen texts are tokenized, each once and in one call."""
+    tokenizer = CountingTokenizer()
+    encoder = TokenEncoder(tokenizer, cache_size=10)
+
+    first = encoder.encode(["ab", "c", "ab"])
+    second = encoder.encode(["c", "de", "ab"])
+
+    assert first == [[101, 97, 98, 102], [101, 99, 102], [101, 97, 98, 102]]
+    assert second[1] == [101, 100, 101, 102]
+    assert tokenizer.calls == [["ab", "c"], ["de"]]
+    assert encoder.stats()["hits"] == 2
+    assert encoder.stats()["misses"] == 3
+
+
+def test_encode_evicts_least_recently_used():
+    """Test that the cache keeps only the most recently used texts."""
+    tokenizer = CountingTokenizer()
+    encoder = TokenEncoder(tokenizer, cache_size=2)
+
+    encoder.encode(["a", "b"])
+    encoder.encode(["a"])
+    encoder.encode(["c"])
+    encoder.encode(["a", "b"])
+
+    assert tokenizer.calls[-1] == ["b"]
+    assert encoder.stats()["size"] == 2
+
+
+def test_encode_without_cache_truncates():
+    """Test that a disabled cache tokenizes every call and texts are truncated."""
+    tokenizer = CountingTokenizer()
+    encoder = TokenEncoder(tokenizer, max_length=4, cache_size=0)
+
+    encoder.encode(["abcdef"])
+    assert encoder.encode(["abcdef"]) == [[101, 97, 98, 102]]
+    assert len(tokenizer.calls) == 2
+
+
+def test_pad_rounds_up_to_multiple():
+    """Test that batches are padded to the longest sequence rounded up to the multiple."""
+    encoder = TokenEncoder(CountingTokenizer(), max_length=12, pad_to_multiple_of=8)
+
+    input_ids, attention_mask = encoder.pad([[1, 2, 3], [4, 5, 6, 7, 8, 9, 10, 11, 12]])
+
+    assert input_ids.shape == (2, 12)
+    assert input_ids[0].tolist() == [1, 2, 3] + [0] * 9
+    assert attention_mask.sum(dim=1).tolist() == [3, 9]
+
+    input_ids, _ = encoder.pad([[1, 2, 3], [4]])
+    assert input_ids.shape == (2, 8)
+
+
+def test_pad_leaves_single_sequence_unpadded():
+    """Test that a batch of one sequence gets no padding and a full attention mask."""
+    encoder = TokenEncoder(CountingTokenizer(), pad_to_multiple_of=8)
+
+    input_ids, attention_mask = encoder.pad([[1, 2, 3]])
+
+    assert input_ids.tolist() == [[1, 2, 3]]
+    assert attention_mask.tolist() == [[1, 1, 1]]
+
+
+def test_slow_tokenizer():
+    """Test that slow tokenizers are reported, or refused when a fast one is required."""
+    slow = mock.MagicMock(is_fast=False, pad_token_id=0)
+
+    with mock.patch("src.services.tokenization.logger") as logger:
+        TokenEncoder(slow)
+    logger.warning.assert_called_once()
+
+    with pytest.raises(ValueError, match="not a fast tokenizer"):
+        TokenEncoder(slow, require_fast=True)
@@ -0,0 +1,61 @@
+import asyncio
+import subprocess
+import sys
+from unittest import mock
+
+from src.config import Settings
+from src.services.profanity import ProfanityService
+from src.services.registry import ModelRegistry
+from src.services.warmup import Readiness, warm_up
+
+
+def test_warm_up_marks_ready():
+    """Test that a successful warmup loads the model into the registry and becomes ready."""
+    service = mock.MagicMock(spec=ProfanityService)
+    service.backend = mock.MagicMock()
+    service.backend.memory_bytes.return_value = 2 * 1024 * 1024
+    registry = ModelRegistry(Settings())
+    readiness = Readiness()
+
+    with (
+        mock.patch("src.services.warmup.get_model_registry", return_value=registry),
+        mock.patch("src.services.registry.get_profanity_service", return_value=service),
+        mock.patch("src.services.registry.get_batch_scheduler"),
+    ):
+        asyncio.run(warm_up(Settings(WARMUP_BATCHES=2), readiness))
+
+    service.warmup.assert_called_once_with(2)
+    assert readiness.is_ready
+    assert registry.memory_usage()["model_memory_mb"] == {Settings().MODEL_NAME: 2.0}
+
+
+def test_warm_up_failure():
+    """Test that a failing model load is reported instead of raised."""
+    readiness = Readiness()
+
+    with (
+        mock.patch(
+            "src.services.warmup.get_model_registry", return_value=ModelRegistry(Settings())
+        ),
+        mock.patch(
+            "src.services.registry.get_profanity_service", side_effect=OSError("model missing")
+        ),
+    ):
+        asyncio.run(warm_up(Settings(), readiness))
+
+    assert readiness.status == Readiness.FAILED
+    assert readiness.error == "model missing"
+    assert not readiness.is_ready
+
+
+def test_app_import_is_lazy():
+    """Test that importing the API does not import torch or transformers."""
+    code = (
+        "import sys; import src.api.app; "
+        "print(','.join(m for m in ('torch', 'transformers') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == ""